@@ -0,0 +1,18 @@
+from .frames import DeltaFrame, FrameRecorder, Keyframe, decode_frames
+from .host import SessionNotFound, SimulationHost, simulation_nbytes
+from .service import FrameGone, SimulationService, simulation_summary
+from .stream import FrameCache, SimulationRunner, sse_events
+
+__all__ = [
+    "DeltaFrame", "FrameCache", "FrameGone", "FrameRecorder", "Keyframe", "SessionNotFound",
+    "SimulationHost", "SimulationRunner", "SimulationService", "create_app", "create_host_app",
+    "decode_frames", "simulation_nbytes", "simulation_summary", "sse_events",
+]
+
+
+def __getattr__(name):
+    # create_app y create_host_app necesitan Flask: se importan solo cuando se usan
+    if name in ("create_app", "create_host_app"):
+        from . import app
+        return getattr(app, name)
+    raise AttributeError(name)
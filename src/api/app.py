@@ -0,0 +1,355 @@
+import asyncio
+import concurrent.futures
+import gzip
+import threading
+from typing import Any, Awaitable, Dict, Iterable, Optional
+
+from flask import Flask, Response, jsonify, request
+
+from src.logic.ensemble import LAYOUT_DIAGONAL, LAYOUT_RANDOM, LAYOUT_TRIPLE, RunSpec, layout_cells
+from src.logic.grid import Grid
+from src.logic.simulation import Simulation
+from .host import SessionNotFound, SimulationHost
+from .service import FrameGone, SimulationService
+from .stream import FrameCache, SimulationRunner, sse_events
+
+try:
+    from flask_cors import CORS
+except ImportError:  # el visor puede servirse desde el mismo origen
+    CORS = None
+
+BINARY_MIMETYPE = "application/octet-stream"
+_IMMUTABLE = "public, max-age=31536000, immutable"
+_MIN_GZIP_BYTES = 1024
+
+
+def _frames_response(frames: Iterable[Any], etag: str, cache_control: str) -> Response:
+    frames = list(frames)
+    if request.args.get("format") == "json":
+        response = jsonify([frame.to_json() for frame in frames])
+        etag += "-json"
+    else:
+        body = b"".join(frame.encode() for frame in frames)
+        response = Response(body, mimetype=BINARY_MIMETYPE)
+        if len(body) >= _MIN_GZIP_BYTES and "gzip" in request.accept_encodings:
+            response.set_data(gzip.compress(body, compresslevel=5))
+            response.headers["Content-Encoding"] = "gzip"
+            etag += "-gz"
+        response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response.make_conditional(request)
+
+
+def _error(status: int, message: str, **extra) -> Response:
+    response = jsonify({"error": message, **extra})
+    response.status_code = status
+    return response
+
+
+def _turns_arg(body: Dict[str, Any], max_turns: Optional[int] = None) -> int:
+    """
+    Raises:
+        ValueError: If turns is not an integer >= 1, or is above ``max_turns``.
+    """
+    turns = body.get("turns", request.args.get("turns", 1))
+    try:
+        turns = int(turns)
+    except (TypeError, ValueError):
+        raise ValueError("turns must be an integer")
+    if turns < 1:
+        raise ValueError("turns must be >= 1")
+    if max_turns is not None and turns > max_turns:
+        raise ValueError(f"turns must be <= {max_turns}")
+    return turns
+
+
+def create_app(sim: Simulation, history: int = 256, cors: bool = True, run: bool = False,
+               turns_per_second: Optional[float] = None, max_gap: int = 32,
+               max_turns: int = 1000) -> Flask:
+    """
+    HTTP API of a Simulation.
+
+    - ``GET /state``: JSON summary (turn, size, totals).
+    - ``POST /step``: runs ``{"turns": n}`` turns (default 1), returns /state.
+    - ``GET /keyframe``: every organism (ids, flat cells) of the last turn.
+    - ``GET /delta/<turn>``: changes from turn - 1 to ``turn``; immutable.
+    - ``GET /deltas?since=<turn>``: the deltas after ``since``, concatenated.
+    - ``GET /stream``: Server-Sent Events with the frames of every turn
+      (see stream.sse_events); resumes from Last-Event-ID or ``?since=``.
+    - ``POST /run``: plays turns on a background thread, at
+      ``{"turns_per_second": x}`` (null for no limit); returns /state.
+    - ``POST /pause``: stops the background thread; returns /state.
+
+    Frames are packed binary arrays (see frames.Keyframe / DeltaFrame),
+    gzip-compressed when the client accepts it, or JSON with
+    ``?format=json``. Every frame has an ETag built from its turn, so
+    If-None-Match gets a 304. A delta older than the kept history answers
+    410: the client reloads the keyframe.
+
+    Args:
+        sim (Simulation): Simulation to serve; it is stepped through /step and /run.
+        history (int): Turns of deltas kept.
+        cors (bool): Allow any origin (needs flask-cors).
+        run (bool): Start playing turns on the background thread right away.
+        turns_per_second (Optional[float]): Initial speed of the background thread.
+        max_gap (int): Deltas a stream subscriber may fall behind before getting a keyframe.
+        max_turns (int): Most turns a single /step may ask for (they run in the request thread).
+    """
+    service = SimulationService(sim, history)
+    runner = SimulationRunner(service, turns_per_second)
+    cache = FrameCache(2 * history)
+    app = Flask(__name__)
+    app.extensions["simulation"] = service
+    app.extensions["simulation_runner"] = runner
+    if cors and CORS is not None:
+        CORS(app)
+
+    def state_response() -> Response:
+        return jsonify({**service.state(), "running": runner.running,
+                        "turns_per_second": runner.turns_per_second})
+
+    @app.get("/state")
+    def state():
+        return state_response()
+
+    @app.post("/step")
+    def step():
+        body: Dict[str, Any] = request.get_json(silent=True) or {}
+        try:
+            turns = _turns_arg(body, max_turns)
+        except ValueError as e:
+            return _error(400, str(e))
+        service.step(turns)
+        return state_response()
+
+    @app.get("/keyframe")
+    def keyframe():
+        frame = service.keyframe()
+        return _frames_response([frame], f"key-{frame.turn}", "no-cache")
+
+    @app.get("/delta/<int:turn>")
+    def delta(turn: int):
+        try:
+            frame = service.delta(turn)
+        except FrameGone:
+            return _error(410, f"Turn {turn} is no longer kept", keyframe="/keyframe")
+        except KeyError:
+            return _error(404, f"Turn {turn} has not been played")
+        return _frames_response([frame], f"delta-{turn}", _IMMUTABLE)
+
+    @app.get("/deltas")
+    def deltas():
+        since: Optional[int] = request.args.get("since", type=int)
+        if since is None:
+            return _error(400, "since is required")
+        try:
+            frames = service.deltas_since(since)
+        except FrameGone:
+            return _error(410, f"Turn {since + 1} is no longer kept", keyframe="/keyframe")
+        except KeyError:
+            return _error(404, f"Turn {since} has not been played")
+        until = frames[-1].turn if frames else since
+        return _frames_response(frames, f"deltas-{since}-{until}", "no-cache")
+
+    @app.get("/stream")
+    def stream():
+        since = request.args.get("since", type=int)
+        if since is None:
+            since = request.headers.get("Last-Event-ID", type=int)
+        fmt = "json" if request.args.get("format") == "json" else "binary"
+        response = Response(sse_events(service, cache, since, fmt, max_gap),
+                            mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        # Sin buffer en proxies (nginx) para que cada turno salga en cuanto se genera
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    @app.post("/run")
+    def run_turns():
+        body: Dict[str, Any] = request.get_json(silent=True) or {}
+        if "turns_per_second" in body:
+            try:
+                rate = body["turns_per_second"]
+                runner.turns_per_second = None if rate is None else float(rate)
+            except (TypeError, ValueError):
+                return _error(400, "turns_per_second must be a positive number or null")
+        runner.start()
+        return state_response()
+
+    @app.post("/pause")
+    def pause():
+        runner.stop()
+        return state_response()
+
+    if run:
+        runner.start()
+    return app
+
+
+# Campos de RunSpec que puede fijar un cliente al crear una sesion
+_SESSION_SPEC_FIELDS = {
+    "seed": int, "width": int, "height": int, "layout": str, "density": float, "backend": str,
+    "engine": str, "topology": str, "neighbourhood": str, "max_conflict_rounds": int,
+}
+# Valores permitidos desde HTTP. Sin ENGINE_TILED: cada sesion arrancaria un pool de
+# procesos y memoria compartida, otra vez cada vez que se cargue tras un desalojo
+_SESSION_CHOICES = {
+    "layout": (LAYOUT_RANDOM, LAYOUT_DIAGONAL, LAYOUT_TRIPLE),
+    "backend": (Grid.BACKEND_ARRAY, Grid.BACKEND_SPARSE, Grid.BACKEND_DICT),
+    "engine": (Simulation.ENGINE_VECTORIZED, Simulation.ENGINE_PYTHON),
+    "topology": (Grid.TOPOLOGY_BOUNDED, Grid.TOPOLOGY_TORUS),
+    "neighbourhood": (Grid.NEIGHBOURHOOD_MOORE, Grid.NEIGHBOURHOOD_VON_NEUMANN),
+}
+_MAX_CONFLICT_ROUNDS = 64
+
+
+def _session_spec(body: Dict[str, Any], max_cells: int, max_organisms: int) -> RunSpec:
+    """
+    RunSpec of a new session from the fields of a request, checked against
+    the allowed values and limits.
+
+    Raises:
+        ValueError: If a field has the wrong type, is not allowed or is out of range.
+    """
+    fields: Dict[str, Any] = {}
+    for name, kind in _SESSION_SPEC_FIELDS.items():
+        if name not in body:
+            continue
+        try:
+            fields[name] = kind(body[name])
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"Invalid value for '{name}'")
+        choices = _SESSION_CHOICES.get(name)
+        if choices is not None and fields[name] not in choices:
+            raise ValueError(f"'{name}' must be one of: {', '.join(choices)}")
+    spec = RunSpec(run_id=0, seed=fields.pop("seed", 0), **fields)
+    if spec.width < 1 or spec.height < 1 or spec.width * spec.height > max_cells:
+        raise ValueError(f"The grid must have between 1 and {max_cells} cells")
+    if not 0 < spec.density <= 1:  # tambien rechaza NaN
+        raise ValueError("density must be in (0, 1]")
+    if not 1 <= spec.max_conflict_rounds <= _MAX_CONFLICT_ROUNDS:
+        raise ValueError(f"max_conflict_rounds must be between 1 and {_MAX_CONFLICT_ROUNDS}")
+    n_cells = spec.width * spec.height
+    if spec.layout == LAYOUT_RANDOM:
+        n_orgs = min(n_cells, max(1, int(round(n_cells * spec.density))))
+    else:
+        n_orgs = len(layout_cells(spec))
+    if n_orgs > max_organisms:
+        raise ValueError(f"A session can have at most {max_organisms} organisms")
+    return spec
+
+
+class _HostBusy(Exception):
+    """The host did not answer a request in time."""
+
+
+def _start_loop() -> asyncio.AbstractEventLoop:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="simulation-host-loop", daemon=True).start()
+    return loop
+
+
+def create_host_app(host: SimulationHost, loop: Optional[asyncio.AbstractEventLoop] = None,
+                    cors: bool = True, max_cells: int = 4_000_000,
+                    max_organisms: int = 400_000, max_turns: int = 1000,
+                    timeout: float = 60.0) -> Flask:
+    """
+    HTTP API of a SimulationHost: one simulation per session.
+
+    - ``POST /sessions``: new session from RunSpec fields (seed, width,
+      height, density, backend, engine, topology...) and an optional
+      ``id``; 201 with its state. Only the array, sparse and dict backends
+      and the vectorized and python engines are accepted (the default is
+      array + vectorized); the tiled engine is never started from HTTP.
+    - ``GET /sessions``: every session id, least recently used first, and
+      whether it is in memory.
+    - ``GET /sessions/<id>``: JSON summary (turn, size, totals).
+    - ``POST /sessions/<id>/step``: runs ``{"turns": n}`` turns (default 1,
+      at most ``max_turns``).
+    - ``GET /sessions/<id>/keyframe``: every organism, as ``GET /keyframe``.
+    - ``DELETE /sessions/<id>``: drops the session and its snapshot.
+
+    The host lives on an asyncio event loop in its own thread; request
+    threads hand their coroutine to it and wait for the result, at most
+    ``timeout`` seconds: then they answer 503 and the operation finishes
+    on its own (it is not cancelled, the session stays consistent).
+    Evicted sessions are loaded back by the first request that uses them.
+
+    Args:
+        host (SimulationHost): Sessions to serve.
+        loop (Optional[asyncio.AbstractEventLoop]): Running loop of the host, a new one on a thread if None.
+        cors (bool): Allow any origin (needs flask-cors).
+        max_cells (int): Largest grid (width * height) a client may create.
+        max_organisms (int): Most organisms a client may place in a session.
+        max_turns (int): Most turns a single step request may ask for.
+        timeout (float): Seconds a request waits for the host.
+    """
+    if loop is None:
+        loop = _start_loop()
+    app = Flask(__name__)
+    app.extensions["simulation_host"] = host
+    if cors and CORS is not None:
+        CORS(app)
+
+    def call(coro: Awaitable) -> Any:
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # No se cancela: cancelar soltaria el cerrojo de la sesion con el turno aun en marcha
+            raise _HostBusy()
+
+    @app.errorhandler(SessionNotFound)
+    def session_not_found(e: SessionNotFound):
+        return _error(404, f"Session {e.args[0]} not found")
+
+    @app.errorhandler(_HostBusy)
+    def host_busy(e: _HostBusy):
+        response = _error(503, "The session is busy, try again later")
+        response.headers["Retry-After"] = str(max(int(timeout), 1))
+        return response
+
+    @app.post("/sessions")
+    def create_session():
+        body: Dict[str, Any] = request.get_json(silent=True) or {}
+        try:
+            spec = _session_spec(body, max_cells, max_organisms)
+            session_id = call(host.create(spec, body.get("id")))
+        except ValueError as e:
+            return _error(400, str(e))
+        response = jsonify(call(host.state(session_id)))
+        response.status_code = 201
+        return response
+
+    @app.get("/sessions")
+    def list_sessions():
+        async def listing():
+            return [{"id": session_id, "resident": host.is_resident(session_id)}
+                    for session_id in host.sessions]
+        return jsonify(call(listing()))
+
+    @app.get("/sessions/<session_id>")
+    def session_state(session_id: str):
+        return jsonify(call(host.state(session_id)))
+
+    @app.post("/sessions/<session_id>/step")
+    def session_step(session_id: str):
+        body: Dict[str, Any] = request.get_json(silent=True) or {}
+        try:
+            turns = _turns_arg(body, max_turns)
+        except ValueError as e:
+            return _error(400, str(e))
+        return jsonify(call(host.step(session_id, turns)))
+
+    @app.get("/sessions/<session_id>/keyframe")
+    def session_keyframe(session_id: str):
+        frame = call(host.keyframe(session_id))
+        return _frames_response([frame], f"{session_id}-key-{frame.turn}", "no-cache")
+
+    @app.delete("/sessions/<session_id>")
+    def remove_session(session_id: str):
+        call(host.remove(session_id))
+        return Response(status=204)
+
+    return app
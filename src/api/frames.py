@@ -0,0 +1,213 @@
+import struct
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.logic.neighbourhood import STAY, direction_codes, step_cells
+from src.logic.observer import SimulationObserver
+from src.logic.simulation import Simulation
+
+# Cabecera binaria comun: MAGIC, tipo, flags, turno, ancho, alto y tres contadores.
+# 40 bytes: los arrays que siguen quedan alineados a 8 (TypedArray en el navegador)
+MAGIC = b"LFRM"
+KIND_KEYFRAME = 0
+KIND_DELTA = 1
+FLAG_WIDE_CELLS = 1   # celdas en uint64 (grids de mas de 2**32 celdas)
+_HEADER = struct.Struct("<4sBBxxQIIQQ")
+
+_ID_DTYPE = np.dtype("<i8")
+
+
+def _cell_dtype(flags: int) -> np.dtype:
+    return np.dtype("<u8") if flags & FLAG_WIDE_CELLS else np.dtype("<u4")
+
+
+def _flags(width: int, height: int) -> int:
+    return FLAG_WIDE_CELLS if width * height > np.iinfo(np.uint32).max else 0
+
+
+class Keyframe(NamedTuple):
+    """
+    Every organism of a turn: ``ids[i]`` is at flat cell ``cells[i]``
+    (row * width + col). Deltas refer to organisms in this order.
+    """
+    turn: int
+    width: int
+    height: int
+    ids: np.ndarray
+    cells: np.ndarray
+
+    def encode(self) -> bytes:
+        flags = _flags(self.width, self.height)
+        return b"".join((
+            _HEADER.pack(MAGIC, KIND_KEYFRAME, flags, self.turn, self.width, self.height, len(self.ids), 0),
+            self.ids.astype(_ID_DTYPE).tobytes(),
+            self.cells.astype(_cell_dtype(flags)).tobytes(),
+        ))
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"kind": "keyframe", "turn": self.turn, "width": self.width, "height": self.height,
+                "ids": self.ids.tolist(), "cells": self.cells.tolist()}
+
+
+class DeltaFrame(NamedTuple):
+    """
+    Changes from turn - 1 to ``turn``, relative to the organism table of the
+    previous frame:
+
+    1. drop the organisms in ``removed_ids`` (the order of the rest is kept),
+    2. move the i-th remaining organism one step in direction
+       ``directions[i]`` ((d_row + 1) * 3 + (d_col + 1), STAY = 4),
+    3. append ``added_ids`` at ``added_cells``.
+
+    The changed cells are the origin and destination of every step plus
+    the cells of the removed and added organisms.
+    """
+    turn: int
+    width: int
+    height: int
+    directions: np.ndarray
+    removed_ids: np.ndarray
+    added_ids: np.ndarray
+    added_cells: np.ndarray
+
+    def encode(self) -> bytes:
+        flags = _flags(self.width, self.height)
+        return b"".join((
+            _HEADER.pack(MAGIC, KIND_DELTA, flags, self.turn, self.width, self.height,
+                         len(self.removed_ids), len(self.added_ids)),
+            struct.pack("<Q", len(self.directions)),
+            self.removed_ids.astype(_ID_DTYPE).tobytes(),
+            self.added_ids.astype(_ID_DTYPE).tobytes(),
+            self.added_cells.astype(_cell_dtype(flags)).tobytes(),
+            self.directions.astype(np.uint8).tobytes(),
+        ))
+
+    def to_json(self) -> Dict[str, Any]:
+        # Solo los organismos que se mueven: indice en la tabla y direccion
+        moved = np.flatnonzero(self.directions != STAY)
+        return {"kind": "delta", "turn": self.turn, "moved": moved.tolist(),
+                "directions": self.directions[moved].tolist(), "removed_ids": self.removed_ids.tolist(),
+                "added_ids": self.added_ids.tolist(), "added_cells": self.added_cells.tolist()}
+
+    def apply(self, ids: np.ndarray, cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Organism table of this turn from the one of the previous frame (what a client does)."""
+        keep = ~np.isin(ids, self.removed_ids)
+        moved = step_cells(cells[keep], self.directions, self.width, self.height)
+        return np.r_[ids[keep], self.added_ids], np.r_[moved, self.added_cells]
+
+
+def decode_frames(data: bytes) -> List[Any]:
+    """
+    Decodes one or more concatenated binary frames (Keyframe / DeltaFrame).
+
+    Raises:
+        ValueError: If the data is not a frame stream.
+    """
+    frames: List[Any] = []
+    offset = 0
+    while offset < len(data):
+        magic, kind, flags, turn, width, height, n_a, n_b = _HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            raise ValueError("Not a frame stream")
+        offset += _HEADER.size
+        cell_dtype = _cell_dtype(flags)
+
+        def take(dtype: np.dtype, count: int) -> np.ndarray:
+            nonlocal offset
+            array = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += count * np.dtype(dtype).itemsize
+            return array.astype(np.int64)
+
+        if kind == KIND_KEYFRAME:
+            ids = take(_ID_DTYPE, n_a)
+            frames.append(Keyframe(turn, width, height, ids, take(cell_dtype, n_a)))
+        elif kind == KIND_DELTA:
+            (n_dirs,) = struct.unpack_from("<Q", data, offset)
+            offset += 8
+            removed = take(_ID_DTYPE, n_a)
+            added = take(_ID_DTYPE, n_b)
+            added_cells = take(cell_dtype, n_b)
+            directions = take(np.uint8, n_dirs).astype(np.uint8)
+            frames.append(DeltaFrame(turn, width, height, directions, removed, added, added_cells))
+        else:
+            raise ValueError(f"Unknown frame kind {kind}")
+    return frames
+
+
+class FrameRecorder(SimulationObserver):
+    """
+    Observer that keeps the organism table it last described and, after
+    every turn, the DeltaFrame to the new one (the last ``history`` turns).
+    Clients load keyframe() once and then follow the deltas.
+    """
+
+    def __init__(self, history: int = 256) -> None:
+        self._history: Deque[DeltaFrame] = deque(maxlen=history)
+        self._turn = 0
+        self._width = 0
+        self._height = 0
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._cells = np.zeros(0, dtype=np.int64)
+
+    @property
+    def turn(self) -> int:
+        """Turn of the last recorded frame."""
+        return self._turn
+
+    @property
+    def oldest_delta(self) -> Optional[int]:
+        """Turn of the oldest delta still kept, None if there is none."""
+        return self._history[0].turn if self._history else None
+
+    @staticmethod
+    def _table(sim: Simulation) -> Tuple[np.ndarray, np.ndarray]:
+        registry = sim.grid.registry
+        positions = registry.positions
+        return registry.ids.copy(), positions[:, 0] * sim.grid.width + positions[:, 1]
+
+    def on_start(self, sim: Simulation) -> None:
+        self._width, self._height = sim.grid.width, sim.grid.height
+        self._turn = sim.turn
+        self._ids, self._cells = self._table(sim)
+
+    def on_turn_end(self, sim: Simulation) -> None:
+        ids, cells = self._table(sim)
+
+        # Posicion actual de cada organismo de la tabla anterior
+        order = np.argsort(ids)
+        pos = np.minimum(np.searchsorted(ids[order], self._ids), max(len(ids) - 1, 0))
+        present = ids[order][pos] == self._ids if len(ids) else np.zeros(len(self._ids), dtype=bool)
+        prev_cells = self._cells[present]
+        new_cells = cells[order[pos[present]]]
+        directions = direction_codes(prev_cells, new_cells, self._width)
+        # Lo que no es un paso a una vecina (recolocado a mano) sale y vuelve a entrar
+        teleported = step_cells(prev_cells, directions, self._width, self._height) != new_cells
+        present[np.flatnonzero(present)[teleported]] = False
+
+        kept_ids = self._ids[present]
+        added = ~np.isin(ids, kept_ids)
+        delta = DeltaFrame(sim.turn, self._width, self._height,
+                           directions[~teleported], self._ids[~present], ids[added], cells[added])
+        self._history.append(delta)
+        self._turn = sim.turn
+        self._ids = np.r_[kept_ids, ids[added]]
+        self._cells = np.r_[new_cells[~teleported], cells[added]]
+
+    def keyframe(self) -> Keyframe:
+        return Keyframe(self._turn, self._width, self._height, self._ids.copy(), self._cells.copy())
+
+    def delta(self, turn: int) -> DeltaFrame:
+        """
+        Raises:
+            KeyError: If the turn has not been recorded or is no longer kept.
+        """
+        oldest = self.oldest_delta
+        if oldest is None or not oldest <= turn <= self._turn:
+            raise KeyError(turn)
+        return self._history[turn - oldest]
+
+    def deltas_since(self, turn: int) -> List[DeltaFrame]:
+        """Deltas of the turns after ``turn``, in order."""
+        return [self.delta(t) for t in range(turn + 1, self._turn + 1)]
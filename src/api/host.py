@@ -0,0 +1,258 @@
+import asyncio
+import os
+import re
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from src.logic.checkpoint import load_checkpoint, save_checkpoint
+from src.logic.ensemble import RunSpec, build_run
+from src.logic.simulation import Simulation
+from .frames import Keyframe
+from .service import simulation_summary
+
+# Lo que ocupan los objetos Python de una simulacion (medido con tracemalloc)
+_ORGANISM_BYTES = 650       # Organism, su posicion y su CellView
+_DICT_CELL_BYTES = 180      # GridCell del backend dict y su tupla de posicion
+
+SNAPSHOT_SUFFIX = ".ckpt"
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionNotFound(KeyError):
+    """No session with that id, in memory or on disk."""
+
+
+def simulation_nbytes(sim: Simulation) -> int:
+    """
+    Approximate memory of a simulation: its cell and neighbour arrays plus
+    an estimate of its Python objects (organisms, and cells of the dict
+    backend).
+    """
+    grid = sim.grid
+    nbytes = len(grid.organisms) * _ORGANISM_BYTES
+    if grid.neighbour_table is not None:
+        nbytes += grid.neighbour_table.nbytes
+    store = grid.store
+    if store is None:
+        nbytes += grid.width * grid.height * _DICT_CELL_BYTES
+    elif hasattr(store, "nbytes"):
+        nbytes += store.nbytes
+    else:
+        nbytes += store.state.nbytes + store.occupant.nbytes + store.symbol.nbytes
+    return nbytes
+
+
+class _Session:
+    __slots__ = ("id", "sim", "lock", "nbytes")
+
+    def __init__(self, session_id: str, sim: Optional[Simulation] = None) -> None:
+        self.id = session_id
+        self.sim = sim
+        # Una operacion a la vez por sesion: turnos, carga y desalojo no se solapan
+        self.lock = asyncio.Lock()
+        self.nbytes = simulation_nbytes(sim) if sim is not None else 0
+
+
+class SimulationHost:
+    """
+    Hosts many independent simulations (one per user session) from an
+    asyncio event loop.
+
+    Turns, loads and snapshots run on a thread pool, so the loop never
+    waits for pass_turn; each session runs one operation at a time. The
+    simulations in memory are kept under ``memory_budget`` (see
+    simulation_nbytes): when it is exceeded, the least recently used idle
+    sessions are saved to ``snapshot_dir`` and dropped from memory. They
+    are loaded again, with the same turn and random state, the next time
+    they are used. Snapshots found in ``snapshot_dir`` at start are
+    hosted as evicted sessions, so sessions outlive the process.
+
+    Every method must be awaited on the same event loop.
+
+    Args:
+        snapshot_dir (str): Directory of the evicted sessions (created if missing).
+        memory_budget (int): Bytes of simulations kept in memory.
+        max_workers (Optional[int]): Threads that run turns, ThreadPoolExecutor's default if None.
+    """
+
+    def __init__(self, snapshot_dir: str, memory_budget: int = 1 << 30,
+                 max_workers: Optional[int] = None) -> None:
+        self._snapshot_dir = snapshot_dir
+        self._memory_budget = memory_budget
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="simulation-host")
+        # Orden LRU: la sesion usada menos recientemente va primero
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._resident_bytes = 0
+        os.makedirs(snapshot_dir, exist_ok=True)
+        for name in sorted(os.listdir(snapshot_dir)):
+            session_id = name[:-len(SNAPSHOT_SUFFIX)]
+            if name.endswith(SNAPSHOT_SUFFIX) and _SESSION_ID.match(session_id):
+                self._sessions[session_id] = _Session(session_id)
+
+    @property
+    def memory_budget(self) -> int:
+        return self._memory_budget
+
+    @property
+    def resident_bytes(self) -> int:
+        """Estimated bytes of the simulations in memory."""
+        return self._resident_bytes
+
+    @property
+    def sessions(self) -> List[str]:
+        """Ids of every session, least recently used first."""
+        return list(self._sessions)
+
+    def is_resident(self, session_id: str) -> bool:
+        return self._session(session_id).sim is not None
+
+    def _session(self, session_id: str) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFound(session_id)
+        return session
+
+    def _snapshot_path(self, session_id: str) -> str:
+        return os.path.join(self._snapshot_dir, session_id + SNAPSHOT_SUFFIX)
+
+    async def _run(self, fn, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def create(self, source: Union[RunSpec, Simulation], session_id: Optional[str] = None) -> str:
+        """
+        Hosts a new simulation, built from a RunSpec on the pool or given.
+
+        Returns:
+            str: The session id (a new random one if not given).
+
+        Raises:
+            ValueError: If the id is not 1-64 letters, digits, "_" or "-", or is already in use.
+        """
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+        if not isinstance(session_id, str) or not _SESSION_ID.match(session_id):
+            raise ValueError("Session ids are 1-64 letters, digits, '_' or '-'")
+        if session_id in self._sessions:
+            raise ValueError(f"Session '{session_id}' already exists")
+        sim = await self._run(build_run, source) if isinstance(source, RunSpec) else source
+        if session_id in self._sessions:
+            raise ValueError(f"Session '{session_id}' already exists")
+        session = self._sessions[session_id] = _Session(session_id, sim)
+        self._resident_bytes += session.nbytes
+        await self._evict(keep=session)
+        return session_id
+
+    @asynccontextmanager
+    async def _use(self, session_id: str) -> AsyncIterator[Simulation]:
+        """The simulation of a session, loaded if needed, held until the block ends."""
+        session = self._session(session_id)
+        async with session.lock:
+            if self._sessions.get(session_id) is not session:
+                # Borrada mientras se esperaba el cerrojo
+                raise SessionNotFound(session_id)
+            self._sessions.move_to_end(session_id)
+            if session.sim is None:
+                sim = await self._run(partial(load_checkpoint, self._snapshot_path(session_id),
+                                              observers=[], mmap_mode=None))
+                session.sim, session.nbytes = sim, simulation_nbytes(sim)
+                self._resident_bytes += session.nbytes
+            yield session.sim
+            nbytes = simulation_nbytes(session.sim)
+            self._resident_bytes += nbytes - session.nbytes
+            session.nbytes = nbytes
+        await self._evict(keep=session)
+
+    async def _evict(self, keep: Optional[_Session]) -> None:
+        # Se desalojan las sesiones ociosas mas antiguas hasta volver al presupuesto
+        for session in list(self._sessions.values()):
+            if self._resident_bytes <= self._memory_budget:
+                return
+            if session is keep or session.sim is None or session.lock.locked():
+                continue
+            async with session.lock:
+                if session.sim is None or self._sessions.get(session.id) is not session:
+                    continue
+                # Solo la tabla de organismos: las celdas se reconstruyen al cargar
+                await self._run(save_checkpoint, session.sim, self._snapshot_path(session.id), False)
+                session.sim.close()
+                session.sim = None
+                self._resident_bytes -= session.nbytes
+                session.nbytes = 0
+
+    async def step(self, session_id: str, turns: int = 1) -> Dict[str, Any]:
+        """
+        Runs ``turns`` turns of a session on the pool.
+
+        Returns:
+            Dict[str, Any]: The new state (see state).
+
+        Raises:
+            SessionNotFound: If there is no such session.
+            ValueError: If ``turns`` is not positive.
+        """
+        if turns < 1:
+            raise ValueError("turns must be >= 1")
+        async with self._use(session_id) as sim:
+            await self._run(sim.run, turns, turns)
+            return self._summary(session_id, sim)
+
+    async def state(self, session_id: str) -> Dict[str, Any]:
+        """
+        Summary of a session (turn, size, totals). Loads it if it was evicted.
+
+        Raises:
+            SessionNotFound: If there is no such session.
+        """
+        async with self._use(session_id) as sim:
+            return self._summary(session_id, sim)
+
+    async def keyframe(self, session_id: str) -> Keyframe:
+        """
+        Every organism of a session (ids, flat cells), as in the single simulation API.
+
+        Raises:
+            SessionNotFound: If there is no such session.
+        """
+        async with self._use(session_id) as sim:
+            grid = sim.grid
+            registry = grid.registry
+            positions = registry.positions
+            return Keyframe(sim.turn, grid.width, grid.height, registry.ids.copy(),
+                            positions[:, 0] * grid.width + positions[:, 1])
+
+    def _summary(self, session_id: str, sim: Simulation) -> Dict[str, Any]:
+        return {"id": session_id, **simulation_summary(sim)}
+
+    async def remove(self, session_id: str) -> None:
+        """
+        Drops a session and its snapshot.
+
+        Raises:
+            SessionNotFound: If there is no such session.
+        """
+        session = self._session(session_id)
+        async with session.lock:
+            if self._sessions.get(session_id) is not session:
+                raise SessionNotFound(session_id)
+            del self._sessions[session_id]
+            if session.sim is not None:
+                session.sim.close()
+                self._resident_bytes -= session.nbytes
+            path = self._snapshot_path(session_id)
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def close(self, save: bool = True) -> None:
+        """
+        Stops the host, once no operation is running. With ``save`` the
+        sessions in memory are written to ``snapshot_dir`` first, so a new
+        host on that directory resumes them.
+        """
+        if save:
+            self._memory_budget = -1
+            await self._evict(keep=None)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,107 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+from src.logic.simulation import Simulation
+from .frames import DeltaFrame, FrameRecorder, Keyframe
+
+
+class FrameGone(KeyError):
+    """The requested delta is older than the kept history: reload the keyframe."""
+
+
+def simulation_summary(sim: Simulation) -> Dict[str, Any]:
+    """Turn, size, settings and totals of a simulation, as plain JSON values."""
+    grid = sim.grid
+    return {
+        "turn": sim.turn,
+        "width": grid.width,
+        "height": grid.height,
+        "topology": grid.topology,
+        "neighbourhood": grid.neighbourhood,
+        "n_organisms": len(grid.organisms),
+        "totals": dict(zip(("n_moves", "n_conflicts", "n_blocked", "n_conflict_rounds"),
+                           sim._totals()[1:])),
+    }
+
+
+class SimulationService:
+    """
+    A Simulation shared by the request handlers. Every access goes through
+    one lock, so turns never run while a frame is being read.
+
+    Args:
+        sim (Simulation): Simulation to serve.
+        history (int): Turns of deltas kept for clients that fall behind.
+    """
+
+    def __init__(self, sim: Simulation, history: int = 256) -> None:
+        self._sim = sim
+        self._lock = threading.RLock()
+        # Se notifica despues de cada turno; los suscriptores esperan aqui sin tener el cerrojo
+        self._turn_changed = threading.Condition(self._lock)
+        self._recorder = FrameRecorder(history)
+        sim.add_observer(self._recorder)
+
+    @property
+    def sim(self) -> Simulation:
+        return self._sim
+
+    @property
+    def lock(self) -> threading.RLock:
+        return self._lock
+
+    @property
+    def turn(self) -> int:
+        return self._recorder.turn
+
+    def state(self) -> Dict[str, Any]:
+        """Summary of the simulation (what the old ``get_state`` was meant to return)."""
+        with self._lock:
+            return {**simulation_summary(self._sim), "oldest_delta": self._recorder.oldest_delta}
+
+    def step(self, n_turns: int = 1) -> int:
+        """Runs ``n_turns`` turns and returns the new turn number."""
+        for _ in range(n_turns):
+            with self._lock:
+                self._sim.pass_turn()
+                self._turn_changed.notify_all()
+        return self.turn
+
+    def wait_for_turn(self, after: int, timeout: Optional[float] = None) -> int:
+        """
+        Blocks until a turn later than ``after`` has been recorded (or the
+        timeout expires) and returns the last recorded turn.
+        """
+        with self._turn_changed:
+            self._turn_changed.wait_for(lambda: self._recorder.turn > after, timeout)
+            return self._recorder.turn
+
+    def keyframe(self) -> Keyframe:
+        with self._lock:
+            return self._recorder.keyframe()
+
+    def delta(self, turn: int) -> DeltaFrame:
+        """
+        Raises:
+            KeyError: If the turn has not been played yet.
+            FrameGone: If the turn is no longer in the history.
+        """
+        with self._lock:
+            return self._deltas(turn - 1, turn)[0]
+
+    def deltas_since(self, turn: int) -> List[DeltaFrame]:
+        """
+        Raises:
+            KeyError: If ``turn`` is in the future.
+            FrameGone: If some of the deltas are no longer in the history.
+        """
+        with self._lock:
+            return self._deltas(turn, self._recorder.turn)
+
+    def _deltas(self, since: int, until: int) -> List[DeltaFrame]:
+        if until > self._recorder.turn or since > self._recorder.turn:
+            raise KeyError(until)
+        oldest = self._recorder.oldest_delta
+        if since < until and (oldest is None or since + 1 < oldest):
+            raise FrameGone(since + 1)
+        return [self._recorder.delta(t) for t in range(since + 1, until + 1)]
@@ -0,0 +1,161 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterator, List, Optional, Tuple
+
+from .service import FrameGone, SimulationService
+
+
+class SimulationRunner:
+    """
+    Runs the turns of a SimulationService on a background thread. Each
+    turn takes the service lock only while it is played; subscribers are
+    woken up afterwards and read the frames on their own threads, so the
+    speed of the simulation does not depend on how many clients there are
+    or on how fast they read.
+
+    Args:
+        service (SimulationService): Service whose simulation is played.
+        turns_per_second (Optional[float]): Speed limit, None to run as fast as possible.
+    """
+
+    def __init__(self, service: SimulationService, turns_per_second: Optional[float] = None) -> None:
+        self._service = service
+        self._turns_per_second = turns_per_second
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Despierta al hilo cuando se pausa o cambia la velocidad a mitad de una espera
+        self._wakeup = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def turns_per_second(self) -> Optional[float]:
+        return self._turns_per_second
+
+    @turns_per_second.setter
+    def turns_per_second(self, value: Optional[float]) -> None:
+        if value is not None and value <= 0:
+            raise ValueError("turns_per_second must be positive")
+        self._turns_per_second = value
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="simulation-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops after the turn in progress."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        next_turn = time.monotonic()
+        while not self._stop.is_set():
+            self._service.step()
+            rate = self._turns_per_second
+            if rate is None:
+                # Cede el GIL para que los suscriptores lleguen al cerrojo entre turnos
+                time.sleep(0)
+                next_turn = time.monotonic()
+                continue
+            # Ritmo fijo; si un turno tarda mas que el periodo no se intenta recuperar
+            next_turn = max(next_turn + 1.0 / rate, time.monotonic())
+            self._wakeup.clear()
+            self._wakeup.wait(max(next_turn - time.monotonic(), 0.0))
+
+
+class FrameCache:
+    """
+    Encoded frames by (kind, turn), shared by every subscriber: a frame is
+    encoded once whatever the number of clients that receive it.
+
+    Args:
+        size (int): Frames kept.
+    """
+
+    def __init__(self, size: int = 512) -> None:
+        self._size = size
+        self._lock = threading.Lock()
+        self._frames: "OrderedDict[Tuple[str, int, str], str]" = OrderedDict()
+
+    def get(self, frame: Any, fmt: str) -> str:
+        key = (type(frame).__name__, frame.turn, fmt)
+        with self._lock:
+            data = self._frames.get(key)
+            if data is not None:
+                self._frames.move_to_end(key)
+                return data
+        if fmt == "json":
+            data = json.dumps(frame.to_json(), separators=(",", ":"))
+        else:
+            data = base64.b64encode(frame.encode()).decode("ascii")
+        with self._lock:
+            self._frames[key] = data
+            if len(self._frames) > self._size:
+                self._frames.popitem(last=False)
+        return data
+
+
+def _sse(event: str, turn: int, payloads: List[str]) -> str:
+    # Un evento con un frame por linea "data:"; el cliente las separa por "\n"
+    lines = "".join(f"data: {payload}\n" for payload in payloads)
+    return f"event: {event}\nid: {turn}\n{lines}\n"
+
+
+def sse_events(service: SimulationService, cache: FrameCache, since: Optional[int] = None,
+               fmt: str = "binary", max_gap: int = 32, heartbeat: float = 15.0) -> Iterator[str]:
+    """
+    Server-Sent Events of the turns of a service.
+
+    The subscriber keeps no queue, only the last turn it has sent. When it
+    wakes up it sends everything played since then in one event: the
+    pending deltas (``event: delta``, one frame per data line, base64
+    binary or JSON) or, if it is more than ``max_gap`` turns behind or the
+    deltas are no longer kept, the current keyframe (``event: keyframe``).
+    A slow client thus receives fewer, coalesced events while the
+    simulation runs at its own speed. The event id is the turn, so a
+    reconnecting EventSource resumes through Last-Event-ID.
+
+    Args:
+        service (SimulationService): Service to follow.
+        cache (FrameCache): Encoded frames shared with the other subscribers.
+        since (Optional[int]): Last turn the client has, None to start with a keyframe.
+        fmt (str): "binary" (base64 frames, see frames.decode_frames) or "json".
+        max_gap (int): Most deltas sent in one event before sending a keyframe instead.
+        heartbeat (float): Seconds without turns before a keep-alive comment.
+    """
+    # Un turno futuro (p. ej. Last-Event-ID de otro servidor) empieza de cero
+    last = since if since is not None and since <= service.turn else None
+    while True:
+        if last is None:
+            turn = service.turn
+        else:
+            turn = service.wait_for_turn(last, heartbeat)
+            if turn <= last:
+                yield ": keep-alive\n\n"
+                continue
+
+        frames: List[Any] = []
+        if last is not None and turn - last <= max_gap:
+            try:
+                frames = service.deltas_since(last)
+            except (FrameGone, KeyError):
+                frames = []
+        if frames:
+            event = "delta"
+        else:
+            frames = [service.keyframe()]
+            event = "keyframe"
+        last = frames[-1].turn
+        yield _sse(event, last, [cache.get(frame, fmt) for frame in frames])
@@ -0,0 +1,11 @@
+"""
+Benchmarks of the simulation.
+
+Run from the project root:
+
+    python -m src.bench --help          # turns/sec
+    python -m src.bench.memory --help   # bytes per cell
+"""
+from .turns import (BenchCase, BenchResult, build_matrix, build_simulation, compare_results,
+                    load_results, run_case, run_matrix, save_results)
+from .memory import MemoryResult, measure_grid_memory
@@ -0,0 +1,68 @@
+import argparse
+from typing import List, Tuple
+
+from .turns import (BenchResult, build_matrix, compare_results, load_results, run_matrix,
+                    save_results)
+
+# Matrices predefinidas: (tamaños, densidades, semillas)
+PRESETS = {
+    "quick": ([10, 100, 500], [0.01, 0.1, 0.5, 0.9], [0]),
+    "full": ([10, 100, 1000, 2000, 4000], [0.01, 0.1, 0.3, 0.5, 0.9], [0, 1, 2]),
+}
+
+
+def _config(text: str) -> Tuple[str, str]:
+    backend, _, engine = text.partition(":")
+    if not engine:
+        raise argparse.ArgumentTypeError(f"expected BACKEND:ENGINE, got '{text}'")
+    return backend, engine
+
+
+def _print_result(r: BenchResult) -> None:
+    if r.error:
+        print(f"{r.key:<40} ERROR {r.error}", flush=True)
+        return
+    phases = " ".join(f"{p}={s / max(r.turns, 1) * 1000:.2f}ms" for p, s in r.phase_seconds.items())
+    rss = f"{r.peak_rss_bytes / 2**20:.0f}MiB" if r.peak_rss_bytes else "-"
+    print(f"{r.key:<40} orgs={r.n_organisms:<9} {r.turns_per_second:10.2f} turns/s  "
+          f"rounds={r.n_conflict_rounds:<5} rss={rss:<8} {phases}", flush=True)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.bench",
+                                     description="Headless turn throughput over grid sizes and densities.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Grid sides (size x size), overrides the preset")
+    parser.add_argument("--densities", type=float, nargs="+", help="Occupied fraction, overrides the preset")
+    parser.add_argument("--seeds", type=int, nargs="+", help="Seeds, overrides the preset")
+    parser.add_argument("--config", type=_config, action="append", dest="configs",
+                        help="BACKEND:ENGINE, repeatable (default array:vectorized)")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--max-seconds", type=float, default=None, help="Timed budget per case")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record the tracemalloc peak (slower, times not comparable)")
+    parser.add_argument("--no-isolate", action="store_true", help="Run every case in this process")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results to compare turns/sec against")
+    args = parser.parse_args(argv)
+
+    sizes, densities, seeds = PRESETS[args.preset]
+    cases = build_matrix(args.sizes or sizes, args.densities or densities, args.seeds or seeds,
+                         *([args.configs] if args.configs else []))
+
+    results = run_matrix(cases, args.turns, args.warmup, args.max_seconds, args.trace_memory,
+                         isolate=not args.no_isolate, progress=_print_result)
+
+    if args.output:
+        settings = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+        save_results(args.output, results, settings)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        for key, old, new, ratio in compare_results(load_results(args.compare), results):
+            print(f"{key:<40} {old:10.2f} -> {new:10.2f} turns/s  x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    main()
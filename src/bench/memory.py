@@ -0,0 +1,63 @@
+import argparse
+import gc
+import tracemalloc
+from typing import List, NamedTuple
+
+from src.logic.grid import Grid
+from .turns import BenchCase, build_simulation
+
+
+class MemoryResult(NamedTuple):
+    """
+    Python heap (tracemalloc) used by a grid with its organisms, in bytes.
+    """
+    backend: str
+    size: int
+    density: float
+    n_cells: int
+    n_organisms: int
+    total_bytes: int
+    bytes_per_cell: float
+
+
+def measure_grid_memory(size: int, density: float, backend: str = Grid.BACKEND_DICT,
+                        seed: int = 0) -> MemoryResult:
+    """
+    Builds the simulation of a BenchCase and measures what it keeps alive
+    (cells, organisms, registry, neighbour table...) after one turn.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        engine = "python" if backend == Grid.BACKEND_DICT else "vectorized"
+        sim = build_simulation(BenchCase(size, density, seed, backend, engine))
+        sim.pass_turn()
+        gc.collect()
+        total = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    n_cells = size * size
+    return MemoryResult(backend, size, density, n_cells, len(sim.grid.organisms),
+                        total, total / n_cells)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.bench.memory",
+                                     description="Heap footprint per cell of a grid and its organisms.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.1, 0.5])
+    parser.add_argument("--backends", nargs="+", default=[Grid.BACKEND_DICT, Grid.BACKEND_ARRAY])
+    args = parser.parse_args(argv)
+
+    for backend in args.backends:
+        for size in args.sizes:
+            for density in args.densities:
+                r = measure_grid_memory(size, density, backend)
+                print(f"{backend:<6} {size:>5}x{size:<5} d={density:<5g} orgs={r.n_organisms:<8} "
+                      f"{r.total_bytes / 2**20:9.1f} MiB  {r.bytes_per_cell:7.1f} B/cell", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.logic.grid import Grid
+from src.logic.simulation import Simulation
+from src.logic.population import build_grid, uniform_cells
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Version del formato del JSON de resultados
+RESULTS_VERSION = 1
+
+
+class BenchCase(NamedTuple):
+    """
+    One point of the benchmark matrix: a size x size grid with
+    ``density`` of its cells occupied.
+    """
+    size: int
+    density: float
+    seed: int
+    backend: str = Grid.BACKEND_ARRAY
+    engine: str = Simulation.ENGINE_VECTORIZED
+
+    @property
+    def key(self) -> str:
+        # Identifica el caso al comparar resultados de dos commits
+        return f"{self.backend}/{self.engine}/{self.size}x{self.size}/d{self.density:g}/s{self.seed}"
+
+
+class BenchResult(NamedTuple):
+    """
+    Measures of one BenchCase. Times are in seconds, memory in bytes.
+    ``phase_seconds`` has the phases that ran (see ProfileSnapshot) and an
+    "other" entry with the time outside them (reset of the transient
+    states, observers...).
+    """
+    key: str
+    size: int
+    density: float
+    seed: int
+    backend: str
+    engine: str
+    n_organisms: int
+    turns: int
+    setup_seconds: float
+    elapsed: float
+    turns_per_second: float
+    phase_seconds: Dict[str, float]
+    n_moves: int
+    n_conflicts: int
+    n_blocked: int
+    n_conflict_rounds: int
+    max_conflict_rounds_in_turn: int
+    peak_rss_bytes: Optional[int]
+    peak_traced_bytes: Optional[int]
+    error: Optional[str] = None
+
+
+def build_matrix(sizes: Iterable[int], densities: Iterable[float], seeds: Iterable[int],
+                 configs: Iterable[Tuple[str, str]] = ((Grid.BACKEND_ARRAY, Simulation.ENGINE_VECTORIZED),)
+                 ) -> List[BenchCase]:
+    """
+    Every combination of sizes, densities, seeds and (backend, engine) configs.
+    """
+    return [BenchCase(size, density, seed, backend, engine)
+            for backend, engine in configs
+            for size in sizes
+            for density in densities
+            for seed in seeds]
+
+
+def build_simulation(case: BenchCase) -> Simulation:
+    """
+    Headless simulation of ``case`` with its organisms on distinct random
+    cells. The same case always gives the same grid and the same turns.
+    """
+    n_cells = case.size * case.size
+    n_orgs = min(n_cells, max(1, int(round(n_cells * case.density))))
+    flat = uniform_cells(case.size, case.size, n_orgs, case.seed)
+    grid = build_grid(case.size, case.size, flat, backend=case.backend)
+    return Simulation(grid, engine=case.engine, headless=True, rng=case.seed)
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux da KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(case: BenchCase, turns: int = 20, warmup: int = 2,
+             max_seconds: Optional[float] = None, trace_memory: bool = False) -> BenchResult:
+    """
+    Builds the simulation of ``case`` and times ``turns`` turns after
+    ``warmup`` untimed ones.
+
+    Args:
+        case (BenchCase): Point of the matrix to run.
+        turns (int): Timed turns.
+        warmup (int): Turns run before timing.
+        max_seconds (Optional[float]): Stop timing once this budget is spent;
+            the result keeps the number of turns actually run.
+        trace_memory (bool): Also measure the peak of Python allocations with
+            tracemalloc. It slows every allocation, so the times of a traced
+            run are not comparable with untraced ones.
+
+    Returns:
+        BenchResult: Measures of the case. Errors are stored in ``error``
+        instead of raised, so one failing case does not stop a matrix.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        sim = build_simulation(case)
+        setup = time.perf_counter() - start
+
+        sim.run(warmup)
+        sim.enable_profiling()
+
+        done, elapsed = 0, 0.0
+        n_moves = n_conflicts = n_blocked = n_rounds = 0
+        for stats in sim.iter_turns(turns):
+            done += 1
+            elapsed += stats.elapsed
+            n_moves += stats.n_moves
+            n_conflicts += stats.n_conflicts
+            n_blocked += stats.n_blocked
+            n_rounds += stats.n_conflict_rounds
+            if max_seconds is not None and elapsed >= max_seconds:
+                break
+
+        profile = sim.profile_snapshot()
+        phase_seconds = dict(profile.phase_seconds)
+        phase_seconds["other"] = max(0.0, elapsed - sum(profile.phase_seconds.values()))
+        traced = tracemalloc.get_traced_memory()[1] if trace_memory else None
+
+        return BenchResult(
+            key=case.key, size=case.size, density=case.density, seed=case.seed,
+            backend=case.backend, engine=case.engine,
+            n_organisms=len(sim.grid.organisms),
+            turns=done,
+            setup_seconds=setup,
+            elapsed=elapsed,
+            turns_per_second=done / elapsed if elapsed > 0 else float("inf"),
+            phase_seconds=phase_seconds,
+            n_moves=n_moves, n_conflicts=n_conflicts, n_blocked=n_blocked,
+            n_conflict_rounds=n_rounds,
+            max_conflict_rounds_in_turn=profile.max_conflict_rounds_in_turn,
+            peak_rss_bytes=_peak_rss_bytes(),
+            peak_traced_bytes=traced,
+        )
+    except Exception as e:
+        return _failed(case, f"{type(e).__name__}: {e}")
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+
+def _failed(case: BenchCase, error: str) -> BenchResult:
+    return BenchResult(
+        key=case.key, size=case.size, density=case.density, seed=case.seed,
+        backend=case.backend, engine=case.engine, n_organisms=0, turns=0,
+        setup_seconds=0.0, elapsed=0.0, turns_per_second=0.0, phase_seconds={},
+        n_moves=0, n_conflicts=0, n_blocked=0, n_conflict_rounds=0,
+        max_conflict_rounds_in_turn=0, peak_rss_bytes=None, peak_traced_bytes=None,
+        error=error)
+
+
+def run_matrix(cases: Iterable[BenchCase], turns: int = 20, warmup: int = 2,
+               max_seconds: Optional[float] = None, trace_memory: bool = False,
+               isolate: bool = True,
+               progress: Optional[Callable[[BenchResult], None]] = None) -> List[BenchResult]:
+    """
+    Runs every case with run_case.
+
+    Args:
+        isolate (bool): Run each case in a fresh process, so its peak RSS is
+            its own and no memory or caches leak between cases.
+        progress (Callable[[BenchResult], None]): Optional, receives every result.
+        (rest as in run_case)
+    """
+    results = []
+    for case in cases:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                try:
+                    result = pool.submit(run_case, case, turns, warmup, max_seconds, trace_memory).result()
+                except Exception as e:  # el proceso murio (p.ej. sin memoria)
+                    result = _failed(case, f"{type(e).__name__}: {e}")
+        else:
+            result = run_case(case, turns, warmup, max_seconds, trace_memory)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def environment() -> Dict[str, object]:
+    """
+    Machine and code version the results were measured on.
+    """
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def save_results(path: str, results: List[BenchResult], settings: Optional[Dict[str, object]] = None) -> None:
+    """
+    Writes the results as JSON: {"version", "environment", "settings", "results"}.
+    """
+    data = {
+        "version": RESULTS_VERSION,
+        "environment": environment(),
+        "settings": settings or {},
+        "results": [r._asdict() for r in results],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def load_results(path: str) -> List[BenchResult]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Unsupported benchmark results version {data.get('version')!r} in {path}")
+    return [BenchResult(**r) for r in data["results"]]
+
+
+def compare_results(baseline: List[BenchResult], current: List[BenchResult]
+                    ) -> List[Tuple[str, float, float, float]]:
+    """
+    Turns/sec of the cases present and error-free in both runs.
+
+    Returns:
+        List[Tuple[str, float, float, float]]: (key, baseline tps, current tps,
+        current / baseline); a ratio below 1 means the current code is slower.
+    """
+    old = {r.key: r for r in baseline if r.error is None}
+    rows = []
+    for r in current:
+        b = old.get(r.key)
+        if b is None or r.error is not None or b.turns_per_second <= 0:
+            continue
+        rows.append((r.key, b.turns_per_second, r.turns_per_second, r.turns_per_second / b.turns_per_second))
+    return rows
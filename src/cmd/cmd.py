@@ -1,6 +1,6 @@
 from enum import Enum
 from typing import Tuple
-import os
+import sys
 
 debugging = False
 
@@ -28,11 +28,13 @@ class ColorCmd(Enum):
         return str(self.value)
       
 def clear_console():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    # Secuencia ANSI en vez de lanzar un proceso "clear" en cada llamada
+    sys.stdout.write("\033[H\033[2J")
+    sys.stdout.flush()
     
 def calculate_cmd_arrow(origin: Tuple[int, int], final: Tuple[int, int]):
    
-    my_debug(f"Calculating simbol in position={final}")      
+    my_debug(lambda: f"Calculating simbol in position={final}")      
     
     ox, oy = origin         # origen: jugador (fila, columna)
     px, py =  final          # destino: celda actual (fila, columna)
@@ -40,6 +42,12 @@ def calculate_cmd_arrow(origin: Tuple[int, int], final: Tuple[int, int]):
     # Vector de movimiento desde origen hacia posición actual
     dx = px - ox  # en filas
     dy = py - oy  # en columnas
+    
+    # Una vecina a mas de una celda solo puede ser la del otro lado de un grid toroidal
+    if abs(dx) > 1:
+        dx = -dx
+    if abs(dy) > 1:
+        dy = -dy
 
     # Normalizar a (-1, 0, 1)
     dx = (dx > 0) - (dx < 0)
@@ -51,9 +59,17 @@ def calculate_cmd_arrow(origin: Tuple[int, int], final: Tuple[int, int]):
     
     return new_symbol
   
+def set_debugging(enabled: bool) -> None:
+  global debugging
+  debugging = enabled
+
 def my_debug(msg, verbose = None):
+  # msg puede ser un str o una funcion sin argumentos que lo devuelve;
+  # con la funcion el f-string solo se construye si el debug esta activo
   if not debugging:
     return
+  if callable(msg):
+    msg = msg()
   if verbose is None:  
       print(f"[DEBUG]__{msg}{ColorCmd.RESET}")
   else:
@@ -0,0 +1,69 @@
+from typing import List, Tuple
+
+from src.cmd.cmd import ColorCmd
+from src.logic.observer import (PHASE_APPLY, PHASE_CONFLICTS, PHASE_INTENTIONS,
+                                PHASE_VALIDATION, SimulationObserver)
+
+
+class ConsoleObserver(SimulationObserver):
+    """
+    Prints every phase of the simulation and the grid after it, with ANSI colours.
+    This is the interactive view used by main.py.
+    """
+
+    def __init__(self) -> None:
+        self._n_conflicts = 0
+        self._round_losers: List[int] = []
+
+    def on_start(self, sim) -> None:
+        print("FASE 0-Se colocan los organismos")
+        print(sim.grid.organisms)
+        sim.grid.print_state()
+        print("FASE-0-END")
+
+    def on_phase_start(self, sim, phase: str) -> None:
+        if phase == PHASE_INTENTIONS:
+            print("CALCULATION PHASE-[START]------------------------)")
+        elif phase == PHASE_VALIDATION:
+            print("VALIDATION PHASE-[START]------------------------)")
+            print("Validating chosen cells...")
+        elif phase == PHASE_CONFLICTS:
+            self._round_losers = []
+            print(f"{ColorCmd.RED}CONFLICTS-PHASE IN TURN:{sim.turn}-[START]------------------------){ColorCmd.RESET}")
+        elif phase == PHASE_APPLY:
+            print("Hay que aplicar acciones ", sim.confirmed_moves)
+            if sim.confirmed_moves:
+                print("FASE 3-APLICANDO CAMBIOS")
+                print(sim.confirmed_moves)
+
+    def on_phase_end(self, sim, phase: str) -> None:
+        if phase == PHASE_INTENTIONS:
+            print(f"·INTENTIONS =   (white arrows) {sim.last_intended_cells}")
+            print(f"{ColorCmd.CYAN}·CHOSEN_MOVES = (cyan arrows) {sim.chosen_moves}{ColorCmd.RESET}")
+            print(f"{ColorCmd.RED}·CONFLICTS =    (red crosses) {sim.conflicts}{ColorCmd.RESET}")
+            sim.grid.print_state()
+            print("CALCULATION-PHASE-[END]------------------------)\n")
+        elif phase == PHASE_VALIDATION:
+            sim.grid.print_state()
+            print("VALIDATION PHASE-[END]------------------------)\n")
+        elif phase == PHASE_CONFLICTS:
+            # Vemos la cuadricula con la ronda de conflictos resuelta
+            sim.grid.print_state()
+            print("LIST_ORG_LOOSERS_ROUND", self._round_losers)
+            print("Calculating now moves for LOOSERS")
+        elif phase == PHASE_APPLY:
+            if sim.confirmed_moves:
+                print("FASE 4-APLICANDO CAMBIOS-[END]\n")
+            else:
+                print("NOTHING TO CHANGE")
+
+    def on_conflict(self, sim, position: Tuple[int, int],
+                    contenders: List[int], winner: int, losers: List[int]) -> None:
+        self._n_conflicts += 1
+        self._round_losers.extend(losers)
+        print(f"{ColorCmd.RED}CONFLICT_{self._n_conflicts}_={position}{ColorCmd.RESET} ORGS={contenders}")
+        print(f"\t{ColorCmd.GREEN}·WINNER=[{winner}]{ColorCmd.RESET}")
+        print(f"{ColorCmd.BLUE}·LOOSERS={losers}{ColorCmd.RESET}")
+
+    def on_turn_end(self, sim) -> None:
+        self._n_conflicts = 0
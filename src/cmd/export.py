@@ -0,0 +1,364 @@
+import os
+import queue
+import struct
+import threading
+import zlib
+from typing import BinaryIO, Optional
+
+import numpy as np
+
+from src.cmd.cmd import ColorCmd
+from src.logic.cellstore import sorted_unique
+from src.logic.gridcell import CMD_STATE_COLORS, CellState
+from src.logic.observer import SimulationObserver
+
+# Colores RGB de los codigos ANSI de ColorCmd (paleta por defecto de xterm)
+ANSI_RGB = {
+    ColorCmd.WHITE: (229, 229, 229),
+    ColorCmd.RED: (205, 0, 0),
+    ColorCmd.GREEN: (0, 205, 0),
+    ColorCmd.YELLOW: (205, 205, 0),
+    ColorCmd.BLUE: (0, 0, 238),
+    ColorCmd.PURPLE: (205, 0, 205),
+    ColorCmd.CYAN: (0, 205, 205),
+}
+# Una celda libre en la consola es un punto sobre el fondo: en la imagen, el fondo
+BACKGROUND_RGB = (0, 0, 0)
+
+# Codigo de color de cada estado, indexado por el valor int8 del estado visto como uint8
+# (NOT_FREE = -1 queda en 255): se traduce sin copiar los estados a un entero mas ancho.
+# Los codigos ordenan los estados por prioridad al reducir: FREE < NOT_FREE < el resto
+_STATES = sorted(CellState, key=lambda state: state.value)
+_CODE_ORDER = [CellState.FREE, CellState.NOT_FREE] + [s for s in _STATES if s.value > CellState.FREE.value]
+STATE_CODES = np.zeros(256, dtype=np.uint8)
+STATE_CODES[np.array([state.value for state in _CODE_ORDER], dtype=np.int8).view(np.uint8)] = \
+    np.arange(len(_CODE_ORDER), dtype=np.uint8)
+PALETTE = np.array([BACKGROUND_RGB if state is CellState.FREE
+                    else ANSI_RGB[CMD_STATE_COLORS.get(state, ColorCmd.WHITE)]
+                    for state in _CODE_ORDER], dtype=np.uint8)
+
+
+def state_codes(states: np.ndarray) -> np.ndarray:
+    """Palette code of every state value (int8), with one table lookup."""
+    return STATE_CODES[np.asarray(states, dtype=np.int8).view(np.uint8)]
+
+
+def downsample(codes: np.ndarray, scale: int) -> np.ndarray:
+    """
+    Reduces a (height, width) code image by ``scale`` in both axes. Every
+    block keeps its highest code, so an organism or a mark is never lost
+    among free cells. Partial blocks at the edges count as free.
+    """
+    if scale == 1:
+        return codes
+    height, width = codes.shape
+    pad_rows, pad_cols = -height % scale, -width % scale
+    if pad_rows or pad_cols:
+        codes = np.pad(codes, ((0, pad_rows), (0, pad_cols)))
+    rows, cols = codes.shape[0] // scale, codes.shape[1] // scale
+    return codes.reshape(rows, scale, cols, scale).max(axis=(1, 3))
+
+
+def rgb_frame(codes: np.ndarray) -> np.ndarray:
+    """(height, width, 3) uint8 RGB image of a code image."""
+    return PALETTE[codes]
+
+
+class PngSequenceWriter:
+    """
+    Writes every frame as an indexed PNG (one byte per pixel plus the
+    palette) named ``<prefix>_<turn>.png``, or ``<prefix>_<turn>_<label>.png``
+    for the frames of a turn recorded phase by phase.
+
+    Args:
+        directory (str): Output directory (created if missing).
+        prefix (str): File name prefix.
+        compress_level (int): zlib level, 1 (fast) to 9 (small).
+    """
+
+    def __init__(self, directory: str, prefix: str = "frame", compress_level: int = 6) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._prefix = prefix
+        self._compress_level = compress_level
+
+    @staticmethod
+    def _chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    def encode(self, codes: np.ndarray) -> bytes:
+        height, width = codes.shape
+        # Cada fila empieza con el byte de filtro (0, sin filtro)
+        rows = np.zeros((height, width + 1), dtype=np.uint8)
+        rows[:, 1:] = codes
+        return b"".join((
+            b"\x89PNG\r\n\x1a\n",
+            self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+            self._chunk(b"PLTE", PALETTE.tobytes()),
+            self._chunk(b"IDAT", zlib.compress(rows.tobytes(), self._compress_level)),
+            self._chunk(b"IEND", b""),
+        ))
+
+    def write(self, codes: np.ndarray, turn: int, label: Optional[str] = None) -> None:
+        name = f"{self._prefix}_{turn:06d}" if label is None else f"{self._prefix}_{turn:06d}_{label}"
+        path = os.path.join(self._directory, name + ".png")
+        with open(path, "wb") as f:
+            f.write(self.encode(codes))
+
+    def close(self) -> None:
+        pass
+
+
+class GifWriter:
+    """
+    Writes the frames as an animated GIF that loops forever.
+
+    The image data uses fixed-width LZW codes with a clear code every few
+    pixels, so it is encoded with array operations and no dictionary:
+    about 5 bits per pixel, larger than an optimised GIF but cheap enough
+    to follow a long run (downsample big grids).
+
+    Args:
+        path (str): Output file.
+        fps (float): Frames per second when played.
+    """
+
+    _MIN_CODE_SIZE = 4                  # paleta de 16 entradas
+    _CLEAR = 1 << _MIN_CODE_SIZE
+    _END = _CLEAR + 1
+    _CODE_BITS = _MIN_CODE_SIZE + 1
+    # Pixeles entre dos CLEAR: el diccionario del decodificador no llega a pedir codigos de 6 bits
+    _RUN = (1 << _CODE_BITS) - _END - 3
+
+    def __init__(self, path: str, fps: float = 10.0) -> None:
+        if len(PALETTE) > self._CLEAR:
+            raise ValueError("The palette does not fit in a 16 colour GIF")
+        self._file = open(path, "wb")
+        self._delay = max(int(round(100 / fps)), 1)
+        self._size: Optional[tuple] = None
+
+    def _header(self, width: int, height: int) -> bytes:
+        palette = np.zeros((self._CLEAR, 3), dtype=np.uint8)
+        palette[:len(PALETTE)] = PALETTE
+        return b"".join((
+            b"GIF89a",
+            # Tabla de colores global de 2 ** (3 + 1) entradas
+            struct.pack("<HHBBB", width, height, 0xF0 | (self._MIN_CODE_SIZE - 1), 0, 0),
+            palette.tobytes(),
+            # NETSCAPE2.0: repetir indefinidamente
+            b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00",
+        ))
+
+    def _image_data(self, codes: np.ndarray) -> bytes:
+        pixels = codes.ravel().astype(np.uint16)
+        n_runs = -(-len(pixels) // self._RUN)
+        # CLEAR + hasta _RUN pixeles por tramo, y END al final
+        runs = np.zeros(n_runs * self._RUN, dtype=np.uint16)
+        runs[:len(pixels)] = pixels
+        stream = np.full((n_runs, self._RUN + 1), self._CLEAR, dtype=np.uint16)
+        stream[:, 1:] = runs.reshape(n_runs, self._RUN)
+        stream = stream.reshape(-1)
+        keep = np.ones(len(stream), dtype=bool)
+        # El ultimo tramo puede ir incompleto: sobran sus huecos
+        keep[len(stream) - (n_runs * self._RUN - len(pixels)):] = False
+        stream = np.r_[stream[keep], self._END]
+        bits = ((stream[:, None] >> np.arange(self._CODE_BITS)) & 1).astype(np.uint8)
+        data = np.packbits(bits.ravel(), bitorder="little")
+        # Sub-bloques de hasta 255 bytes precedidos de su longitud
+        n_full, rest = divmod(len(data), 255)
+        blocks = np.empty((n_full, 256), dtype=np.uint8)
+        blocks[:, 0] = 255
+        blocks[:, 1:] = data[:n_full * 255].reshape(n_full, 255)
+        tail = bytes((rest,)) + data[n_full * 255:].tobytes() if rest else b""
+        return bytes((self._MIN_CODE_SIZE,)) + blocks.tobytes() + tail + b"\x00"
+
+    def write(self, codes: np.ndarray, turn: int, label: Optional[str] = None) -> None:
+        height, width = codes.shape
+        if self._size is None:
+            self._size = (width, height)
+            self._file.write(self._header(width, height))
+        elif self._size != (width, height):
+            raise ValueError("Every frame of a GIF must have the same size")
+        self._file.write(b"".join((
+            struct.pack("<BBBBHBB", 0x21, 0xF9, 4, 0, self._delay, 0, 0),
+            struct.pack("<BHHHHB", 0x2C, 0, 0, width, height, 0),
+            self._image_data(codes),
+        )))
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.write(b"\x3b")
+            self._file.close()
+
+
+class RawVideoWriter:
+    """
+    Writes the frames as raw rgb24 video (height * width * 3 bytes per
+    frame, no header) to a binary stream, e.g. the stdin of
+    ``ffmpeg -f rawvideo -pix_fmt rgb24 -s <width>x<height> -r 30 -i - out.mp4``.
+
+    Args:
+        stream (BinaryIO): Destination; closed by close() if ``owns_stream``.
+        owns_stream (bool): Close the stream with the writer.
+    """
+
+    def __init__(self, stream: BinaryIO, owns_stream: bool = False) -> None:
+        self._stream = stream
+        self._owns_stream = owns_stream
+
+    def write(self, codes: np.ndarray, turn: int, label: Optional[str] = None) -> None:
+        self._stream.write(rgb_frame(codes).tobytes())
+
+    def close(self) -> None:
+        self._stream.flush()
+        if self._owns_stream:
+            self._stream.close()
+
+
+class FrameExporter(SimulationObserver):
+    """
+    Observer that records the cell states of the grid as images, coloured
+    like GridCell.cmd_color (free cells are the background).
+
+    Only the cells that can be other than FREE are read: the cells of the
+    organisms plus the ones written since the last reset (Grid.dirty). With
+    ``scale`` the image is kept at the reduced size and every block gets the
+    highest code of its cells (see downsample), so neither the grid nor the
+    image is ever held at full resolution. After a turn only the blocks of
+    Grid.last_turn_cells are painted again. Recording follows the number of
+    organisms and the activity of the turn, not the size of the grid.
+
+    The simulation thread only turns the states into palette codes and
+    queues the frames; a writer thread encodes and writes them.
+
+    Args:
+        writer: PngSequenceWriter, GifWriter, RawVideoWriter or any object
+            with write(codes, turn) and close(). With ``phases`` the frames
+            are written with write(codes, turn, label), the label being
+            "<index>_<phase>" (and "<index>_end" after the turn), so frames
+            of the same turn never share a name and sort in order.
+        every (int): Turns between two frames.
+        scale (int): Downsampling factor (see downsample).
+        phases (bool): Also record a frame after every phase.
+        queue_size (int): Frames waiting for the writer before the simulation waits for it.
+    """
+
+    _STOP = None
+
+    def __init__(self, writer, every: int = 1, scale: int = 1, phases: bool = False,
+                 queue_size: int = 16) -> None:
+        if every < 1 or scale < 1:
+            raise ValueError("every and scale must be >= 1")
+        self._writer = writer
+        self._every = every
+        self._scale = scale
+        self._phases = phases
+        self._codes: Optional[np.ndarray] = None
+        self._phase_index = 0
+        self._queue: "queue.Queue" = queue.Queue(queue_size)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._write_frames, name="frame-exporter", daemon=True)
+        self._thread.start()
+
+    def _write_frames(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            if self._error is None:
+                try:
+                    self._writer.write(*item)
+                except BaseException as e:
+                    # Se relanza en el hilo de la simulacion; los frames siguientes se descartan
+                    self._error = e
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("The frame writer failed") from self._error
+
+    @staticmethod
+    def _marked_cells(grid) -> np.ndarray:
+        # Fuera de las celdas con organismo y de las escritas desde el ultimo reset todo es FREE
+        positions = grid.registry.positions
+        cells = positions[:, 0] * grid.width + positions[:, 1]
+        return sorted_unique(np.concatenate((cells, grid.dirty.peek())))
+
+    def _blocks(self, grid, cells: np.ndarray) -> np.ndarray:
+        if self._scale == 1:
+            return cells
+        rows, cols = np.divmod(cells, grid.width)
+        return (rows // self._scale) * self._codes.shape[1] + cols // self._scale
+
+    def _paint(self, grid, cells: np.ndarray, blocks: np.ndarray) -> None:
+        codes = state_codes(grid.cell_states(cells))
+        if self._scale == 1:
+            self._codes.reshape(-1)[blocks] = codes
+        else:
+            np.maximum.at(self._codes.reshape(-1), blocks, codes)
+
+    def _read_all(self, grid) -> None:
+        shape = (-(-grid.height // self._scale), -(-grid.width // self._scale))
+        self._codes = np.zeros(shape, dtype=np.uint8)
+        cells = self._marked_cells(grid)
+        self._paint(grid, cells, self._blocks(grid, cells))
+
+    def _read_changed(self, grid) -> None:
+        changed = grid.last_turn_cells
+        if self._scale == 1:
+            self._paint(grid, changed, changed)
+            return
+        # Los bloques con alguna celda cambiada se pintan de nuevo con todas sus celdas marcadas
+        blocks = sorted_unique(self._blocks(grid, changed))
+        if len(blocks) == 0:
+            return
+        self._codes.reshape(-1)[blocks] = 0
+        cells = self._marked_cells(grid)
+        cell_blocks = self._blocks(grid, cells)
+        found = np.minimum(np.searchsorted(blocks, cell_blocks), len(blocks) - 1)
+        inside = blocks[found] == cell_blocks
+        self._paint(grid, cells[inside], cell_blocks[inside])
+
+    def _emit(self, turn: int, label: Optional[str] = None) -> None:
+        self._check()
+        # Copia: self._codes se sigue actualizando mientras el escritor trabaja
+        frame = self._codes.copy()
+        # Sin etiqueta se llama write(codes, turn), como los escritores sin fases
+        self._queue.put((frame, turn) if label is None else (frame, turn, label))
+
+    def _phase_label(self, phase: str) -> str:
+        # Las fases se repiten en un turno (rondas de conflictos): el indice las distingue
+        self._phase_index += 1
+        return f"{self._phase_index:03d}_{phase}"
+
+    def on_start(self, sim) -> None:
+        self._read_all(sim.grid)
+        self._emit(sim.turn)
+
+    def on_phase_end(self, sim, phase: str) -> None:
+        if self._phases:
+            self._read_all(sim.grid)
+            self._emit(sim.turn, self._phase_label(phase))
+
+    def on_turn_end(self, sim) -> None:
+        grid = sim.grid
+        if self._phases or self._codes is None:
+            self._read_all(grid)
+        else:
+            self._read_changed(grid)
+        if sim.turn % self._every == 0:
+            self._emit(sim.turn, self._phase_label("end") if self._phases else None)
+        self._phase_index = 0
+
+    def close(self) -> None:
+        """Waits for the queued frames and closes the writer."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._writer.close()
+        self._check()
+
+    def __enter__(self) -> "FrameExporter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
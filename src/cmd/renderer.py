@@ -0,0 +1,256 @@
+import shutil
+import sys
+from typing import List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from src.cmd.cmd import ColorCmd
+from src.logic.gridcell import CMD_STATE_COLORS, CellState
+from src.logic.observer import SimulationObserver
+
+# Secuencias ANSI
+_CSI = "\033["
+CLEAR_SCREEN = _CSI + "H" + _CSI + "2J"
+CLEAR_LINE_END = _CSI + "K"
+HIDE_CURSOR = _CSI + "?25l"
+SHOW_CURSOR = _CSI + "?25h"
+# Sin autowrap una fila mas ancha que el terminal no descoloca el resto (igualmente se corta
+# el texto en el margen: lo que pasa de el se escribiria sobre la ultima columna)
+AUTOWRAP_OFF = _CSI + "?7l"
+AUTOWRAP_ON = _CSI + "?7h"
+
+# Color de cada estado indexado por state + 1 (los estados van de -1 a 9)
+_STATE_OFFSET = 1
+_COLOR_LUT = [str(CMD_STATE_COLORS.get(state, ColorCmd.WHITE)) for state in
+              sorted(CellState, key=lambda state: state.value)]
+
+
+def _move(row: int, col: int) -> str:
+    return f"{_CSI}{row + 1};{col + 1}H"
+
+
+class TerminalRenderer:
+    """
+    Draws the grid like Grid.cmd_state (" " + symbol per cell, coloured by
+    state) but keeps the previous frame and only rewrites what changed:
+
+    - a changed cell is rewritten in place after a cursor move;
+    - if its width changes (e.g. "•" -> "12") the cells it shifts are
+      rewritten too, up to where the row lines up again (an organism
+      moving along a row swaps widths with the cell it enters).
+
+    The whole frame is written with a single write() call. Only the part of
+    the grid that fits in the terminal is read, so the cost of a frame
+    depends on the viewport and on the number of changed cells, not on the
+    size of the grid. Given the cells that may have changed (e.g.
+    Grid.last_turn_cells) only those are read.
+
+    Args:
+        out (TextIO): Stream to write to (stdout by default).
+        size (Optional[Tuple[int, int]]): Terminal (columns, lines); None to ask the terminal on every frame.
+    """
+
+    def __init__(self, out: Optional[TextIO] = None, size: Optional[Tuple[int, int]] = None) -> None:
+        self._out = out if out is not None else sys.stdout
+        self._size = size
+        self._title: Optional[str] = None
+        self._viewport: Optional[Tuple[int, int, int, int]] = None  # (grid width, rows, cols, columns)
+        self._states = np.zeros(0, dtype=np.int8)
+        self._keys: Optional[np.ndarray] = None
+        self._texts = np.zeros(0, dtype=object)
+        self._widths = np.zeros(0, dtype=np.int64)
+
+    def _terminal_size(self) -> Tuple[int, int]:
+        if self._size is not None:
+            return self._size
+        size = shutil.get_terminal_size()
+        return size.columns, size.lines
+
+    def _viewport_for(self, grid) -> Tuple[int, int, int, int]:
+        columns, lines = self._terminal_size()
+        # Una linea para el titulo; cada celda ocupa al menos 2 columnas
+        rows = max(min(grid.height, lines - 1), 0)
+        cols = max(min(grid.width, columns // 2), 0)
+        return grid.width, rows, cols, columns
+
+    def _read(self, grid, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        States of the cells plus a key that changes whenever their symbol
+        changes (codes for the array backends, the symbols for the dict one).
+        """
+        store = grid.store
+        if store is not None:
+            states = np.asarray(store.state[indices], dtype=np.int8)
+            # El simbolo de una celda con ORG_SYMBOL depende del ocupante
+            keys = np.stack((np.asarray(store.symbol[indices], dtype=np.int64),
+                             np.asarray(store.occupant[indices], dtype=np.int64)))
+            return states, keys, None
+        cells = grid._cell_list
+        states = np.fromiter((cells[i]._state.value for i in indices.tolist()), dtype=np.int8,
+                             count=len(indices))
+        texts = np.fromiter((cells[i]._symbol for i in indices.tolist()), dtype=object,
+                            count=len(indices))
+        return states, texts, texts
+
+    def _symbols(self, grid, indices: np.ndarray) -> List[str]:
+        store = grid.store
+        if store is not None:
+            return [store.get_symbol(i) for i in indices.tolist()]
+        cells = grid._cell_list
+        return [cells[i]._symbol for i in indices.tolist()]
+
+    def reset(self) -> None:
+        """Forgets the previous frame: the next render redraws everything."""
+        self._viewport = None
+        self._title = None
+
+    def render(self, grid, title: str = "", changed: Optional[np.ndarray] = None) -> int:
+        """
+        Writes the changes since the previous frame.
+
+        Args:
+            grid (Grid): Grid to draw.
+            title (str): Line shown above the grid.
+            changed (Optional[np.ndarray]): Sorted flat indices of every cell
+                that may have changed since the previous frame; None to
+                compare the whole viewport.
+
+        Returns:
+            int: Characters written.
+        """
+        width, rows, cols, _ = viewport = self._viewport_for(grid)
+        parts: List[str] = [HIDE_CURSOR, AUTOWRAP_OFF]
+        if viewport != self._viewport or changed is None:
+            grid_rows = np.arange(rows, dtype=np.int64)[:, None] * width
+            indices = (grid_rows + np.arange(cols, dtype=np.int64)).ravel()
+            local = np.arange(len(indices))
+        else:
+            # Solo las celdas indicadas que caen dentro del viewport
+            changed_rows, changed_cols = np.divmod(np.asarray(changed, dtype=np.int64), width)
+            inside = (changed_rows < rows) & (changed_cols < cols)
+            indices = np.asarray(changed, dtype=np.int64)[inside]
+            local = changed_rows[inside] * cols + changed_cols[inside]
+        states, keys, texts = self._read(grid, indices)
+
+        if viewport != self._viewport:
+            self._redraw(grid, viewport, indices, states, keys, texts, parts)
+        else:
+            self._update(grid, local, indices, states, keys, texts, parts)
+        if title != self._title:
+            parts.append(_move(0, 0) + title + CLEAR_LINE_END)
+            self._title = title
+        parts += [ColorCmd.RESET.value, _move(rows + 1, 0), AUTOWRAP_ON, SHOW_CURSOR]
+
+        frame = "".join(parts)
+        self._out.write(frame)
+        self._out.flush()
+        return len(frame)
+
+    def _redraw(self, grid, viewport, indices, states, keys, texts, parts: List[str]) -> None:
+        _, rows, cols, columns = viewport
+        if texts is None:
+            texts = np.array(self._symbols(grid, indices), dtype=object)
+        self._viewport = viewport
+        self._title = None
+        self._states, self._keys, self._texts = states, keys, texts
+        self._widths = np.fromiter((len(text) + 1 for text in texts.tolist()), dtype=np.int64,
+                                   count=len(texts))
+        parts.append(CLEAR_SCREEN)
+        for row in range(rows):
+            parts.append(_move(row + 1, 0))
+            self._row_text(row * cols, (row + 1) * cols, columns, parts)
+
+    def _update(self, grid, local, indices, states, keys, texts, parts: List[str]) -> None:
+        # local: posicion en el viewport de cada celda leida
+        _, rows, cols, columns = self._viewport
+        changed = states != self._states[local]
+        if keys.ndim == 2:
+            changed |= (keys != self._keys[:, local]).any(axis=0)
+        else:
+            changed |= keys != self._keys[local]
+        hits = np.flatnonzero(changed)
+        if len(hits) == 0:
+            return
+
+        new_texts = texts[hits] if texts is not None else self._symbols(grid, indices[hits])
+        changed = local[hits]
+        old_widths = self._widths.copy()
+        self._states[local] = states
+        self._keys[..., local] = keys
+        self._texts[changed] = new_texts
+        self._widths[changed] = np.fromiter((len(text) + 1 for text in new_texts), dtype=np.int64,
+                                            count=len(changed))
+
+        changed_rows = changed // cols
+        bounds = np.flatnonzero(np.r_[True, changed_rows[1:] != changed_rows[:-1], True])
+        for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            row = int(changed_rows[start])
+            row_start = row * cols
+            old_ends = np.cumsum(old_widths[row_start:row_start + cols])
+            new_ends = np.cumsum(self._widths[row_start:row_start + cols])
+            # Se reescriben las celdas cambiadas y las que han quedado desplazadas por un
+            # cambio de ancho; normalmente la fila vuelve a cuadrar justo despues
+            dirty = np.r_[False, old_ends[:-1] != new_ends[:-1]]
+            dirty[changed[start:stop] - row_start] = True
+            # Lo que empieza fuera del terminal no se ve
+            new_starts = new_ends - self._widths[row_start:row_start + cols]
+            visible = int(np.searchsorted(new_starts, columns))
+            cells = np.flatnonzero(dirty[:visible])
+            if len(cells) == 0:
+                continue
+            # Huecos de una o dos celdas se reescriben: cuestan menos que otro movimiento de cursor
+            runs = np.flatnonzero(np.r_[True, np.diff(cells) > 3, True])
+            for first, last in zip(cells[runs[:-1]].tolist(), cells[runs[1:] - 1].tolist()):
+                column = int(new_starts[first])
+                parts.append(_move(row + 1, column))
+                self._row_text(row_start + first, row_start + last + 1, columns - column, parts)
+                # Si la fila llega al margen no queda nada que borrar (y borraria la ultima columna)
+                if last == visible - 1 and new_ends[last] < min(old_ends[-1], columns):
+                    parts.append(CLEAR_LINE_END)
+
+    def _row_text(self, start: int, stop: int, room: int, parts: List[str]) -> None:
+        # Solo se emite el color cuando cambia respecto a la celda anterior. El texto se corta
+        # en ``room`` columnas: sin autowrap lo que pasa del margen machacaria la ultima columna
+        color = None
+        for state, text in zip(self._states[start:stop].tolist(), self._texts[start:stop].tolist()):
+            if room <= 0:
+                break
+            if state != color:
+                parts.append(_COLOR_LUT[state + _STATE_OFFSET])
+                color = state
+            text = " " + text
+            parts.append(text[:room])
+            room -= len(text)
+
+
+class TerminalView(SimulationObserver):
+    """
+    Observer that redraws the grid with a TerminalRenderer at the start and
+    after every turn (and after every phase with ``phases=True``). Without
+    phases only the cells of Grid.last_turn_cells are compared after a turn.
+
+    Args:
+        renderer (Optional[TerminalRenderer]): Renderer to use, a new one on stdout by default.
+        phases (bool): Also draw the intermediate states of every phase.
+    """
+
+    def __init__(self, renderer: Optional[TerminalRenderer] = None, phases: bool = False) -> None:
+        self._renderer = renderer if renderer is not None else TerminalRenderer()
+        self._phases = phases
+
+    @property
+    def renderer(self) -> TerminalRenderer:
+        return self._renderer
+
+    def on_start(self, sim) -> None:
+        self._renderer.reset()
+        self._renderer.render(sim.grid, f"Turn {sim.turn}")
+
+    def on_phase_end(self, sim, phase: str) -> None:
+        if self._phases:
+            self._renderer.render(sim.grid, f"Turn {sim.turn + 1} - {phase}")
+
+    def on_turn_end(self, sim) -> None:
+        # Tras un frame de fase tambien cambian celdas que ya no estan marcadas
+        changed = None if self._phases else sim.grid.last_turn_cells
+        self._renderer.render(sim.grid, f"Turn {sim.turn}", changed)
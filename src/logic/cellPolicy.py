@@ -1,9 +1,13 @@
 # policy.py
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
 from enum import Enum
-from typing import Dict, Callable, Any, Optional, Tuple
+from typing import Dict, Callable, Any, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
 
-from src.cmd.cmd import DEFAULT_CELL_SYMBOL, my_debug
-from .gridcell import CellState, GridCell
+from src.cmd.cmd import DEFAULT_CELL_SYMBOL, DIRECTION_SYMBOLS, my_debug
+from .gridcell import CellState, CellView, GridCell
 
 """    
     NOT_FREE = -1
@@ -128,7 +132,7 @@ def _set_arrow_from_origin(cell: GridCell, origin: Tuple[int,int]) -> None:
 # Estos son los handlers que se ejecutan cuando se aplica una transición permitida. Por defecto no ocuure nada
 TRANSITION_HANDLERS: Dict[TransitionKey, TransitionHandler] = {t:_noop for t in TransitionKey}
 #(cell: GridCell, old: CellState, candidate: CellState, computed: CellState, pos: Tuple[int, int])
-def on_INTENDED_TO_FREE(cell: GridCell, old_state: CellState, candidate_state: CellState, computed_state: CellState) -> None:
+def on_INTENDED_TO_FREE(cell: GridCell, old_state: CellState, candidate_state: CellState, computed_state: CellState, pos: Optional[Tuple[int, int]] = None) -> None:
     cell.clean()  # Limpia la celda al pasar de INTENDED a FREE
     cell.set_cmd_symbol(DEFAULT_CELL_SYMBOL)  # Limpia el símbolo de la celda
 
@@ -165,29 +169,140 @@ TRANSITION_HANDLERS.update({
 })
 
 #FUNCOIN QQUE CALCULA EL ESTADO GRACIAS A LA LOGICA HECHA CON DICCIONARIOS 
+def _raise_transition_error(old_state: CellState, candidate_state: CellState) -> None:
+    #TODO ERRORES CON EL ESTADO DE LA CELL
+    if candidate_state is CellState.CONFLICT:
+        raise ValueError("Cannot set CONFLICT directly; set CHOSEN to derive it.")
+    if candidate_state is CellState.WINNER and old_state is not CellState.CONFLICT:
+        raise ValueError("Cannot mark WINNER on a cell wit NO CONFLICT.")
+    if candidate_state is CellState.RESOLVED and old_state not in (CellState.CHOSEN, CellState.CONFLICT):
+        raise ValueError(f"Can only set RESOLVED from CHOSEN/CONFLICT nor can be setted up RESOLVED AGAIN[{old_state.name} -> {candidate_state.name}]")
+    raise ValueError(f"Transition {old_state.name} -> {candidate_state.name} is not allowed.")
+
+
+# --- Tabla compilada de transiciones ---
+# Se genera a partir de TransitionKey / STATE_LOGIC / TRANSITION_HANDLERS, la politica
+# se sigue escribiendo solo en los diccionarios de arriba.
+STATES: Tuple[CellState, ...] = tuple(CellState)
+STATE_ORDINAL: Dict[CellState, int] = {s: i for i, s in enumerate(STATES)}
+
+NOT_ALLOWED = -1     # (old, candidate) no esta en TransitionKey
+NOT_DEFINED = -2     # esta en TransitionKey pero no en STATE_LOGIC
+
+# Valor del estado (-1..9) -> ordinal, para indexar con los arrays de ArrayCellStore
+_VALUE_OFFSET = -min(s.value for s in STATES)
+VALUE_TO_ORDINAL = np.full(max(s.value for s in STATES) + _VALUE_OFFSET + 1, NOT_ALLOWED, dtype=np.int8)
+for _s in STATES:
+    VALUE_TO_ORDINAL[_s.value + _VALUE_OFFSET] = STATE_ORDINAL[_s]
+ORDINAL_TO_VALUE = np.array([s.value for s in STATES], dtype=np.int8)
+
+
+def compile_transition_table() -> None:
+    """
+    Builds the integer lookup tables used by compute_state and
+    apply_state_transition(s). Runs at import; call it again after
+    changing STATE_LOGIC or TRANSITION_HANDLERS at runtime.
+
+    - COMPUTED_TABLE[old, candidate]: ordinal of the computed state, or NOT_ALLOWED / NOT_DEFINED.
+    - HANDLER_TABLE[old, candidate]: index in HANDLERS (0 is the no-op handler).
+    - KEY_TABLE[old][candidate]: TransitionKey, or None if the pair is not allowed.
+    """
+    global COMPUTED_TABLE, HANDLER_TABLE, HANDLERS, KEY_TABLE, _COMPUTED_ROWS, _HANDLER_ROWS
+
+    n = len(STATES)
+    computed = np.full((n, n), NOT_ALLOWED, dtype=np.int8)
+    handler_ids = np.zeros((n, n), dtype=np.int8)
+    handlers: List[TransitionHandler] = [_noop]
+    keys: List[List[Optional[TransitionKey]]] = [[None] * n for _ in range(n)]
+
+    for t in TransitionKey:
+        i, j = STATE_ORDINAL[t.old], STATE_ORDINAL[t.candidate]
+        keys[i][j] = t
+        state = STATE_LOGIC.get(t)
+        computed[i, j] = NOT_DEFINED if state is None else STATE_ORDINAL[state]
+
+        handler = TRANSITION_HANDLERS.get(t)
+        if handler is None or handler is _noop:
+            continue
+        if handler not in handlers:
+            handlers.append(handler)
+        handler_ids[i, j] = handlers.index(handler)
+
+    COMPUTED_TABLE, HANDLER_TABLE, HANDLERS, KEY_TABLE = computed, handler_ids, handlers, keys
+    # Listas python para las consultas escalares (mas rapidas que indexar numpy)
+    _COMPUTED_ROWS = computed.tolist()
+    _HANDLER_ROWS = handler_ids.tolist()
+
+
+compile_transition_table()
+
+
+# --- Contador de transiciones (instrumentacion) ---
+# None = desactivado: apply_state_transition solo paga una consulta. Es una ContextVar:
+# cada hilo (y cada tarea asyncio) ve su propio contador, asi las simulaciones que
+# corren a la vez en hilos distintos no cuentan las transiciones de las otras.
+_transition_counts: ContextVar[Optional[Counter]] = ContextVar("transition_counts", default=None)
+
+
+def set_transition_counter(counter: Optional[Counter]) -> Optional[Counter]:
+    """
+    Starts counting every applied transition by TransitionKey into
+    ``counter`` (None stops counting) in the current thread or context.
+    Returns the previous counter. Prefer counting_transitions, which
+    restores it even if the counted code fails.
+    """
+    previous = _transition_counts.get()
+    _transition_counts.set(counter)
+    return previous
+
+
+@contextmanager
+def counting_transitions(counter: Optional[Counter]) -> Iterator[Optional[Counter]]:
+    """Counts the transitions applied in the block, in this thread or context, into ``counter``."""
+    token = _transition_counts.set(counter)
+    try:
+        yield counter
+    finally:
+        _transition_counts.reset(token)
+
+
+def transition_counter() -> Optional[Counter]:
+    return _transition_counts.get()
+
+
+def count_transitions(old_values: np.ndarray, candidate_state: CellState) -> None:
+    """
+    Adds transitions applied outside apply_state_transition(s) (the
+    vectorized kernels) to the active counter: one per old state value.
+    """
+    counter = _transition_counts.get()
+    if counter is None:
+        return
+    _count_ordinals(counter, VALUE_TO_ORDINAL[np.asarray(old_values) + _VALUE_OFFSET],
+                    STATE_ORDINAL[candidate_state])
+
+
+def _count_ordinals(counter: Counter, old_ord: np.ndarray, cand_ord: int) -> None:
+    per_state = np.bincount(old_ord, minlength=len(STATES))
+    for old in np.flatnonzero(per_state).tolist():
+        key = KEY_TABLE[old][cand_ord]
+        if key is not None:
+            counter[key] += int(per_state[old])
+
+
 def compute_state(old_state: CellState, candidate_state: CellState) -> CellState:
     
-    my_debug(f"Computing state from {old_state.name} to {candidate_state.name}")
+    my_debug(lambda: f"Computing state from {old_state.name} to {candidate_state.name}")
 
-    try:
-        transition_key = TransitionKey((old_state, candidate_state))
-    except ValueError:
-        #TODO ERRORES CON EL ESTADO DE LA CELL
-        if candidate_state is CellState.CONFLICT:
-            raise ValueError("Cannot set CONFLICT directly; set CHOSEN to derive it.")
-        if candidate_state is CellState.WINNER and old_state is not CellState.CONFLICT:
-            raise ValueError("Cannot mark WINNER on a cell wit NO CONFLICT.")
-        if candidate_state is CellState.RESOLVED and old_state not in (CellState.CHOSEN, CellState.CONFLICT):
-            raise ValueError(f"Can only set RESOLVED from CHOSEN/CONFLICT nor can be setted up RESOLVED AGAIN[{old_state.name} -> {candidate_state.name}]")
-        raise ValueError(f"Transition {old_state.name} -> {candidate_state.name} is not allowed.")
-
-    computed_state = STATE_LOGIC.get(transition_key)
+    computed = _COMPUTED_ROWS[STATE_ORDINAL[old_state]][STATE_ORDINAL[candidate_state]]
+    if computed == NOT_ALLOWED:
+        _raise_transition_error(old_state, candidate_state)
     
     # IMPORTANT no deberia ser necesario pero nos indica si no tenenmos sincronizado las transiciones del enum con las transiciones permitidas
-    if computed_state is None:
+    if computed == NOT_DEFINED:
         raise ValueError(f"Transition {old_state.name} -> {candidate_state.name} is not defined.")
     
-    return computed_state
+    return STATES[computed]
 
 
 def apply_state_transition(cell: GridCell, candidate_state: CellState,
@@ -212,10 +327,161 @@ def apply_state_transition(cell: GridCell, candidate_state: CellState,
     # 2) apply
     cell.set_state(computed_state)
 
+    counter = _transition_counts.get()
+    if counter is not None:
+        counter[KEY_TABLE[STATE_ORDINAL[old_state]][STATE_ORDINAL[candidate_state]]] += 1
+
     # 3) handler
-    t = TransitionKey((old_state, candidate_state))
-    handler = TRANSITION_HANDLERS.get(t)
-    if handler:
-        handler(cell, old_state, candidate_state, computed_state, org_pos)
+    handler_id = _HANDLER_ROWS[STATE_ORDINAL[old_state]][STATE_ORDINAL[candidate_state]]
+    if handler_id:
+        HANDLERS[handler_id](cell, old_state, candidate_state, computed_state, org_pos)
+
+    return computed_state
+
+
+# --- Handlers en bloque (sobre ArrayCellStore) ---
+# Version vectorizada de los handlers mas frecuentes; el resto se llama celda a celda.
+BulkHandler = Callable[[Any, np.ndarray, Optional[np.ndarray]], None]
+
+def _bulk_arrow_from_origin(store, indices: np.ndarray, origins: Optional[np.ndarray]) -> None:
+    if origins is None:
+        raise ValueError("Origin must be provided to set arrow symbol.")
+    rows, cols = np.divmod(indices, store.width)
+    d_row = rows - origins[:, 0]
+    d_col = cols - origins[:, 1]
+    # Vecinas a mas de una celda: del otro lado de un grid toroidal (ver calculate_cmd_arrow)
+    d_row = np.sign(np.where(np.abs(d_row) > 1, -d_row, d_row))
+    d_col = np.sign(np.where(np.abs(d_col) > 1, -d_col, d_col))
+    codes = np.array([store.symbol_code(DIRECTION_SYMBOLS[(dr, dc)])
+                      for dr in (-1, 0, 1) for dc in (-1, 0, 1)], dtype=store.symbol.dtype)
+    store.symbol[indices] = codes[(d_row + 1) * 3 + (d_col + 1)]
+
+def _bulk_conflict_cross(store, indices: np.ndarray, origins: Optional[np.ndarray]) -> None:
+    store.symbol[indices] = store.symbol_code("X")
+
+BULK_HANDLERS: Dict[TransitionHandler, BulkHandler] = {
+    on_FREE_TO_INTENDED: _bulk_arrow_from_origin,
+    on_INTENDED_TO_INTENDED: _bulk_arrow_from_origin,
+    on_CONFLICT_TO_RESOLVED: _bulk_arrow_from_origin,
+    on_CHOSEN_TO_CHOSEN: _bulk_conflict_cross,
+}
+
+
+def apply_state_transitions(cells_or_indices: Union[Sequence[GridCell], np.ndarray],
+                            candidate_state: CellState,
+                            origins: Optional[Union[Sequence[Tuple[int, int]], np.ndarray]] = None,
+                            store=None) -> Union[List[CellState], np.ndarray]:
+    """
+    Applies the same candidate state to many cells, with the same result and
+    errors as calling apply_state_transition on each one in order.
+
+    Args:
+        cells_or_indices: A sequence of GridCell, or an int array of flat cell
+            indices of ``store`` (an ArrayCellStore).
+        candidate_state (CellState): State requested for every cell.
+        origins: Optional (row, col) origin per cell, used by the arrow handlers.
+        store: ArrayCellStore the indices refer to. Required for indices.
+
+    Returns:
+        The computed state of every cell: a list of CellState for cells, an
+        int8 array of state values for indices.
+    """
+    if store is None:
+        if origins is None:
+            return [apply_state_transition(cell, candidate_state) for cell in cells_or_indices]
+        return [apply_state_transition(cell, candidate_state, org_pos=tuple(pos))
+                for cell, pos in zip(cells_or_indices, origins)]
+
+    indices = np.asarray(cells_or_indices, dtype=np.int64)
+    if origins is not None:
+        origins = np.asarray(origins, dtype=np.int64).reshape(-1, 2)
+
+    # Una misma celda puede aparecer varias veces (CHOSEN dos veces => CONFLICT):
+    # la k-esima aparicion de cada celda se aplica en la ronda k.
+    cells, inverse = np.unique(indices, return_inverse=True)
+    occurrence = _occurrence_rank(inverse)
+    n_rounds = int(occurrence.max()) + 1 if len(indices) else 0
+
+    failure = _first_failure(store, cells, inverse, occurrence, n_rounds, candidate_state)
+    if failure is not None:
+        # Como en el bucle escalar: se aplican las anteriores y falla la misma celda
+        position, old_state = failure
+        if position:
+            apply_state_transitions(indices[:position], candidate_state,
+                                    None if origins is None else origins[:position], store)
+        if candidate_state is CellState.WINNER and store.occupant[indices[position]] == store.EMPTY:
+            raise ValueError("Cannot set WINNER on a cell that is free.")
+        compute_state(old_state, candidate_state)
+
+    store.dirty.add(cells)
+    computed_values = np.empty(len(indices), dtype=np.int8)
+    for round_ in range(n_rounds):
+        sel = np.flatnonzero(occurrence == round_)
+        computed_values[sel] = _apply_round(store, indices[sel], candidate_state,
+                                            None if origins is None else origins[sel])
+    return computed_values
+
+
+def _occurrence_rank(inverse: np.ndarray) -> np.ndarray:
+    """For each element, how many earlier elements refer to the same cell."""
+    order = np.argsort(inverse, kind="stable")
+    sorted_inv = inverse[order]
+    starts = np.r_[True, sorted_inv[1:] != sorted_inv[:-1]] if len(inverse) else np.zeros(0, dtype=bool)
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(len(inverse)), 0))
+    occurrence = np.empty(len(inverse), dtype=np.int64)
+    occurrence[order] = np.arange(len(inverse)) - group_start
+    return occurrence
+
+
+def _first_failure(store, cells: np.ndarray, inverse: np.ndarray, occurrence: np.ndarray,
+                   n_rounds: int, candidate_state: CellState) -> Optional[Tuple[int, CellState]]:
+    """
+    Runs the transitions on a scratch copy of the states and returns the
+    position and old state of the first element (in input order) that
+    apply_state_transition would reject, or None if all are allowed.
+    """
+    current = VALUE_TO_ORDINAL[store.state[cells] + _VALUE_OFFSET].astype(np.int64)
+    cand_ord = STATE_ORDINAL[candidate_state]
+    winner_on_free = (store.occupant[cells] == store.EMPTY) & (candidate_state is CellState.WINNER)
+    first = None
+    for round_ in range(n_rounds):
+        sel = np.flatnonzero(occurrence == round_)
+        cell_sel = inverse[sel]
+        old = current[cell_sel]
+        computed = COMPUTED_TABLE[old, cand_ord]
+        bad = (computed < 0) | winner_on_free[cell_sel]
+        if bad.any():
+            k = np.argmax(bad)
+            if first is None or sel[k] < first[0]:
+                first = (int(sel[k]), STATES[old[k]])
+        current[cell_sel] = np.where(bad, old, computed)
+    return first
+
+
+def _apply_round(store, indices: np.ndarray, candidate_state: CellState,
+                 origins: Optional[np.ndarray]) -> np.ndarray:
+    """Applies one allowed candidate state to unique cell indices of an ArrayCellStore."""
+    old_ord = VALUE_TO_ORDINAL[store.state[indices] + _VALUE_OFFSET]
+    cand_ord = STATE_ORDINAL[candidate_state]
+    computed = COMPUTED_TABLE[old_ord, cand_ord]
+
+    new_values = ORDINAL_TO_VALUE[computed]
+    store.state[indices] = new_values
+    counter = _transition_counts.get()
+    if counter is not None:
+        _count_ordinals(counter, old_ord, cand_ord)
+
+    handler_ids = HANDLER_TABLE[old_ord, cand_ord]
+    for handler_id in np.unique(handler_ids[handler_ids > 0]):
+        sel = handler_ids == handler_id
+        handler = HANDLERS[handler_id]
+        sel_origins = None if origins is None else origins[sel]
+        bulk = BULK_HANDLERS.get(handler)
+        if bulk is not None:
+            bulk(store, indices[sel], sel_origins)
+            continue
+        for k, (index, old, new) in enumerate(zip(indices[sel], old_ord[sel], computed[sel])):
+            pos = None if sel_origins is None else tuple(sel_origins[k].tolist())
+            handler(CellView(store, int(index)), STATES[old], candidate_state, STATES[new], pos)
 
-    return computed_state
\ No newline at end of file
+    return new_values
@@ -0,0 +1,236 @@
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import numpy as np
+
+from src.cmd.cmd import DEFAULT_CELL_SYMBOL
+from .gridcell import CellState
+
+if TYPE_CHECKING:
+    from ..organism.organism import Organism
+    from ..organism.registry import OrganismRegistry
+
+
+def sorted_unique(values: np.ndarray) -> np.ndarray:
+    """Sorted distinct values of an int array."""
+    # np.unique por hash es mucho mas lento que ordenar con enteros grandes
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+class DirtyCells:
+    """
+    Flat indices of the cells written since the last take(): the cells the
+    end-of-turn reset has to visit. Bulk writes add arrays, single writes
+    one index; repeated indices are allowed and only dropped when the set
+    is read, so marking a cell costs an append.
+    """
+
+    # Indices pendientes a partir de los que se quitan repeticiones sin esperar al reset
+    _COMPACT_AT = 1 << 16
+
+    def __init__(self) -> None:
+        self._parts: List[np.ndarray] = []
+        self._singles: List[int] = []
+        self._pending = 0
+        self._compact_at = self._COMPACT_AT
+
+    def add(self, indices: np.ndarray) -> None:
+        indices = np.array(indices, dtype=np.int64).ravel()
+        if len(indices) == 0:
+            return
+        self._parts.append(indices)
+        self._pending += len(indices)
+        if self._pending > self._compact_at:
+            self._compact()
+
+    def add_one(self, index: int) -> None:
+        self._singles.append(index)
+
+    def _compact(self) -> np.ndarray:
+        parts = self._parts
+        if self._singles:
+            parts.append(np.array(self._singles, dtype=np.int64))
+            self._singles = []
+        cells = sorted_unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+        self._parts = [cells] if len(cells) else []
+        self._pending = len(cells)
+        # Umbral proporcional a las celdas distintas: el coste de compactar queda amortizado
+        self._compact_at = max(self._COMPACT_AT, 2 * len(cells))
+        return cells
+
+    def peek(self) -> np.ndarray:
+        """Sorted distinct indices marked so far."""
+        return self._compact().copy()
+
+    def take(self) -> np.ndarray:
+        """Sorted distinct indices marked so far, forgetting them."""
+        cells = self._compact()
+        self.clear()
+        return cells
+
+    def clear(self) -> None:
+        self._parts = []
+        self._singles = []
+        self._pending = 0
+        self._compact_at = self._COMPACT_AT
+
+
+class ArrayCellStore:
+    """
+    Array-backed storage for the cells of a Grid.
+
+    Cell state, occupant id and symbol live in flat NumPy arrays indexed by
+    ``row * width + col``. GridCell objects are not stored; ``CellView``
+    instances are created on demand and read/write these arrays. Occupant
+    ids are resolved to Organism objects through the grid OrganismRegistry.
+
+    Every write of a state or symbol marks its cell in ``dirty`` (the
+    store methods and CellView do it; code writing the arrays directly
+    marks the indices itself), so the end-of-turn reset only visits the
+    cells touched during the turn.
+
+    Symbol codes: >= 0 index the symbol table, ORG_SYMBOL prints the current
+    occupant id and codes below it keep the id of an organism that has just
+    left the cell (``FORMER_ORG_BASE - id``), so ids never fill the table.
+    """
+
+    EMPTY = -1          # occupant id of a cell with no organism
+    ORG_SYMBOL = -1     # symbol code meaning "print the occupant id"
+    DEFAULT_SYMBOL = 0  # code of DEFAULT_CELL_SYMBOL
+    FORMER_ORG_BASE = -2
+
+    def __init__(self, width: int, height: int, registry: "OrganismRegistry",
+                 arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> None:
+        """
+        Args:
+            width (int): Grid width.
+            height (int): Grid height.
+            registry (OrganismRegistry): Registry that resolves occupant ids.
+            arrays: Existing (state, occupant, symbol) arrays to use as they
+                are, e.g. memory-mapped from a checkpoint. New arrays if None.
+        """
+        self._width = width
+        self._height = height
+        if arrays is None:
+            self._init_arrays(width * height)
+        else:
+            self.state, self.occupant, self.symbol = arrays
+            if any(len(array) != width * height for array in arrays):
+                raise ValueError("Cell arrays do not match the grid size")
+
+        # Tabla de simbolos: codigo -> str (0 es el simbolo por defecto)
+        self._symbols = [DEFAULT_CELL_SYMBOL]
+        self._symbol_codes: Dict[str, int] = {DEFAULT_CELL_SYMBOL: 0}
+        self._registry = registry
+        # Enteros de fila/columna compartidos por todas las tuplas de posicion
+        self._rows = list(range(height))
+        self._cols = list(range(width))
+        self.dirty = DirtyCells()
+
+    def _init_arrays(self, size: int) -> None:
+        self.state = np.full(size, CellState.FREE.value, dtype=np.int8)
+        self.occupant = np.full(size, self.EMPTY, dtype=np.int64)
+        self.symbol = np.full(size, self.DEFAULT_SYMBOL, dtype=np.int32)
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def size(self) -> int:
+        return self._width * self._height
+
+    def contains(self, position: Tuple[int, int]) -> bool:
+        return 0 <= position[0] < self._height and 0 <= position[1] < self._width
+
+    def index(self, position: Tuple[int, int]) -> int:
+        """
+        Returns the flat index of a (row, col) position.
+        """
+        return position[0] * self._width + position[1]
+
+    def position(self, index: int) -> Tuple[int, int]:
+        """
+        Returns the (row, col) position of a flat index.
+        """
+        row, col = divmod(int(index), self._width)
+        return self._rows[row], self._cols[col]
+
+    def symbol_code(self, symbol: str) -> int:
+        """
+        Returns the code of a symbol, adding it to the symbol table if it is new.
+        """
+        code = self._symbol_codes.get(symbol)
+        if code is None:
+            code = len(self._symbols)
+            self._symbols.append(symbol)
+            self._symbol_codes[symbol] = code
+        return code
+
+    def _former_org_code(self, org_id: int) -> int:
+        code = self.FORMER_ORG_BASE - org_id
+        if code < np.iinfo(self.symbol.dtype).min:
+            # Id demasiado grande para el array: va a la tabla
+            return self.symbol_code(str(org_id))
+        return code
+
+    def get_symbol(self, index: int) -> str:
+        code = self.symbol[index]
+        if code < 0:
+            if code == self.ORG_SYMBOL:
+                return str(self.occupant[index])
+            return str(self.FORMER_ORG_BASE - code)
+        return self._symbols[code]
+
+    def set_symbol(self, index: int, symbol: str) -> None:
+        occupant = self.occupant[index]
+        # El id del organismo no se guarda en la tabla, se deriva del ocupante
+        if occupant != self.EMPTY and symbol == str(occupant):
+            self.symbol[index] = self.ORG_SYMBOL
+        else:
+            self.symbol[index] = self.symbol_code(symbol)
+        self.dirty.add_one(index)
+
+    def get_organism(self, index: int) -> Optional["Organism"]:
+        occupant = self.occupant[index]
+        if occupant == self.EMPTY:
+            return None
+        return self._registry.get(int(occupant))
+
+    def set_organism(self, index: int, organism: Optional["Organism"]) -> None:
+        if organism is None:
+            occupant = self.occupant[index]
+            if occupant != self.EMPTY:
+                if self.symbol[index] == self.ORG_SYMBOL:
+                    self.symbol[index] = self._former_org_code(int(occupant))
+            self.occupant[index] = self.EMPTY
+        else:
+            if self._registry.get(organism.id) is not organism:
+                raise ValueError(f"Organism {organism.id} is not registered in this grid")
+            self.occupant[index] = organism.id
+        self.dirty.add_one(index)
+
+    def dense_states(self) -> np.ndarray:
+        """
+        State value of every cell, flat. May be the state array itself: do not modify it.
+        """
+        return self.state
+
+    def reset_transient_states(self) -> np.ndarray:
+        """
+        Occupied cells go back to NOT_FREE with the organism id as symbol,
+        the rest to FREE with the default symbol. Only the dirty cells are
+        visited: the others already are in that state.
+
+        Returns:
+            np.ndarray: Sorted flat indices of the cells visited (the ones
+            written since the previous reset).
+        """
+        cells = self.dirty.take()
+        occupied = self.occupant[cells] != self.EMPTY
+        self.state[cells] = np.where(occupied, CellState.NOT_FREE.value, CellState.FREE.value)
+        self.symbol[cells] = np.where(occupied, self.ORG_SYMBOL, self.DEFAULT_SYMBOL)
+        return cells
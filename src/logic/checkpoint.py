@@ -0,0 +1,188 @@
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.organism.organism import Organism
+from .grid import Grid
+from .observer import SimulationObserver
+from .simulation import Simulation
+from .sparsestore import SparseCellStore
+
+# Formato: MAGIC, version (uint32), longitud de la cabecera (uint32), cabecera JSON
+# y las secciones de datos, cada una alineada a _ALIGN bytes para poder mapearlas
+MAGIC = b"LIFECKPT"
+CHECKPOINT_VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+_ALIGN = 64
+
+# Contadores de Simulation que se guardan tal cual
+_TOTALS = ("_n_total_intentions", "_n_total_conflicts", "_n_total_moves",
+           "_n_total_blocked", "_n_total_conflict_rounds")
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _sections(sim: Simulation, cell_arrays: bool = True) -> Dict[str, np.ndarray]:
+    grid = sim.grid
+    registry = grid.registry
+    sections = {
+        "org_ids": registry.ids,
+        "org_positions": registry.positions,
+    }
+    store = grid.store
+    if cell_arrays and store is not None and not isinstance(store, SparseCellStore):
+        sections["state"] = store.state
+        sections["occupant"] = store.occupant
+        sections["symbol"] = store.symbol
+    return sections
+
+
+def save_checkpoint(sim: Simulation, path: str, cell_arrays: bool = True) -> None:
+    """
+    Writes the state of ``sim`` between two turns to a binary file.
+
+    Saved: the organism table (ids, positions in registry order), the turn
+    counter and totals, the settings of the grid and the simulation, the
+    state of the random generator and, for BACKEND_ARRAY grids, the cell
+    state/occupant/symbol arrays as they are in memory (restored with a
+    memory map). Dict and sparse grids are rebuilt from the organism table:
+    between turns their cells follow from the occupants.
+
+    The file is written next to ``path`` and renamed over it when complete.
+
+    Args:
+        sim (Simulation): Simulation to save (not in the middle of a turn).
+        path (str): Destination file.
+        cell_arrays (bool): Save the cell arrays of a BACKEND_ARRAY grid. If
+            False the file only has the organism table (much smaller on
+            sparse grids) and the cells are rebuilt from it on load.
+    """
+    grid = sim.grid
+    sections = _sections(sim, cell_arrays)
+
+    table: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, array in sections.items():
+        table[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = _aligned(offset + array.nbytes)
+
+    header = {
+        "grid": {
+            "width": grid.width,
+            "height": grid.height,
+            "backend": grid.backend,
+            "topology": grid.topology,
+            "neighbourhood": grid.neighbourhood,
+            "precompute_neighbours": grid.neighbour_table is not None,
+            "chunk_shape": list(grid.store.chunk_shape) if isinstance(grid.store, SparseCellStore) else None,
+        },
+        "simulation": {
+            "turn": sim.turn,
+            "engine": sim._engine,
+            "max_conflict_rounds": sim._max_conflict_rounds,
+            "totals": {name: getattr(sim, name) for name in _TOTALS},
+        },
+        "rng": sim.rng.bit_generator.state,
+        "sections": table,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _aligned(_PREFIX.size + len(header_bytes))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, CHECKPOINT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in sections.items():
+            f.seek(data_start + table[name]["offset"])
+            # Sin copia: el buffer del array va directo al fichero
+            f.write(memoryview(np.ascontiguousarray(array)).cast("B"))
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_header(path: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Returns the JSON header of a checkpoint and the offset of its data.
+
+    Raises:
+        ValueError: If the file is not a checkpoint or its version is newer
+            than CHECKPOINT_VERSION.
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"{path} is not a simulation checkpoint")
+        magic, version, header_len = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a simulation checkpoint")
+        if version > CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint version {version} is newer than supported ({CHECKPOINT_VERSION})")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    return header, _aligned(_PREFIX.size + header_len)
+
+
+def _read_section(path: str, data_start: int, spec: Dict[str, Any], mmap_mode: Optional[str]) -> np.ndarray:
+    shape = tuple(spec["shape"])
+    dtype = np.dtype(spec["dtype"])
+    offset = data_start + spec["offset"]
+    if mmap_mode is None or int(np.prod(shape)) == 0:
+        count = int(np.prod(shape))
+        return np.fromfile(path, dtype=dtype, count=count, offset=offset).reshape(shape)
+    return np.memmap(path, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape)
+
+
+def load_checkpoint(path: str, engine: Optional[str] = None, headless: bool = True,
+                    observers: Optional[List[SimulationObserver]] = None,
+                    mmap_mode: Optional[str] = "c", **simulation_kwargs) -> Simulation:
+    """
+    Rebuilds a Simulation from save_checkpoint. The restored simulation
+    continues with the same turns the saved one would have run.
+
+    Args:
+        path (str): Checkpoint file.
+        engine (Optional[str]): Intention engine, the saved one if None.
+        headless (bool): Same as Simulation(headless=...).
+        observers (List[SimulationObserver]): Same as Simulation(observers=...).
+        mmap_mode (Optional[str]): How the cell arrays of a BACKEND_ARRAY grid
+            are mapped (np.memmap modes). The default "c" (copy-on-write)
+            reads pages on demand and never writes the file, so several
+            simulations can fork from the same checkpoint. None reads them
+            into memory.
+        **simulation_kwargs: Other Simulation arguments (tiled...).
+
+    Raises:
+        ValueError: If the file is not a valid checkpoint.
+    """
+    header, data_start = read_header(path)
+    sections = {name: _read_section(path, data_start, spec,
+                                    mmap_mode if name in ("state", "occupant", "symbol") else None)
+                for name, spec in header["sections"].items()}
+
+    g = header["grid"]
+    ids = sections["org_ids"].tolist()
+    positions = sections["org_positions"].tolist()
+    organisms = [Organism(org_id, (row, col)) for org_id, (row, col) in zip(ids, positions)]
+    cell_arrays = None
+    if "state" in sections:
+        cell_arrays = (sections["state"], sections["occupant"], sections["symbol"])
+    grid = Grid(g["width"], g["height"], organisms, backend=g["backend"], topology=g["topology"],
+                neighbourhood=g["neighbourhood"], precompute_neighbours=g["precompute_neighbours"],
+                chunk_shape=tuple(g["chunk_shape"]) if g["chunk_shape"] else None,
+                cell_arrays=cell_arrays)
+
+    s = header["simulation"]
+    rng_state = header["rng"]
+    rng = np.random.Generator(getattr(np.random, rng_state["bit_generator"])())
+    rng.bit_generator.state = rng_state
+
+    sim = Simulation(grid, engine=engine or s["engine"], headless=headless, observers=observers,
+                     max_conflict_rounds=s["max_conflict_rounds"], rng=rng, **simulation_kwargs)
+    sim._turn = s["turn"]
+    for name, value in s["totals"].items():
+        setattr(sim, name, value)
+    return sim
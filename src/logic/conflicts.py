@@ -0,0 +1,88 @@
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+from .intentions import draw_choice_indices
+
+
+class MoveGroups(NamedTuple):
+    """
+    Chosen moves grouped by target cell. Groups are in the order their cell
+    was first chosen and the members of a group in the order they chose it,
+    the same order the old dict of lists (target -> [org ids]) had.
+    """
+    cells: np.ndarray       # celda destino (indice plano) de cada grupo
+    starts: np.ndarray      # primer miembro de cada grupo en ``members``
+    counts: np.ndarray      # organismos que eligieron la celda
+    members: np.ndarray     # ids de organismo, agrupados
+
+    def select(self, mask: np.ndarray) -> "MoveGroups":
+        """Only the groups in ``mask``, packed again."""
+        counts = self.counts[mask]
+        starts = np.r_[0, np.cumsum(counts)[:-1]].astype(np.int64) if len(counts) else counts
+        members = self.members[_member_indices(self.starts[mask], counts)]
+        return MoveGroups(self.cells[mask], starts, counts, members)
+
+    def split(self) -> List[List[int]]:
+        """Members of every group as lists."""
+        members = self.members.tolist()
+        stops = (self.starts + self.counts).tolist()
+        return [members[start:stop] for start, stop in zip(self.starts.tolist(), stops)]
+
+
+class ConflictRound(NamedTuple):
+    """Result of resolving every conflict of a round at once."""
+    picks: np.ndarray           # indice del ganador dentro de su grupo
+    winners: np.ndarray         # id del ganador de cada conflicto
+    losers: np.ndarray          # ids de los perdedores, conflicto a conflicto
+    loser_conflict: np.ndarray  # conflicto (indice de grupo) de cada perdedor
+
+
+def _member_indices(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # Indices de los miembros de varios grupos, concatenados
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+    return np.repeat(starts - offsets, counts) + np.arange(total)
+
+
+def group_moves(org_ids: np.ndarray, targets: np.ndarray) -> MoveGroups:
+    """
+    Groups the chosen moves (``org_ids[i]`` chose cell ``targets[i]``) by
+    target with one stable sort: every conflict is found at once.
+    """
+    org_ids = np.asarray(org_ids, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if len(targets) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return MoveGroups(empty, empty, empty, empty)
+    order = np.argsort(targets, kind="stable")
+    sorted_targets = targets[order]
+    sorted_starts = np.flatnonzero(np.r_[True, sorted_targets[1:] != sorted_targets[:-1]])
+    sorted_counts = np.diff(np.r_[sorted_starts, len(targets)])
+    # Orden estable: el primer miembro de cada grupo es su primera eleccion
+    first_choice = order[sorted_starts]
+    by_first = np.argsort(first_choice, kind="stable")
+    counts = sorted_counts[by_first]
+    members = org_ids[order[_member_indices(sorted_starts[by_first], counts)]]
+    starts = np.r_[0, np.cumsum(counts)[:-1]].astype(np.int64)
+    return MoveGroups(targets[first_choice[by_first]], starts, counts, members)
+
+
+def resolve_round(conflicts: MoveGroups, uniforms: np.ndarray) -> ConflictRound:
+    """
+    Picks the winner of every conflict from one uniform per conflict (see
+    draw_choice_indices), as the per-conflict loop did.
+    """
+    picks = draw_choice_indices(conflicts.counts, uniforms)
+    winner_at = conflicts.starts + picks
+    is_loser = np.ones(len(conflicts.members), dtype=bool)
+    is_loser[winner_at] = False
+    loser_conflict = np.repeat(np.arange(len(conflicts.cells)), conflicts.counts)[is_loser]
+    return ConflictRound(picks, conflicts.members[winner_at], conflicts.members[is_loser], loser_conflict)
+
+
+def flat_to_positions(cells: np.ndarray, width: int) -> List[Tuple[int, int]]:
+    rows, cols = np.divmod(cells, width)
+    return list(zip(rows.tolist(), cols.tolist()))
@@ -0,0 +1,209 @@
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .grid import Grid
+from .population import build_grid, uniform_cells
+from .simulation import Simulation
+
+# Disposiciones iniciales de los organismos
+LAYOUT_RANDOM = "random"      # density * celdas, sin repetir celda
+LAYOUT_DIAGONAL = "diagonal"  # como Grid._DEFAULT_ORGS_DIAGONAL, en toda la diagonal
+LAYOUT_TRIPLE = "triple"      # Grid._DEFAULT_TRIPLE
+LAYOUT_CUSTOM = "custom"      # RunSpec.positions
+
+Summarizer = Callable[[Simulation, "RunSpec"], Any]
+
+
+class RunSpec(NamedTuple):
+    """
+    One independent simulation of an ensemble. Everything a worker needs
+    to rebuild it: the same spec always gives the same run.
+    """
+    run_id: int
+    seed: int
+    width: int = 10
+    height: int = 10
+    n_turns: int = 10
+    layout: str = LAYOUT_RANDOM
+    density: float = 0.1
+    positions: Optional[Tuple[Tuple[int, int], ...]] = None
+    backend: str = Grid.BACKEND_ARRAY
+    engine: str = Simulation.ENGINE_VECTORIZED
+    topology: str = Grid.TOPOLOGY_BOUNDED
+    neighbourhood: str = Grid.NEIGHBOURHOOD_MOORE
+    max_conflict_rounds: int = 8
+
+
+class RunSummary(NamedTuple):
+    """
+    What a worker sends back for a run: totals only, never the grid.
+    ``result`` holds the output of a custom summarizer, if one was given.
+    """
+    run_id: int
+    seed: int
+    turns: int
+    n_organisms: int
+    n_moves: int
+    n_conflicts: int
+    n_blocked: int
+    n_conflict_rounds: int
+    elapsed: float
+    result: Any = None
+    error: Optional[str] = None
+    attempts: int = 1
+
+
+def make_specs(n_runs: int, base_seed: int = 0, **spec_fields) -> List[RunSpec]:
+    """
+    ``n_runs`` specs with independent seeds derived from ``base_seed``
+    (numpy SeedSequence), sharing the rest of the fields.
+    """
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(base_seed).spawn(n_runs)]
+    return [RunSpec(run_id=i, seed=seed, **spec_fields) for i, seed in enumerate(seeds)]
+
+
+def layout_cells(spec: RunSpec) -> np.ndarray:
+    """
+    Starting flat cells (row * width + col) of the organisms of a spec.
+    """
+    if spec.layout == LAYOUT_RANDOM:
+        n_cells = spec.width * spec.height
+        n_orgs = min(n_cells, max(1, int(round(n_cells * spec.density))))
+        return uniform_cells(spec.width, spec.height, n_orgs, spec.seed)
+    if spec.layout == LAYOUT_DIAGONAL:
+        return np.arange(min(spec.width, spec.height), dtype=np.int64) * (spec.width + 1)
+    if spec.layout == LAYOUT_TRIPLE:
+        positions = [o.position for o in Grid._DEFAULT_TRIPLE]
+    elif spec.layout == LAYOUT_CUSTOM:
+        if not spec.positions:
+            raise ValueError("The custom layout needs positions")
+        positions = spec.positions
+    else:
+        raise ValueError(f"Unknown layout '{spec.layout}'")
+    rows, cols = np.asarray(positions, dtype=np.int64).reshape(-1, 2).T
+    if ((rows < 0) | (rows >= spec.height) | (cols < 0) | (cols >= spec.width)).any():
+        raise ValueError("Cannot place organisms outside the grid")
+    return rows * spec.width + cols
+
+
+def layout_positions(spec: RunSpec) -> List[Tuple[int, int]]:
+    """
+    Starting (row, col) positions of the organisms of a spec.
+    """
+    rows, cols = np.divmod(layout_cells(spec), spec.width)
+    return list(zip(rows.tolist(), cols.tolist()))
+
+
+def build_run(spec: RunSpec) -> Simulation:
+    """
+    Headless simulation of a spec, with its generator seeded by the spec.
+    """
+    grid = build_grid(spec.width, spec.height, layout_cells(spec), backend=spec.backend,
+                      topology=spec.topology, neighbourhood=spec.neighbourhood)
+    return Simulation(grid, engine=spec.engine, headless=True,
+                      max_conflict_rounds=spec.max_conflict_rounds, rng=spec.seed)
+
+
+def run_spec(spec: RunSpec, summarize: Optional[Summarizer] = None, attempts: int = 1) -> RunSummary:
+    """
+    Runs one spec to the end. Errors are returned in the summary, not raised.
+    """
+    start = time.perf_counter()
+    try:
+        sim = build_run(spec)
+        stats = sim.run(spec.n_turns, every=max(spec.n_turns, 1))
+        result = summarize(sim, spec) if summarize is not None else None
+    except Exception as e:
+        return RunSummary(spec.run_id, spec.seed, 0, 0, 0, 0, 0, 0, time.perf_counter() - start,
+                          error=f"{type(e).__name__}: {e}", attempts=attempts)
+    return RunSummary(
+        run_id=spec.run_id,
+        seed=spec.seed,
+        turns=sim.turn,
+        n_organisms=len(sim.grid.organisms),
+        n_moves=stats.n_moves if stats else 0,
+        n_conflicts=stats.n_conflicts if stats else 0,
+        n_blocked=stats.n_blocked if stats else 0,
+        n_conflict_rounds=stats.n_conflict_rounds if stats else 0,
+        elapsed=time.perf_counter() - start,
+        result=result,
+        attempts=attempts,
+    )
+
+
+def _run_chunk(chunk: List[Tuple[RunSpec, int]], summarize: Optional[Summarizer]) -> List[RunSummary]:
+    # Se ejecuta en el worker: un fallo de una simulacion no tira el resto del bloque
+    return [run_spec(spec, summarize, attempts) for spec, attempts in chunk]
+
+
+def iter_ensemble(specs: Iterable[RunSpec], max_workers: Optional[int] = None,
+                  chunksize: Optional[int] = None, retries: int = 1,
+                  summarize: Optional[Summarizer] = None,
+                  progress: Optional[Callable[[int, int, RunSummary], None]] = None,
+                  mp_context=None) -> Iterator[RunSummary]:
+    """
+    Runs independent simulations in a process pool and yields their
+    summaries as they finish (not in run_id order).
+
+    Args:
+        specs (Iterable[RunSpec]): Runs to execute (see make_specs).
+        max_workers (Optional[int]): Worker processes, default os.cpu_count().
+        chunksize (Optional[int]): Runs sent to a worker at once. By default
+            about four chunks per worker, so short runs do not pay one
+            round trip each and long ones still balance.
+        retries (int): Extra attempts for a run that raised or whose worker
+            died. A run that still fails is yielded with ``error`` set.
+        summarize (Optional[Summarizer]): Module-level function (it is
+            pickled) called in the worker with the finished simulation; its
+            return value goes in RunSummary.result. Keep it small.
+        progress (Callable[[int, int, RunSummary], None]): Optional, called
+            in this process with (done, total, summary) after every run.
+        mp_context: multiprocessing context for the pool.
+    """
+    pending: List[Tuple[RunSpec, int]] = [(spec, 1) for spec in specs]
+    total = len(pending)
+    done = 0
+    workers = max_workers or os.cpu_count() or 1
+
+    while pending:
+        size = chunksize or max(1, math.ceil(len(pending) / (workers * 4)))
+        chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+        pending = []
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+            futures: Dict[Future, List[Tuple[RunSpec, int]]] = {
+                pool.submit(_run_chunk, chunk, summarize): chunk for chunk in chunks}
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk = futures.pop(future)
+                    try:
+                        summaries = future.result()
+                    except BrokenProcessPool as e:
+                        # El worker murio (memoria, señal...): todo el bloque cuenta como fallido
+                        summaries = [RunSummary(spec.run_id, spec.seed, 0, 0, 0, 0, 0, 0, 0.0,
+                                                error=f"{type(e).__name__}: {e}", attempts=attempts)
+                                     for spec, attempts in chunk]
+
+                    for (spec, attempts), summary in zip(chunk, summaries):
+                        if summary.error is not None and attempts <= retries:
+                            pending.append((spec, attempts + 1))
+                            continue
+                        done += 1
+                        if progress is not None:
+                            progress(done, total, summary)
+                        yield summary
+
+
+def run_ensemble(specs: Iterable[RunSpec], **kwargs) -> List[RunSummary]:
+    """
+    Same as iter_ensemble, but waits for every run and returns the
+    summaries sorted by run_id.
+    """
+    return sorted(iter_ensemble(specs, **kwargs), key=lambda s: s.run_id)
@@ -0,0 +1,316 @@
+import json
+import struct
+import zlib
+from typing import IO, Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .neighbourhood import direction_codes, step_cells
+from .observer import PHASE_APPLY, PHASE_CONFLICTS, SimulationObserver
+from .simulation import Simulation
+
+# Fichero: MAGIC, version (uint32), longitud de la cabecera (uint32), cabecera JSON
+# y un registro por turno: _RECORD + carga (comprimida con zlib si la cabecera lo indica)
+MAGIC = b"LIFELOG\0"
+EVENT_LOG_VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+# bytes de la carga, turno, intenciones, rondas de conflicto, movimientos, conflictos,
+# aspirantes (de todos los conflictos), bloqueados
+_RECORD = struct.Struct("<IQIIIIII")
+
+_ID_DTYPE = np.dtype("<i8")
+_SMALL_DTYPE = np.dtype("u1")
+
+
+class TurnEvents(NamedTuple):
+    """
+    What happened in one turn. Cells are flat indices (row * width + col).
+
+    Moves: organism ``move_ids[i]`` went from ``move_from[i]`` to
+    ``move_to[i]``. Conflicts: cell ``conflict_cells[j]`` was claimed by
+    ``conflict_sizes[j]`` organisms, listed in ``contenders`` one conflict
+    after another, and won by the one at ``winner_index[j]``. ``blocked``
+    holds the organisms that had nowhere to go (in any round).
+    """
+    turn: int
+    n_intentions: int
+    n_conflict_rounds: int
+    move_ids: np.ndarray
+    move_from: np.ndarray
+    move_to: np.ndarray
+    conflict_cells: np.ndarray
+    conflict_sizes: np.ndarray
+    winner_index: np.ndarray
+    contenders: np.ndarray
+    blocked: np.ndarray
+
+    def conflicts(self) -> Iterator[Tuple[int, List[int], int]]:
+        """Yields (cell, contender ids, winner id) for every conflict."""
+        starts = np.r_[0, np.cumsum(self.conflict_sizes)].tolist()
+        for j, cell in enumerate(self.conflict_cells.tolist()):
+            contenders = self.contenders[starts[j]:starts[j + 1]].tolist()
+            yield cell, contenders, contenders[int(self.winner_index[j])]
+
+
+def _cell_dtype(width: int, height: int) -> np.dtype:
+    return np.dtype("<u4") if width * height <= np.iinfo(np.uint32).max else np.dtype("<u8")
+
+
+class EventLogWriter(SimulationObserver):
+    """
+    Observer that writes a compact binary log of every turn: moves, conflicts
+    and blocked organisms. Together with a checkpoint of the starting turn
+    (see checkpoint.save_checkpoint) it is enough to rebuild any later turn
+    with replay(), without running the policy again.
+
+    Per move the log keeps the organism id, the destination cell and one
+    byte for the direction; records are zlib-compressed by default.
+
+    Args:
+        file: Path or binary file object to write to.
+        compress (bool): Compress every turn record with zlib.
+        level (int): zlib compression level.
+    """
+
+    def __init__(self, file: Union[str, IO[bytes]], compress: bool = True, level: int = 6) -> None:
+        self._own_file = isinstance(file, str)
+        self._file: IO[bytes] = open(file, "wb") if self._own_file else file
+        self._compress = compress
+        self._level = level
+        self._started = False
+        self._width = 0
+        self._height = 0
+        self._cell_dtype = np.dtype("<u8")
+        self._intentions_before = 0
+        self._reset_turn()
+
+    def _reset_turn(self) -> None:
+        self._moves: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._conflict_cells: List[int] = []
+        self._conflict_sizes: List[int] = []
+        self._winner_index: List[int] = []
+        self._contenders: List[int] = []
+        self._rounds = 0
+
+    def on_start(self, sim: Simulation) -> None:
+        if self._started:
+            raise RuntimeError("EventLogWriter can only follow one simulation")
+        self._started = True
+        grid = sim.grid
+        self._width, self._height = grid.width, grid.height
+        self._cell_dtype = _cell_dtype(grid.width, grid.height)
+        header = json.dumps({
+            "width": grid.width,
+            "height": grid.height,
+            "topology": grid.topology,
+            "start_turn": sim.turn,
+            "cell_dtype": self._cell_dtype.str,
+            "compressed": self._compress,
+        }).encode("utf-8")
+        self._file.write(_PREFIX.pack(MAGIC, EVENT_LOG_VERSION, len(header)))
+        self._file.write(header)
+        self._intentions_before = sim._n_total_intentions
+
+    def on_phase_start(self, sim: Simulation, phase: str) -> None:
+        if phase == PHASE_CONFLICTS:
+            self._rounds += 1
+        elif phase == PHASE_APPLY:
+            # Origen de cada movimiento: la posicion del organismo antes de moverse
+            moves = sim.confirmed_moves
+            registry = sim.grid.registry
+            ids = np.fromiter(moves.values(), dtype=np.int64, count=len(moves))
+            to = np.array(list(moves.keys()), dtype=np.int64).reshape(-1, 2)
+            origins = registry.positions[registry.indices_of(ids.tolist())]
+            self._moves = (ids,
+                           origins[:, 0] * self._width + origins[:, 1],
+                           to[:, 0] * self._width + to[:, 1])
+
+    def on_conflict(self, sim: Simulation, position: Tuple[int, int],
+                    contenders: List[int], winner: int, losers: List[int]) -> None:
+        self._conflict_cells.append(position[0] * self._width + position[1])
+        self._conflict_sizes.append(len(contenders))
+        self._winner_index.append(contenders.index(winner))
+        self._contenders.extend(contenders)
+
+    def on_turn_end(self, sim: Simulation) -> None:
+        ids, from_cells, to_cells = self._moves or (np.zeros(0, dtype=np.int64),) * 3
+        blocked = sim.blocked_orgs
+        arrays = (
+            ids.astype(_ID_DTYPE),
+            to_cells.astype(self._cell_dtype),
+            direction_codes(from_cells, to_cells, self._width),
+            np.array(self._conflict_cells, dtype=self._cell_dtype),
+            np.array(self._conflict_sizes, dtype=_SMALL_DTYPE),
+            np.array(self._winner_index, dtype=_SMALL_DTYPE),
+            np.array(self._contenders, dtype=_ID_DTYPE),
+            np.array(blocked, dtype=_ID_DTYPE),
+        )
+        payload = b"".join(a.tobytes() for a in arrays)
+        if self._compress:
+            payload = zlib.compress(payload, self._level)
+        n_intentions = sim._n_total_intentions - self._intentions_before
+        self._file.write(_RECORD.pack(len(payload), sim.turn, n_intentions, self._rounds, len(ids),
+                                      len(self._conflict_cells), len(self._contenders), len(blocked)))
+        self._file.write(payload)
+        self._intentions_before = sim._n_total_intentions
+        self._reset_turn()
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        """Flushes the log; closes the file if the writer opened it."""
+        self._file.flush()
+        if self._own_file:
+            self._file.close()
+
+
+class EventLogReader:
+    """
+    Reads a log written by EventLogWriter. Opening it scans only the record
+    headers, so any turn can then be read directly (scrubbing).
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        with open(path, "rb") as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                raise ValueError(f"{path} is not an event log")
+            magic, version, header_len = _PREFIX.unpack(prefix)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not an event log")
+            if version > EVENT_LOG_VERSION:
+                raise ValueError(f"Event log version {version} is newer than supported ({EVENT_LOG_VERSION})")
+            self._header: Dict[str, Any] = json.loads(f.read(header_len).decode("utf-8"))
+
+            # turno -> offset del registro. Si el proceso murio escribiendo, el
+            # ultimo registro puede estar cortado: se ignora
+            self._offsets: Dict[int, int] = {}
+            file_size = f.seek(0, 2)
+            offset = _PREFIX.size + header_len
+            while offset + _RECORD.size <= file_size:
+                f.seek(offset)
+                payload_len, turn = _RECORD.unpack(f.read(_RECORD.size))[:2]
+                end = offset + _RECORD.size + payload_len
+                if end > file_size:
+                    break
+                self._offsets[turn] = offset
+                offset = end
+
+        self._cell_dtype = np.dtype(self._header["cell_dtype"])
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        return self._header
+
+    @property
+    def turns(self) -> List[int]:
+        """Turns in the log, in order."""
+        return sorted(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __iter__(self) -> Iterator[TurnEvents]:
+        return self.iter_turns()
+
+    def iter_turns(self, start: Optional[int] = None, stop: Optional[int] = None) -> Iterator[TurnEvents]:
+        """Yields the turns in [start, stop] in order."""
+        with open(self._path, "rb") as f:
+            for turn in self.turns:
+                if (start is None or turn >= start) and (stop is None or turn <= stop):
+                    yield self._read(f, turn)
+
+    def read(self, turn: int) -> TurnEvents:
+        """
+        Raises:
+            KeyError: If the turn is not in the log.
+        """
+        with open(self._path, "rb") as f:
+            return self._read(f, turn)
+
+    def _read(self, f: IO[bytes], turn: int) -> TurnEvents:
+        f.seek(self._offsets[turn])
+        (payload_len, turn, n_intentions, n_rounds, n_moves, n_conflicts,
+         n_contenders, n_blocked) = _RECORD.unpack(f.read(_RECORD.size))
+        payload = f.read(payload_len)
+        if self._header["compressed"]:
+            payload = zlib.decompress(payload)
+
+        offset = 0
+
+        def take(dtype: np.dtype, count: int) -> np.ndarray:
+            nonlocal offset
+            array = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+            offset += count * dtype.itemsize
+            return array
+
+        move_ids = take(_ID_DTYPE, n_moves)
+        move_to = take(self._cell_dtype, n_moves)
+        move_codes = take(_SMALL_DTYPE, n_moves)
+        width, height = self._header["width"], self._header["height"]
+        return TurnEvents(
+            turn=turn,
+            n_intentions=n_intentions,
+            n_conflict_rounds=n_rounds,
+            move_ids=move_ids.astype(np.int64),
+            # El codigo opuesto (8 - codigo) vuelve del destino al origen
+            move_from=step_cells(move_to, 8 - move_codes, width, height),
+            move_to=move_to.astype(np.int64),
+            conflict_cells=take(self._cell_dtype, n_conflicts).astype(np.int64),
+            conflict_sizes=take(_SMALL_DTYPE, n_conflicts).astype(np.int64),
+            winner_index=take(_SMALL_DTYPE, n_conflicts).astype(np.int64),
+            contenders=take(_ID_DTYPE, n_contenders).astype(np.int64),
+            blocked=take(_ID_DTYPE, n_blocked).astype(np.int64),
+        )
+
+
+def apply_turn_events(sim: Simulation, events: TurnEvents) -> None:
+    """
+    Applies a logged turn to ``sim`` (which must be at turn events.turn - 1):
+    moves the organisms, clears the turn marks and advances the turn
+    counter and totals. The random generator is not touched.
+
+    Raises:
+        ValueError: If the turn does not follow, or an organism is not where
+            the log says it was.
+    """
+    if events.turn != sim.turn + 1:
+        raise ValueError(f"Cannot apply turn {events.turn} to a simulation at turn {sim.turn}")
+    grid = sim.grid
+    width = grid.width
+    registry = grid.registry
+    ids = events.move_ids.tolist()
+    positions = registry.positions[registry.indices_of(ids)]
+    if not np.array_equal(positions[:, 0] * width + positions[:, 1], events.move_from):
+        raise ValueError(f"Turn {events.turn} of the log does not match the simulation")
+
+    # Como Simulation._apply_moves: los destinos estaban libres, el orden no importa
+    for org_id, to in zip(ids, events.move_to.tolist()):
+        org = registry.get(org_id)
+        org.cell.empty()
+        grid.get_cell(divmod(to, width)).place_org(org)
+    grid.reset_transient_states()
+
+    sim._turn = events.turn
+    sim._n_total_moves += len(ids)
+    sim._n_total_conflicts += len(events.conflict_cells)
+    sim._n_total_blocked += len(events.blocked)
+    sim._n_total_intentions += events.n_intentions
+    sim._n_total_conflict_rounds += events.n_conflict_rounds
+
+
+def replay(sim: Simulation, log: Union[str, EventLogReader], until: Optional[int] = None) -> Simulation:
+    """
+    Advances ``sim`` (usually restored from a checkpoint) through the logged
+    turns that follow its current turn, up to ``until`` (inclusive, default
+    the end of the log). Observers are not notified.
+
+    Returns:
+        Simulation: ``sim``, for chaining.
+    """
+    reader = log if isinstance(log, EventLogReader) else EventLogReader(log)
+    for events in reader.iter_turns(start=sim.turn + 1, stop=until):
+        apply_turn_events(sim, events)
+    return sim
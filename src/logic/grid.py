@@ -1,17 +1,58 @@
-import random
-from typing import List, Optional, Tuple
+from itertools import compress
+from typing import Iterable, List, Optional, Tuple
 import numpy as np
 
 from src.cmd.cmd import ColorCmd, my_debug
 from src.organism.organism import Organism
-from .gridcell import CellState, GridCell
+from src.organism.registry import OrganismRegistry
+from .gridcell import CellState, CellView, GridCell
+from .cellstore import ArrayCellStore, DirtyCells
+from .sparsestore import SparseCellStore
+from .neighbourhood import (MOORE_OFFSETS, NO_NEIGHBOUR, VON_NEUMANN_OFFSETS,
+                            build_neighbour_table, neighbour_rows)
 
 class Grid:
     
     """
     Represents the simulation grid as a 2D array of GridCell objects.
+
+    Cells can be stored in three backends:
+    - ``BACKEND_DICT``: one GridCell object per cell in a dict keyed by "i_j".
+    - ``BACKEND_ARRAY``: NumPy arrays in an ArrayCellStore; get_cell returns
+      CellView objects created on demand.
+    - ``BACKEND_SPARSE``: like BACKEND_ARRAY, but the arrays are split in
+      chunks allocated only where there are organisms or marks
+      (SparseCellStore), for huge mostly empty worlds.
+
+    Organisms are indexed by an OrganismRegistry (id -> organism, positions
+    array, cell back-references).
+
+    Neighbours come from a (width * height, k) table of flat indices built
+    once at construction (NO_NEIGHBOUR marks missing neighbours), or are
+    computed on each query when the table is not precomputed. The
+    topology (bounded or torus) and neighbourhood (Moore or Von Neumann)
+    only change how the table is built.
+
+    Every cell written during a turn is recorded in a DirtyCells buffer;
+    the end-of-turn reset only visits those cells, so its cost follows the
+    activity of the turn, not width * height.
     """
     
+    # BACKENDS
+    BACKEND_DICT = "dict"
+    BACKEND_ARRAY = "array"
+    BACKEND_SPARSE = "sparse"
+    
+    # TOPOLOGIAS Y VECINDADES
+    TOPOLOGY_BOUNDED = "bounded"
+    TOPOLOGY_TORUS = "torus"
+    NEIGHBOURHOOD_MOORE = "moore"
+    NEIGHBOURHOOD_VON_NEUMANN = "von_neumann"
+    _NEIGHBOURHOOD_OFFSETS = {
+        NEIGHBOURHOOD_MOORE: MOORE_OFFSETS,
+        NEIGHBOURHOOD_VON_NEUMANN: VON_NEUMANN_OFFSETS,
+    }
+    
     # CONSTANTS
     _SCALE = 10
     _DEFAULT_WIDTH = _SCALE
@@ -19,29 +60,81 @@ class Grid:
     _DEFAULT_ORGS_DIAGONAL = [Organism(i, (i,i)) for i in range(_SCALE)]
     _DEFAULT_TRIPLE = [Organism(0, (0,0)),Organism(1, (1,0)), Organism(2, (0,1))]
     
-    def __init__(self, width_: int = None, height_: int = None, organisms_: List[Organism]= None) -> None:
+    def __init__(self, width_: int = None, height_: int = None, organisms_: List[Organism]= None,
+                 backend: str = BACKEND_DICT, topology: str = TOPOLOGY_BOUNDED,
+                 neighbourhood: str = NEIGHBOURHOOD_MOORE, precompute_neighbours: Optional[bool] = None,
+                 chunk_shape: Optional[Tuple[int, int]] = None,
+                 cell_arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> None:
         """
         Initializes a new grid of given dimensions, filling it with empty cells.
 
         Args:
             width (int): Number of columns in the grid.
             height (int): Number of rows in the grid.
+            organisms (List[Organism]): Organisms to place at start.
+            backend (str): Cell storage backend, BACKEND_DICT, BACKEND_ARRAY or BACKEND_SPARSE.
+            topology (str): TOPOLOGY_BOUNDED or TOPOLOGY_TORUS.
+            neighbourhood (str): NEIGHBOURHOOD_MOORE (8) or NEIGHBOURHOOD_VON_NEUMANN (4).
+            precompute_neighbours (bool): Build the neighbour table now; if False
+                neighbours are computed on each query (less memory). By default
+                True except for BACKEND_SPARSE.
+            chunk_shape (Tuple[int, int]): (rows, cols) of a BACKEND_SPARSE chunk,
+                SparseCellStore.DEFAULT_CHUNK_SHAPE if None.
+            cell_arrays: (state, occupant, symbol) arrays of a BACKEND_ARRAY grid
+                to use as they are (restoring a checkpoint). ``organisms_`` must
+                be the organisms the occupant array refers to.
         """
             
         self._height = height_ if height_ else self._DEFAULT_HEIGHT
         self._width = width_ if width_ else self._DEFAULT_WIDTH
-        self._organisms = organisms_ if organisms_ else self._DEFAULT_ORGS_DIAGONAL
+        if not organisms_ and cell_arrays is None:
+            # Copias: los organismos por defecto son de clase y no se pueden compartir entre grids
+            organisms_ = [Organism(o.id, o.position) for o in self._DEFAULT_ORGS_DIAGONAL]
+        self._registry = OrganismRegistry(organisms_)
+        self._backend = backend
         
-        self._cells: dict[str:GridCell] = {}
-        #Relleno el dict
-        for i in range(self._height):
-            for j in range(self._width):
-                id_key = f"{i}_{j}"
-                self._cells[id_key] = GridCell(id_key,(i,j))
-        self.place_orgs_init()
-        #TODO tener un array seria interesante?
+        if topology not in (self.TOPOLOGY_BOUNDED, self.TOPOLOGY_TORUS):
+            raise ValueError(f"Unknown grid topology '{topology}'")
+        if neighbourhood not in self._NEIGHBOURHOOD_OFFSETS:
+            raise ValueError(f"Unknown neighbourhood '{neighbourhood}'")
+        self._topology = topology
+        self._neighbourhood = neighbourhood
+        self._neighbour_offsets = self._NEIGHBOURHOOD_OFFSETS[neighbourhood]
+        self._neighbour_table: Optional[np.ndarray] = None
+        if precompute_neighbours is None:
+            precompute_neighbours = backend != self.BACKEND_SPARSE
+        if precompute_neighbours:
+            self._neighbour_table = build_neighbour_table(
+                self._width, self._height, self._neighbour_offsets, topology == self.TOPOLOGY_TORUS)
+        
+        self._cell_list: List[GridCell] = None   # celdas en orden de indice plano (= id de la celda)
+        self._store: Optional[ArrayCellStore] = None
+        self._last_reset = np.zeros(0, dtype=np.int64)
+        
+        if backend == self.BACKEND_DICT:
+            self._cell_list = []
+            self._dirty = DirtyCells()
+            # Los enteros de fila/columna se crean una vez y los comparten todas las tuplas de posicion
+            cols = list(range(self._width))
+            for i in range(self._height):
+                for j in cols:
+                    self._cell_list.append(GridCell(i * self._width + j, (i, j), self._dirty))
+        elif backend == self.BACKEND_ARRAY:
+            self._store = ArrayCellStore(self._width, self._height, self._registry, cell_arrays)
+        elif backend == self.BACKEND_SPARSE:
+            self._store = SparseCellStore(self._width, self._height, self._registry, chunk_shape)
+        else:
+            raise ValueError(f"Unknown grid backend '{backend}'")
+        if self._store is not None:
+            self._dirty = self._store.dirty
+        if cell_arrays is not None and backend != self.BACKEND_ARRAY:
+            raise ValueError("cell_arrays needs Grid.BACKEND_ARRAY")
+        
+        if cell_arrays is None:
+            self.place_orgs_init()
+        else:
+            self._bind_placed_orgs()
         
-    
         
     @property
     def width(self) -> int:
@@ -63,9 +156,118 @@ class Grid:
         """
         return self._height
     
+    @property
+    def backend(self) -> str:
+        """
+        Returns the name of the cell storage backend.
+        """
+        return self._backend
+    
+    @property
+    def store(self) -> Optional[ArrayCellStore]:
+        """
+        Returns the ArrayCellStore (or SparseCellStore) of an array-backed
+        grid, None otherwise.
+        """
+        return self._store
+    
+    @property
+    def topology(self) -> str:
+        return self._topology
+    
+    @property
+    def neighbourhood(self) -> str:
+        return self._neighbourhood
+    
+    @property
+    def neighbour_offsets(self) -> np.ndarray:
+        """
+        Returns the (k, 2) (row, col) offsets, in the column order of the neighbour table.
+        """
+        return self._neighbour_offsets
+    
+    @property
+    def neighbour_table(self) -> Optional[np.ndarray]:
+        """
+        Returns the precomputed (width * height, k) neighbour table, or None.
+        """
+        return self._neighbour_table
+    
+    def index_of(self, position: Tuple[int, int]) -> int:
+        """
+        Returns the flat index (row * width + col) of a position.
+        """
+        return position[0] * self._width + position[1]
+    
+    def position_of(self, index: int) -> Tuple[int, int]:
+        """
+        Returns the (row, col) position of a flat index.
+        """
+        return divmod(int(index), self._width)
+    
+    def neighbours(self, index: int) -> np.ndarray:
+        """
+        Returns the neighbour flat indices of one cell (NO_NEIGHBOUR where missing).
+        With a precomputed table this is a view of the table row, no copy.
+        """
+        if self._neighbour_table is not None:
+            return self._neighbour_table[index]
+        return self.neighbours_of(np.array([index]))[0]
+    
+    def neighbours_of(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Returns the (n, k) neighbour flat indices of several cells.
+        """
+        if self._neighbour_table is not None:
+            return self._neighbour_table[indices]
+        return neighbour_rows(indices, self._width, self._height, self._neighbour_offsets,
+                              self._topology == self.TOPOLOGY_TORUS)
+    
+    @property
+    def registry(self) -> OrganismRegistry:
+        """
+        Returns the organism registry of the grid.
+        """
+        return self._registry
+    
+    @property
+    def organisms(self) -> List[Organism]:
+        """
+        Returns the organisms of the grid in registry order.
+        """
+        return self._registry.organisms
+    
     @property
     def cells(self)->dict:
-        return self._cells
+        """
+        Returns the cells keyed by "i_j", built on demand (the grid keeps
+        them in a flat list indexed by cell id).
+        """
+        return {self._get_key_from_pos(cell.position): cell for cell in self.iter_cells()}
+    
+    def iter_cells(self):
+        """
+        Yields every cell of the grid in row-major order.
+        """
+        for i in range(self._height):
+            for j in range(self._width):
+                yield self.get_cell((i, j))
+    
+    def cell_states(self, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        State values (CellState.value, int8) of some cells, or of every cell
+        in flat order if ``indices`` is None. The result may share memory
+        with the grid: do not modify it.
+        """
+        if self._store is None:
+            cells = self._cell_list
+            if indices is None:
+                return np.fromiter((cell._state.value for cell in cells), dtype=np.int8, count=len(cells))
+            return np.fromiter((cells[i]._state.value for i in np.asarray(indices).tolist()),
+                               dtype=np.int8, count=len(indices))
+        if indices is None:
+            return self._store.dense_states()
+        return np.asarray(self._store.state[indices], dtype=np.int8)
     
     @property
     def cmd_state(self):
@@ -73,8 +275,7 @@ class Grid:
         for y in range(self.height):
             row = ''
             for x in range(self.width):
-                key = self._get_key_from_pos((y,x))
-                cell: GridCell = self._cells.get(key)
+                cell: GridCell = self.get_cell((y,x))
                 if cell is None:
                     row += "."
                     continue
@@ -99,10 +300,136 @@ class Grid:
         Returns:
             Optional[Organism]: The organism or None.
         """
-        for org in self._organisms:
-            if org.id == org_id:
-                return org
-        return None
+        return self._registry.get(org_id)
+
+    def add_organisms(self, organisms: Iterable[Organism]) -> None:
+        """
+        Registers and places several organisms at once (spawning).
+
+        Args:
+            organisms (Iterable[Organism]): New organisms, placed at their position.
+
+        Raises:
+            ValueError: If a position is out of bounds, repeated or occupied.
+        """
+        organisms = list(organisms)
+        if not organisms:
+            return
+        positions = np.array([o.position for o in organisms], dtype=np.int64).reshape(-1, 2)
+        rows, cols = positions[:, 0], positions[:, 1]
+        if ((rows < 0) | (rows >= self._height) | (cols < 0) | (cols >= self._width)).any():
+            raise ValueError("Cannot place organisms outside the grid")
+        flat = rows * self._width + cols
+        if len(np.unique(flat)) != len(flat):
+            raise ValueError("Cannot place two organisms in the same cell")
+        
+        if self._store is None:
+            if any(not self.get_cell(o.position).is_free for o in organisms):
+                raise ValueError("Cannot place organisms in occupied cells")
+            self._registry.add_many(organisms)
+            for org in organisms:
+                self.get_cell(org.position).place_org(org)
+            return
+        
+        store = self._store
+        if (store.occupant[flat] != store.EMPTY).any():
+            raise ValueError("Cannot place organisms in occupied cells")
+        self._registry.add_many(organisms)
+        store.occupant[flat] = [o.id for o in organisms]
+        store.state[flat] = CellState.NOT_FREE.value
+        store.symbol[flat] = store.ORG_SYMBOL
+        store.dirty.add(flat)
+        for org, index in zip(organisms, flat.tolist()):
+            org._bind_cell(CellView(store, index))
+
+    def remove_organisms(self, org_ids: Iterable[int]) -> List[Organism]:
+        """
+        Removes several organisms at once (death), emptying their cells.
+
+        Returns:
+            List[Organism]: The removed organisms.
+
+        Raises:
+            KeyError: If an id is not registered.
+        """
+        org_ids = list(org_ids)
+        organisms = [self._registry.organisms[i] for i in self._registry.indices_of(org_ids)]
+        placed = [o for o in organisms if o.cell is not None]
+        
+        if self._store is None:
+            for org in placed:
+                org.cell.empty()
+        else:
+            store = self._store
+            flat = np.array([o.cell.index for o in placed], dtype=np.int64)
+            store.occupant[flat] = store.EMPTY
+            store.state[flat] = CellState.FREE.value
+            store.symbol[flat] = store.symbol_code(".")
+            store.dirty.add(flat)
+            for org in placed:
+                org._unbind_cell()
+        
+        return self._registry.remove_many(org_ids)
+
+    def move_organisms(self, org_ids: Iterable[int], cells: np.ndarray) -> None:
+        """
+        Moves several organisms at once (apply phase): every organism leaves
+        its cell, which becomes FREE, and is placed in its target cell.
+
+        On the array backends the cells are written with array operations and
+        the registry positions in one batch; the dict backend moves the
+        organisms one by one through their cells.
+
+        Args:
+            org_ids (Iterable[int]): Organisms to move.
+            cells (np.ndarray): Flat target cell of every organism, all different.
+
+        Raises:
+            KeyError: If an id is not registered.
+            ValueError: If an organism is not placed or a target cell is occupied.
+        """
+        registry = self._registry
+        indices = registry.indices_of(org_ids)
+        cells = np.asarray(cells, dtype=np.int64)
+        if not len(indices):
+            return
+        
+        if self._store is None:
+            organisms = registry.organisms
+            cell_list = self._cell_list
+            for i, index in zip(indices.tolist(), cells.tolist()):
+                org = organisms[i]
+                if org.cell is None:
+                    raise ValueError(f"Organism {org.id} is not placed")
+                org.cell.empty()
+                cell_list[index].place_org(org)
+            return
+        
+        store = self._store
+        ids = registry.ids[indices]
+        positions = registry.positions[indices]
+        origins = positions[:, 0] * self._width + positions[:, 1]
+        if (store.occupant[origins] != ids).any():
+            raise ValueError("Cannot move an organism that is not placed")
+        # Primero se vacian todas las celdas de origen: un destino puede ser el origen de otro
+        store.occupant[origins] = store.EMPTY
+        store.state[origins] = CellState.FREE.value
+        store.symbol[origins] = store.symbol_code(".")
+        if (store.occupant[cells] != store.EMPTY).any():
+            raise ValueError("Cell is already occupied")
+        store.occupant[cells] = ids
+        store.state[cells] = CellState.NOT_FREE.value
+        store.symbol[cells] = store.ORG_SYMBOL
+        store.dirty.add(origins)
+        store.dirty.add(cells)
+        
+        rows, cols = np.divmod(cells, self._width)
+        registry._on_moved_many(indices, np.stack((rows, cols), axis=1))
+        organisms = registry.organisms
+        for i, row, col, index in zip(indices.tolist(), rows.tolist(), cols.tolist(), cells.tolist()):
+            org = organisms[i]
+            org._position = (row, col)
+            org._cellRef = CellView(store, index)
 
     def get_cell(self, 
                     position: Optional[Tuple[int, int]] = None, 
@@ -110,58 +437,151 @@ class Grid:
                     cell: Optional[GridCell] = None) -> Optional[GridCell]:
             """Get a cell from the grid using position, ID, or a GridCell object."""
 
+            if self._store is not None:
+                return self._get_cell_view(position, cell_id, cell)
+
             if position is not None:
-                key = self._get_key_from_pos(position)
-                return self._cells.get(key)
+                row, col = position
+                if 0 <= row < self._height and 0 <= col < self._width:
+                    return self._cell_list[row * self._width + col]
+                return None
             
             elif cell_id is not None:
-                return self._cells.get(cell_id)
+                index = self._index_from_cell_id(cell_id)
+                return None if index is None else self._cell_list[index]
             
             elif cell is not None:
-                key = self._get_key_from_pos(cell.position)
-                return self._cells.get(key)
+                return self.get_cell(cell.position)
             
             return None
+    
+    def _index_from_cell_id(self, cell_id) -> Optional[int]:
+        """
+        Flat index of a cell id: the int id itself, or a legacy "i_j" key.
+        """
+        if isinstance(cell_id, str):
+            try:
+                row, col = cell_id.split("_")
+                row, col = int(row), int(col)
+            except ValueError:
+                return None
+            if not (0 <= row < self._height and 0 <= col < self._width):
+                return None
+            return row * self._width + col
+        if 0 <= cell_id < self._width * self._height:
+            return int(cell_id)
+        return None
+        
+    def _get_cell_view(self, 
+                    position: Optional[Tuple[int, int]] = None, 
+                    cell_id: Optional[int] = None,
+                    cell: Optional[GridCell] = None) -> Optional[CellView]:
+        """Array backend version of get_cell, returns a CellView or None if out of bounds."""
+        if position is None:
+            if cell_id is not None:
+                index = self._index_from_cell_id(cell_id)
+                return None if index is None else CellView(self._store, index)
+            elif cell is not None:
+                position = cell.position
+            else:
+                return None
+        
+        if not self._store.contains(position):
+            return None
+        return CellView(self._store, self._store.index(position))
         
     def _get_adjacent_positions(self, position: Tuple[int, int]) -> List[Tuple[int, int]]:
         """
-        Returns a list of all 8 adjacent positions (including diagonals)
-        that are within bounds of the grid.
+        Returns the positions of the neighbours of a cell (8 for Moore, 4 for
+        Von Neumann) that exist in the grid topology.
         """
-        x, y = position
-        directions = [
-            (-1, -1), (0, -1), (1, -1),
-            (-1,  0),          (1,  0),
-            (-1,  1), (0,  1), (1,  1)
-        ]
-
-        adjacent_positions = [
-            (x + dx, y + dy)
-            for dx, dy in directions
-            if 0 <= x + dx < self._width and 0 <= y + dy < self._height
-        ]
-        return adjacent_positions
+        width = self._width
+        return [divmod(i, width) for i in self.neighbours(self.index_of(position)).tolist()
+                if i != NO_NEIGHBOUR]
     
     def _get_surrounding_cells(self, origin:Tuple[int, int] = None)->List[GridCell]:
-        adjacent_positions: List[Tuple[int, int]] = self._get_adjacent_positions(origin)
-        list_surr_cells: List[GridCell] = []
-
-        for pos in adjacent_positions:
-            cell = self.get_cell(pos)
-            list_surr_cells.append(cell)
-            
-        return list_surr_cells
+        neighbours = self.neighbours(self.index_of(origin)).tolist()
+        
+        if self._store is None:
+            cell_list = self._cell_list
+            return [cell_list[i] for i in neighbours if i != NO_NEIGHBOUR]
+        
+        store = self._store
+        return [CellView(store, i) for i in neighbours if i != NO_NEIGHBOUR]
     
     def _get_key_from_pos(self, position: Tuple[int,int] = (0,0))-> str:
         return f"{position[0]}_{position[1]}"
             
+    @property
+    def dirty(self) -> DirtyCells:
+        """Cells written since the last reset_transient_states."""
+        return self._dirty
+
+    @property
+    def last_turn_cells(self) -> np.ndarray:
+        """
+        Sorted flat indices of the cells the last reset_transient_states
+        visited: every cell written during the last turn. Any cell whose
+        state or symbol differs from the previous turn end is among them.
+        """
+        return self._last_reset
+
+    def reset_transient_states(self) -> None:
+        """
+        Clears the per-turn marks of the cells written since the previous
+        reset: occupied cells go back to NOT_FREE with the organism id as
+        symbol, the rest to FREE. The other cells already are in that state.
+        """
+        if self._store is None:
+            cells = self._dirty.take()
+            cell_list = self._cell_list
+            for index in cells.tolist():
+                cell_list[index].reset()
+            self._last_reset = cells
+            return
+        
+        self._last_reset = self._store.reset_transient_states()
+            
+    def _bind_placed_orgs(self) -> None:
+        # Las celdas ya tienen a sus ocupantes y el registro sus posiciones:
+        # solo falta la referencia del organismo a su celda
+        store = self._store
+        positions = self._registry.positions
+        flat = positions[:, 0] * self._width + positions[:, 1]
+        placed = store.occupant[flat] == self._registry.ids
+        organisms = compress(self._registry.organisms, placed.tolist())
+        for org, index in zip(organisms, flat[placed].tolist()):
+            org._cellRef = CellView(store, index)
+    
     def place_orgs_init(self): 
-        for org in self._organisms:
-            cell = self.get_cell(org.position)
-            if cell.is_free:
-                cell.place_org(organism=org)
-        print("FASE 0-Se colocan los organismos")
-        print(self._organisms)
-        self.print_state()
-        print("FASE-0-END")
+        """
+        Places the registered organisms at their positions. If several share
+        a cell only the first one is placed; the rest stay unplaced.
+
+        Raises:
+            ValueError: If a position is out of bounds.
+        """
+        if self._store is None:
+            for org in self._registry:
+                cell = self.get_cell(org.position)
+                if cell is None:
+                    raise ValueError(f"Cannot place organism {org.id} outside the grid")
+                if cell.is_free:
+                    cell.place_org(organism=org)
+            return
+        
+        # Backends de arrays: ocupacion, estado y simbolo de todas las celdas de una vez
+        registry = self._registry
+        positions = registry.positions
+        rows, cols = positions[:, 0], positions[:, 1]
+        if ((rows < 0) | (rows >= self._height) | (cols < 0) | (cols >= self._width)).any():
+            raise ValueError("Cannot place organisms outside the grid")
+        flat = rows * self._width + cols
+        _, first = np.unique(flat, return_index=True)
+        store = self._store
+        store.occupant[flat[first]] = registry.ids[first]
+        store.state[flat[first]] = CellState.NOT_FREE.value
+        store.symbol[flat[first]] = store.ORG_SYMBOL
+        store.dirty.add(flat[first])
+        self._bind_placed_orgs()
         
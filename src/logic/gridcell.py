@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import Optional, Tuple, TYPE_CHECKING
 
-from src.cmd.cmd import ColorCmd, my_debug
+from src.cmd.cmd import DEFAULT_CELL_SYMBOL, ColorCmd, my_debug
 if TYPE_CHECKING:
     from ..organism.organism import Organism
 
@@ -19,26 +19,71 @@ class CellState(Enum):
     FULL = 9
     
 
+# Color de cada estado en la vista de consola (el resto, blanco)
+CMD_STATE_COLORS = {
+    CellState.FREE: ColorCmd.WHITE,
+    CellState.INTENDED: ColorCmd.WHITE,
+    CellState.CHOSEN: ColorCmd.CYAN,
+    CellState.CONFLICT: ColorCmd.RED,
+    CellState.RESOLVED: ColorCmd.GREEN,
+    CellState.MOVING_OUT: ColorCmd.YELLOW,
+    CellState.LOSER: ColorCmd.BLUE,
+    CellState.WINNER: ColorCmd.GREEN,
+    CellState.BLOCKED: ColorCmd.PURPLE,
+}
+
 
 class GridCell:
     """
     Represents a single cell in the simulation grid.
     A cell may or may not be occupied by an organism.
+
+    Cells are slotted to keep large grids small: the id is the flat index
+    (row * width + col) and the symbol is only stored when it is not the
+    default one (see _symbol).
+
+    Cells of a grid share its DirtyCells: every write adds the cell id, so
+    the end-of-turn reset only visits the cells touched during the turn.
     """
+    
+    __slots__ = ("_id", "_organism", "_position", "_state", "_own_symbol", "_dirty")
    
-    def __init__(self, id_, position_: Tuple[int, int]) -> None:
+    def __init__(self, id_: int, position_: Tuple[int, int], dirty=None) -> None:
         self._id = id_
         self._organism: Organism = None
         self._position: Tuple[int,int] = position_
         self._state: CellState = CellState.FREE
-        self._symbol: str = "•"
-        # REDUNDANT
-        
+        self._own_symbol: Optional[str] = None
+        self._dirty = dirty
         
     @property
-    def id(self):
+    def id(self) -> int:
         return self._id
     
+    @property
+    def _symbol(self) -> str:
+        # None = simbolo por defecto: el id del organismo si esta ocupada, si no DEFAULT_CELL_SYMBOL
+        symbol = self._own_symbol
+        if symbol is None:
+            return DEFAULT_CELL_SYMBOL if self._organism is None else str(self._organism.id)
+        return symbol
+    
+    @_symbol.setter
+    def _symbol(self, symbol: str) -> None:
+        if self._organism is None:
+            self._own_symbol = None if symbol == DEFAULT_CELL_SYMBOL else symbol
+        else:
+            self._own_symbol = None if symbol == str(self._organism.id) else symbol
+        self._touch()
+    
+    def _reset_symbol(self) -> None:
+        self._own_symbol = None
+    
+    def _touch(self) -> None:
+        # Marca la celda como escrita en este turno (ver Grid.reset_transient_states)
+        if self._dirty is not None:
+            self._dirty.add_one(self._id)
+    
     @property
     def is_chosen(self):
         return self._state == CellState.CHOSEN
@@ -49,26 +94,7 @@ class GridCell:
     
     @property
     def cmd_color(self):
-        if (self._state == CellState.FREE):
-            return ColorCmd.WHITE
-        elif (self._state == CellState.INTENDED):
-            return ColorCmd.WHITE
-        elif (self._state == CellState.CHOSEN):
-            return ColorCmd.CYAN
-        elif (self._state == CellState.CONFLICT):
-            return ColorCmd.RED
-        elif (self._state == CellState.RESOLVED):
-            return ColorCmd.GREEN
-        elif (self._state == CellState.MOVING_OUT):
-            return ColorCmd.YELLOW
-        elif self._state == CellState.LOSER:
-            return ColorCmd.BLUE
-        elif self._state == CellState.WINNER:
-            return ColorCmd.GREEN
-        elif self._state == CellState.BLOCKED:
-            return ColorCmd.PURPLE
-        else:
-            return ColorCmd.WHITE
+        return CMD_STATE_COLORS.get(self._state, ColorCmd.WHITE)
     
     @property
     def state(self):
@@ -94,40 +120,130 @@ class GridCell:
     def can_be_intended(self) -> bool:
         return self._state in (CellState.INTENDED, CellState.FREE, CellState.CHOSEN, CellState.CONFLICT)
             
+    @property
+    def is_unclaimed(self) -> bool:
+        # Nadie la ha elegido todavia en este turno
+        return self._state in (CellState.INTENDED, CellState.FREE)
+            
     @property
     def is_free(self) -> bool:
         return self._organism is None
     
     def set_cmd_symbol(self, cmd_symbol: str) -> None:
-        my_debug(f"Setting cmd_symbol={cmd_symbol} for cell {self._position}", True)
+        my_debug(lambda: f"Setting cmd_symbol={cmd_symbol} for cell {self._position}", True)
         self._symbol = cmd_symbol
     
     def set_state(self, new_state: CellState, org_pos: Optional[Tuple[int, int]] = None) -> None:
-        my_debug(f"State {self.id} CHANGED [{self._state}-->{new_state}]", True)
+        my_debug(lambda: f"State {self.id} CHANGED [{self._state}-->{new_state}]", True)
         self._state = new_state
+        self._touch()
     
     def place_org(self, organism) -> None:
-        my_debug(f"Placing {organism} in {self}")
+        my_debug(lambda: f"Placing {organism} in {self}")
         if not self.is_free:
             raise ValueError("Cell is already occupied.Org=",self._organism)
         self._organism = organism
-        self._organism._position = self.position
+        organism._bind_cell(self)
         self._state = CellState.NOT_FREE
-        self._symbol = f"{self._organism.id}"
+        self._reset_symbol()  # el id del organismo
+        self._touch()
     
 
     def empty(self):
         if self.is_free:
             raise ValueError("Cannot empty a free cell")
-        my_debug(f"EMPTYING {self._position} ( o )->( )")
+        my_debug(lambda: f"EMPTYING {self._position} ( o )->( )")
+        self._organism._unbind_cell()
         self._organism = None
         self._state = CellState.FREE
         self._symbol = "."
     
+    def reset(self):
+        """
+        Drops the per-turn marks: back to NOT_FREE showing the organism id, or FREE.
+        """
+        self._state = CellState.FREE if self._organism is None else CellState.NOT_FREE
+        self._reset_symbol()
+    
     def clean(self):
+        if self._organism is not None:
+            self._organism._unbind_cell()
         self._organism = None
         self._state = CellState.FREE
         self._symbol = "."
 
     def __repr__(self):
         return f"CELL{self.position}{self.state}"
+
+
+# Lookup valor -> CellState sin pasar por Enum.__call__
+_STATE_BY_VALUE = {s.value: s for s in CellState}
+
+
+class CellView(GridCell):
+    """
+    Lightweight GridCell over one slot of an ArrayCellStore.
+    Views are created on demand by Grid.get_cell; the cell data itself lives
+    in the store arrays, so all GridCell methods read and write those arrays.
+    """
+    
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index: int) -> None:
+        self._store = store
+        self._index = index
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    @property
+    def _id(self) -> int:
+        return self._index
+
+    @property
+    def _position(self) -> Tuple[int, int]:
+        return self._store.position(self._index)
+
+    @property
+    def _state(self) -> CellState:
+        return _STATE_BY_VALUE[self._store.state[self._index]]
+
+    @_state.setter
+    def _state(self, new_state: CellState) -> None:
+        self._store.state[self._index] = new_state.value
+        self._store.dirty.add_one(self._index)
+
+    @property
+    def _organism(self):
+        return self._store.get_organism(self._index)
+
+    @_organism.setter
+    def _organism(self, organism) -> None:
+        self._store.set_organism(self._index, organism)
+
+    @property
+    def _symbol(self) -> str:
+        return self._store.get_symbol(self._index)
+
+    @_symbol.setter
+    def _symbol(self, symbol: str) -> None:
+        self._store.set_symbol(self._index, symbol)
+
+    def _reset_symbol(self) -> None:
+        store = self._store
+        occupied = store.occupant[self._index] != store.EMPTY
+        store.symbol[self._index] = store.ORG_SYMBOL if occupied else store.DEFAULT_SYMBOL
+        store.dirty.add_one(self._index)
+
+    def _touch(self) -> None:
+        # Los setters de la vista ya marcan la celda en store.dirty
+        pass
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CellView):
+            return self._store is other._store and self._index == other._index
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self._store), self._index))
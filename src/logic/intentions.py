@@ -0,0 +1,217 @@
+from typing import Callable, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+
+from src.cmd.cmd import DIRECTION_SYMBOLS
+from .cellPolicy import count_transitions, transition_counter
+from .cellstore import ArrayCellStore
+from .gridcell import CellState
+from .neighbourhood import NO_NEIGHBOUR
+
+# Estados que GridCell.can_be_intended acepta, indexados por valor + 1
+INTENDABLE = np.zeros(len(CellState) + 1, dtype=bool)
+for _s in (CellState.FREE, CellState.INTENDED, CellState.CHOSEN, CellState.CONFLICT):
+    INTENDABLE[_s.value + 1] = True
+
+# Estados que GridCell.is_unclaimed acepta (replanificacion de perdedores)
+UNCLAIMED = np.zeros(len(CellState) + 1, dtype=bool)
+for _s in (CellState.FREE, CellState.INTENDED):
+    UNCLAIMED[_s.value + 1] = True
+
+# Rango de "reclamacion" de una celda: FREE/INTENDED=0, CHOSEN=1, CONFLICT=2
+_CLAIM_RANK = np.zeros(len(CellState) + 1, dtype=np.int64)
+_CLAIM_RANK[CellState.CHOSEN.value + 1] = 1
+_CLAIM_RANK[CellState.CONFLICT.value + 1] = 2
+_STATE_BY_RANK = np.array(
+    [CellState.INTENDED.value, CellState.CHOSEN.value, CellState.CONFLICT.value], dtype=np.int8)
+
+
+def draw_choice_indices(counts: np.ndarray, uniforms: np.ndarray) -> np.ndarray:
+    """
+    Maps one uniform draw in [0, 1) per organism to an index in [0, count).
+    Both intention engines use this so they pick the same cells for the same draws.
+    """
+    return (uniforms * counts).astype(np.int64)
+
+
+class IntentionEvents(NamedTuple):
+    """
+    What an intention phase does to the cells, one entry per event:
+    an intention (organism -> available neighbour) or a choice (organism ->
+    chosen neighbour). ``order`` sorts the events as the python engine
+    applies them: the intentions of an organism, then its choice.
+    """
+    cell: np.ndarray        # indice plano de la celda tocada
+    order: np.ndarray       # org * (k + 1) + dir para intenciones, org * (k + 1) + k para elecciones
+    direction: np.ndarray   # columna de la vecindad (para la flecha)
+    is_choice: np.ndarray
+
+    def select(self, mask: np.ndarray) -> "IntentionEvents":
+        return IntentionEvents(self.cell[mask], self.order[mask], self.direction[mask], self.is_choice[mask])
+
+    @staticmethod
+    def concatenate(parts: Sequence["IntentionEvents"]) -> "IntentionEvents":
+        return IntentionEvents(*(np.concatenate([getattr(p, f) for p in parts]) for f in IntentionEvents._fields))
+
+
+def available_neighbours(state: np.ndarray, neighbours: np.ndarray,
+                         accepted: np.ndarray = INTENDABLE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (flat, available, counts): the neighbour indices with missing
+    neighbours replaced by 0, the (n, k) mask of neighbours that can be
+    intended and how many each organism has.
+    """
+    in_bounds = neighbours != NO_NEIGHBOUR
+    flat = np.where(in_bounds, neighbours, 0).astype(np.int64, copy=False)
+    available = in_bounds & accepted[state[flat] + 1]
+    return flat, available, available.sum(axis=1)
+
+
+def choose_directions(available: np.ndarray, picks: np.ndarray) -> np.ndarray:
+    """Neighbour column of the (pick+1)-th available neighbour of each row."""
+    ranks = np.cumsum(available, axis=1)
+    return np.argmax(ranks > picks[:, None], axis=1)
+
+
+def intention_events(org_order: np.ndarray, flat: np.ndarray, available: np.ndarray,
+                     active: np.ndarray, chosen_dir: np.ndarray) -> IntentionEvents:
+    """
+    Events of a phase. ``org_order`` is the position of each row in the
+    organism order of the whole phase; ``chosen_dir`` has one entry per
+    active row.
+    """
+    k = available.shape[1]
+    rows, dirs = np.nonzero(available)
+    active_rows = np.flatnonzero(active)
+    targets = flat[active_rows, chosen_dir]
+    return IntentionEvents(
+        cell=np.concatenate([flat[rows, dirs], targets]),
+        order=np.concatenate([org_order[rows] * (k + 1) + dirs, org_order[active_rows] * (k + 1) + k]),
+        direction=np.concatenate([dirs, chosen_dir]),
+        is_choice=np.r_[np.zeros(len(rows), dtype=bool), np.ones(len(active_rows), dtype=bool)],
+    )
+
+
+def apply_intention_events(state: np.ndarray, symbol: np.ndarray, events: IntentionEvents,
+                           arrow_codes: np.ndarray, x_code: int,
+                           old_states: bool = False) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Writes the INTENDED/CHOSEN/CONFLICT states and arrow/"X" symbols of the
+    touched cells, as applying the events one at a time in ``order`` would.
+    Every event of a cell must be in ``events``.
+
+    Args:
+        arrow_codes (np.ndarray): Symbol code of the arrow of each neighbour column.
+        x_code (int): Symbol code of "X".
+        old_states (bool): Also return the state each intention and each
+            choice found (to count the transitions).
+    """
+    if len(events.cell) == 0:
+        return (np.zeros(0, dtype=state.dtype),) * 2 if old_states else None
+
+    sort = np.lexsort((events.order, events.cell))
+    cell, is_choice, direction = events.cell[sort], events.is_choice[sort], events.direction[sort]
+
+    n = len(cell)
+    starts = np.r_[True, cell[1:] != cell[:-1]]
+    group = np.cumsum(starts) - 1
+    cells = cell[starts]
+    initial = state[cells]
+
+    n_chosen = np.bincount(group[is_choice], minlength=len(cells))
+    old_rank = _CLAIM_RANK[initial + 1]
+    new_rank = np.minimum(old_rank + n_chosen, 2)
+
+    result = None
+    if old_states:
+        # Estado que encuentra cada evento: el inicial o el que dejan las elecciones previas
+        group_start = np.flatnonzero(starts)[group]
+        choices_before = np.cumsum(is_choice) - is_choice
+        choices_before = choices_before - choices_before[group_start]
+        rank = np.minimum(old_rank[group] + choices_before, 2)
+        old = np.where(np.arange(n) == group_start, initial[group], _STATE_BY_RANK[rank])
+        result = old[~is_choice], old[is_choice]
+
+    # --- Simbolos ---
+    # "X" si la celda pasa de CHOSEN a CONFLICT en esta fase (CHOSEN_TO_CHOSEN)
+    gets_x = (old_rank < 2) & (old_rank + n_chosen >= 2)
+    # Flecha si la celda estaba FREE/INTENDED: la del unico que la elige, o la
+    # de la ultima intencion si nadie la elige
+    gets_arrow = (old_rank == 0) & ~gets_x
+
+    # Toda celda tiene al menos una intencion; la ultima es la de mayor orden
+    intents = np.flatnonzero(~is_choice)
+    last_intent = intents[np.r_[group[intents][1:] != group[intents][:-1], True]]
+    arrow_dir = direction[last_intent]
+
+    single = np.flatnonzero(is_choice)
+    single = single[n_chosen[group[single]] == 1]
+    arrow_dir[group[single]] = direction[single]
+
+    state[cells] = _STATE_BY_RANK[new_rank]
+    symbol[cells[gets_x]] = x_code
+    symbol[cells[gets_arrow]] = arrow_codes[arrow_dir[gets_arrow]]
+    return result
+
+
+def symbol_codes(store: ArrayCellStore, offsets: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Arrow code of each neighbour column and "X" code, interned in ``store``."""
+    arrow_codes = np.array(
+        [store.symbol_code(DIRECTION_SYMBOLS[(int(dr), int(dc))]) for dr, dc in offsets],
+        dtype=store.symbol.dtype)
+    return arrow_codes, store.symbol_code("X")
+
+
+def count_event_transitions(old_intents: np.ndarray, old_choices: np.ndarray) -> None:
+    """Adds the transitions of apply_intention_events(old_states=True) to the active counter."""
+    count_transitions(old_intents, CellState.INTENDED)
+    count_transitions(old_choices, CellState.CHOSEN)
+
+
+def batch_intentions(store: ArrayCellStore, neighbours: np.ndarray, offsets: np.ndarray,
+                     draw_uniforms: Callable[[int], np.ndarray],
+                     accepted: np.ndarray = INTENDABLE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Intention + choice phase for every organism at once.
+
+    Computes the available neighbours of all organisms, draws one choice per
+    non-blocked organism and writes the INTENDED/CHOSEN/CONFLICT states and
+    arrow/"X" symbols in bulk. The result is the same as applying
+    FREE->INTENDED, INTENDED->CHOSEN, CHOSEN->CHOSEN... one organism at a
+    time in list order, as Simulation does in the python engine.
+
+    Args:
+        store (ArrayCellStore): Cell arrays of the grid.
+        neighbours (np.ndarray): (n, k) neighbour flat indices of the organism
+            cells, as returned by Grid.neighbours_of.
+        offsets (np.ndarray): (k, 2) offsets of the neighbour columns, for the arrows.
+        draw_uniforms (Callable): Returns n uniforms in [0, 1) in one call.
+        accepted (np.ndarray): Bool table of the states (value + 1) a cell can
+            be intended from: INTENDABLE, or UNCLAIMED when re-planning.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: blocked mask (n,) and flat index of
+        the chosen cell of each non-blocked organism, in organism order.
+    """
+    n = len(neighbours)
+    if n == 0:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+
+    flat, available, counts = available_neighbours(store.state, neighbours, accepted)
+    blocked = counts == 0
+    active = ~blocked
+
+    # Una sola llamada al generador para todos los organismos no bloqueados
+    active_counts = counts[active]
+    picks = draw_choice_indices(active_counts, draw_uniforms(len(active_counts)))
+    chosen_dir = choose_directions(available[active], picks)
+    targets = flat[active, chosen_dir]
+
+    events = intention_events(np.arange(n), flat, available, active, chosen_dir)
+    arrow_codes, x_code = symbol_codes(store, offsets)
+    counting = transition_counter() is not None
+    old = apply_intention_events(store.state, store.symbol, events, arrow_codes, x_code, counting)
+    store.dirty.add(events.cell)
+    if counting:
+        count_event_transitions(*old)
+
+    return blocked, targets
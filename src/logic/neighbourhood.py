@@ -0,0 +1,86 @@
+from typing import Tuple
+import numpy as np
+
+# Desplazamientos (fila, columna) en el orden historico de Grid._get_adjacent_positions.
+# El orden importa: la eleccion aleatoria toma la k-esima vecina disponible.
+MOORE_OFFSETS = np.array([
+    (-1, -1), (0, -1), (1, -1),
+    (-1,  0),          (1,  0),
+    (-1,  1), (0,  1), (1,  1),
+], dtype=np.int64)
+
+# Vecindad de Von Neumann: las 4 ortogonales, en el mismo orden relativo
+VON_NEUMANN_OFFSETS = MOORE_OFFSETS[[1, 3, 4, 6]]
+
+NO_NEIGHBOUR = -1   # centinela para vecinas fuera del grid
+
+_BUILD_CHUNK = 1 << 20   # celdas por bloque al construir la tabla
+
+
+def neighbour_rows(cells: np.ndarray, width: int, height: int,
+                   offsets: np.ndarray, torus: bool = False) -> np.ndarray:
+    """
+    Computes the neighbour flat indices of several cells.
+
+    Args:
+        cells (np.ndarray): Flat indices (row * width + col).
+        width (int): Grid width.
+        height (int): Grid height.
+        offsets (np.ndarray): (k, 2) (row, col) offsets.
+        torus (bool): Wrap around the edges instead of cutting them.
+
+    Returns:
+        np.ndarray: (n, k) int64 array, NO_NEIGHBOUR where there is no neighbour.
+    """
+    rows, cols = np.divmod(np.asarray(cells, dtype=np.int64), width)
+    n_rows = rows[:, None] + offsets[:, 0]
+    n_cols = cols[:, None] + offsets[:, 1]
+    if torus:
+        return (n_rows % height) * width + (n_cols % width)
+    inside = (n_rows >= 0) & (n_rows < height) & (n_cols >= 0) & (n_cols < width)
+    return np.where(inside, n_rows * width + n_cols, NO_NEIGHBOUR)
+
+
+def build_neighbour_table(width: int, height: int, offsets: np.ndarray,
+                          torus: bool = False) -> np.ndarray:
+    """
+    Builds the (width * height, k) neighbour table of a grid, row i holding
+    the neighbours of flat cell i. Uses int32 when the grid is small enough.
+    """
+    size = width * height
+    dtype = np.int32 if size < np.iinfo(np.int32).max else np.int64
+    table = np.empty((size, len(offsets)), dtype=dtype)
+    for start in range(0, size, _BUILD_CHUNK):
+        stop = min(start + _BUILD_CHUNK, size)
+        table[start:stop] = neighbour_rows(np.arange(start, stop), width, height, offsets, torus)
+    return table
+
+
+def offset_directions(offsets: np.ndarray) -> Tuple[Tuple[int, int], ...]:
+    """Returns the offsets as (row, col) tuples, e.g. to look up arrow symbols."""
+    return tuple((int(dr), int(dc)) for dr, dc in offsets)
+
+
+STAY = 4   # codigo de direccion de una celda a si misma
+
+
+def direction_codes(from_cells: np.ndarray, to_cells: np.ndarray, width: int) -> np.ndarray:
+    """
+    Encodes steps to a neighbour (or to the same cell) in one byte each:
+    (d_row + 1) * 3 + (d_col + 1), STAY for no move. Steps across the edge
+    of a torus are taken as the short way round.
+    """
+    from_rows, from_cols = np.divmod(np.asarray(from_cells, dtype=np.int64), width)
+    to_rows, to_cols = np.divmod(np.asarray(to_cells, dtype=np.int64), width)
+    d_row = to_rows - from_rows
+    d_col = to_cols - from_cols
+    d_row = np.sign(np.where(np.abs(d_row) > 1, -d_row, d_row))
+    d_col = np.sign(np.where(np.abs(d_col) > 1, -d_col, d_col))
+    return ((d_row + 1) * 3 + (d_col + 1)).astype(np.uint8)
+
+
+def step_cells(cells: np.ndarray, codes: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Inverse of direction_codes: the cells reached from ``cells``."""
+    d_row, d_col = np.divmod(np.asarray(codes, dtype=np.int64), 3)
+    rows, cols = np.divmod(np.asarray(cells, dtype=np.int64), width)
+    return ((rows + d_row - 1) % height) * width + (cols + d_col - 1) % width
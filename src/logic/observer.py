@@ -0,0 +1,36 @@
+from typing import List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .simulation import Simulation
+
+# Fases de un turno, en el orden en que se ejecutan
+PHASE_INTENTIONS = "intentions"
+PHASE_VALIDATION = "validation"
+PHASE_CONFLICTS = "conflicts"
+PHASE_APPLY = "apply"
+
+
+class SimulationObserver:
+    """
+    Base class for objects that follow a Simulation (renderers, loggers...).
+
+    Every hook is a no-op; subclasses override the ones they need. The
+    simulation never formats the grid itself: an observer that wants a
+    frame reads it from ``sim.grid`` when it is notified.
+    """
+
+    def on_start(self, sim: "Simulation") -> None:
+        """Called once when the observer is attached, with the organisms already placed."""
+
+    def on_phase_start(self, sim: "Simulation", phase: str) -> None:
+        """Called when a phase (PHASE_*) starts. Phases can run more than once per turn."""
+
+    def on_phase_end(self, sim: "Simulation", phase: str) -> None:
+        """Called when a phase ends."""
+
+    def on_conflict(self, sim: "Simulation", position: Tuple[int, int],
+                    contenders: List[int], winner: int, losers: List[int]) -> None:
+        """Called for every conflict resolved, with the ids of the organisms involved."""
+
+    def on_turn_end(self, sim: "Simulation") -> None:
+        """Called after the moves of a turn have been applied."""
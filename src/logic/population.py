@@ -0,0 +1,236 @@
+import gc
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.organism.organism import Organism
+from .cellstore import sorted_unique
+from .grid import Grid
+
+# Generadores de poblaciones iniciales. Todos devuelven indices planos
+# (row * width + col) distintos y ordenados, exactamente los pedidos.
+
+RngLike = Union[None, int, np.random.Generator]
+
+# Rondas de muestreo de blob_cells antes de rellenar con las celdas libres mas cercanas
+_MAX_ROUNDS = 64
+
+
+def _rng(rng: RngLike) -> np.random.Generator:
+    return rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+
+
+def _check_count(n: int, n_cells: int) -> None:
+    if not 0 <= n <= n_cells:
+        raise ValueError(f"Cannot place {n} organisms in {n_cells} cells")
+
+
+def _contains(sorted_cells: np.ndarray, values: np.ndarray) -> np.ndarray:
+    pos = np.minimum(np.searchsorted(sorted_cells, values), max(len(sorted_cells) - 1, 0))
+    return sorted_cells[pos] == values if len(sorted_cells) else np.zeros(len(values), dtype=bool)
+
+
+def _sample_distinct(n_cells: int, n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    ``n`` distinct cells of ``range(n_cells)``, uniformly. Draws with
+    replacement and drops the repeated ones, so it never builds a
+    permutation of every cell (what Generator.choice does for big samples).
+    """
+    if n > n_cells // 2:
+        # Mas de la mitad: se eligen las celdas que quedan vacias
+        empty = _sample_distinct(n_cells, n_cells - n, rng)
+        keep = np.ones(n_cells, dtype=bool)
+        keep[empty] = False
+        return np.flatnonzero(keep)
+    cells = np.zeros(0, dtype=np.int64)
+    while len(cells) < n:
+        missing = n - len(cells)
+        # Margen para las repeticiones esperadas: suele bastar una ronda
+        size = int(missing / (1.0 - n / n_cells) * 1.1) + 16
+        cells = sorted_unique(np.concatenate((cells, rng.integers(0, n_cells, size=size, dtype=np.int64))))
+    if len(cells) > n:
+        # Un subconjunto uniforme de un conjunto uniforme sigue siendo uniforme
+        cells = np.sort(rng.choice(cells, n, replace=False))
+    return cells
+
+
+def uniform_cells(width: int, height: int, n: int, rng: RngLike = None) -> np.ndarray:
+    """
+    ``n`` distinct cells chosen uniformly.
+
+    Raises:
+        ValueError: If ``n`` is negative or larger than the grid.
+    """
+    _check_count(n, width * height)
+    return _sample_distinct(width * height, n, _rng(rng))
+
+
+def density_cells(width: int, height: int, density: float, rng: RngLike = None) -> np.ndarray:
+    """
+    ``round(density * width * height)`` distinct cells chosen uniformly.
+    """
+    if not 0.0 <= density <= 1.0:
+        raise ValueError("density must be between 0 and 1")
+    return uniform_cells(width, height, int(round(density * width * height)), rng)
+
+
+def blob_cells(width: int, height: int, n: int, centers: Union[int, Sequence[Tuple[float, float]]] = 4,
+               sigma: Union[float, Sequence[float]] = 5.0, rng: RngLike = None,
+               torus: bool = False) -> np.ndarray:
+    """
+    ``n`` distinct cells around Gaussian blobs, every point from a blob
+    chosen at random. Points that fall on an occupied cell are drawn again,
+    and the blobs widen whenever most of a round lands on occupied cells,
+    so dense blobs grow beyond ``sigma`` instead of losing organisms.
+
+    Args:
+        width (int): Columns of the grid.
+        height (int): Rows of the grid.
+        n (int): Organisms to place.
+        centers: Number of blobs with random centres, or their (row, col) centres.
+        sigma (float): Standard deviation in cells, one for every blob or one per blob.
+        rng: Generator or seed.
+        torus (bool): Wrap the points around the edges instead of redrawing those outside.
+
+    Raises:
+        ValueError: If the count does not fit in the grid.
+    """
+    _check_count(n, width * height)
+    rng = _rng(rng)
+    if isinstance(centers, (int, np.integer)):
+        centers = np.column_stack((rng.uniform(0, height, centers), rng.uniform(0, width, centers)))
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    sigmas = np.broadcast_to(np.asarray(sigma, dtype=np.float64), (len(centers),)).copy()
+    if len(centers) == 0:
+        raise ValueError("At least one blob centre is needed")
+
+    cells = np.zeros(0, dtype=np.int64)
+    hit_rate = 1.0
+    for _ in range(_MAX_ROUNDS):
+        missing = n - len(cells)
+        if missing <= 0:
+            break
+        # Se sortean tantos puntos como hagan falta segun el acierto de la ronda anterior
+        size = int(missing / max(hit_rate, 0.05) * 1.25) + 16
+        blob = rng.integers(0, len(centers), size=size)
+        points = centers[blob] + rng.normal(size=(size, 2)) * sigmas[blob, None]
+        rows, cols = np.floor(points).astype(np.int64).T
+        if torus:
+            rows %= height
+            cols %= width
+        else:
+            inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+            rows, cols = rows[inside], cols[inside]
+        # Se conserva el orden de sorteo para quedarse con los primeros puntos nuevos
+        flat = rows * width + cols
+        order = np.argsort(flat, kind="stable")
+        ordered = flat[order]
+        first = order[np.r_[True, ordered[1:] != ordered[:-1]]] if len(flat) else order
+        flat = flat[np.sort(first)]
+        flat = flat[~_contains(cells, flat)]
+        hit_rate = len(flat) / size
+        cells = sorted_unique(np.concatenate((cells, flat[:missing])))
+        if hit_rate < 0.5:
+            # Centros ya saturados: se ensanchan los blobs para la siguiente ronda
+            sigmas *= 1.5
+    if len(cells) < n:
+        # Casi no quedan huecos que acierte el sorteo: se rellena con las celdas libres
+        # mas cercanas (en sigmas) a algun centro
+        free = np.ones(width * height, dtype=bool)
+        free[cells] = False
+        free = np.flatnonzero(free)
+        d_rows = np.abs(free[:, None] // width + 0.5 - centers[:, 0])
+        d_cols = np.abs(free[:, None] % width + 0.5 - centers[:, 1])
+        if torus:
+            d_rows = np.minimum(d_rows, height - d_rows)
+            d_cols = np.minimum(d_cols, width - d_cols)
+        distance = (np.hypot(d_rows, d_cols) / sigmas).min(axis=1)
+        missing = n - len(cells)
+        cells = np.sort(np.r_[cells, free[np.argpartition(distance, missing - 1)[:missing]]])
+    return cells
+
+
+def mask_cells(mask: np.ndarray, n: Optional[int] = None, rng: RngLike = None) -> np.ndarray:
+    """
+    Cells of an occupancy mask (height x width, true = organism). With
+    ``n``, only ``n`` of them chosen uniformly.
+
+    Raises:
+        ValueError: If the mask is not 2-D or has fewer than ``n`` cells.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim != 2:
+        raise ValueError("The mask must be a 2-D array")
+    cells = np.flatnonzero(mask)
+    if n is None:
+        return cells
+    _check_count(n, len(cells))
+    return cells[_sample_distinct(len(cells), n, _rng(rng))]
+
+
+def image_cells(image: np.ndarray, n: int, rng: RngLike = None) -> np.ndarray:
+    """
+    ``n`` distinct cells drawn with probability proportional to the pixel
+    values of a greyscale image (height x width, e.g.
+    ``np.asarray(PIL.Image.open(path).convert("L"))``): bright areas get
+    more organisms. Zero pixels never get one.
+
+    Raises:
+        ValueError: If the image is not 2-D, has negative values or fewer than ``n`` non-zero pixels.
+    """
+    weights = np.asarray(image, dtype=np.float64)
+    if weights.ndim != 2:
+        raise ValueError("The image must be a 2-D (greyscale) array")
+    if (weights < 0).any():
+        raise ValueError("The image cannot have negative values")
+    candidates = np.flatnonzero(weights)
+    _check_count(n, len(candidates))
+    # Muestreo ponderado sin reemplazo (Efraimidis-Spirakis): las n claves u ** (1 / w) mayores
+    keys = np.log(_rng(rng).random(len(candidates))) / weights.ravel()[candidates]
+    chosen = np.argpartition(keys, len(keys) - n)[len(keys) - n:] if n else np.zeros(0, dtype=np.int64)
+    return np.sort(candidates[chosen])
+
+
+@contextmanager
+def _paused_gc() -> Iterator[None]:
+    # Crear millones de objetos dispara colecciones completas que recorren todos los anteriores
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def organisms_at(cells: np.ndarray, width: int, first_id: int = 0) -> List[Organism]:
+    """
+    One organism per flat cell, with consecutive ids from ``first_id``.
+    """
+    rows, cols = np.divmod(np.asarray(cells, dtype=np.int64), width)
+    # Las tuplas de posicion comparten los enteros de fila y columna
+    row_ints = list(range(int(rows.max()) + 1)) if len(rows) else []
+    col_ints = list(range(width))
+    positions = zip(map(row_ints.__getitem__, rows.tolist()), map(col_ints.__getitem__, cols.tolist()))
+    with _paused_gc():
+        return list(map(Organism, range(first_id, first_id + len(rows)), positions))
+
+
+def build_grid(width: int, height: int, cells: np.ndarray, first_id: int = 0, **grid_kwargs) -> Grid:
+    """
+    Grid with one organism on every cell of ``cells`` (see the *_cells
+    generators), created and placed in bulk.
+
+    Args:
+        width (int): Columns of the grid.
+        height (int): Rows of the grid.
+        cells (np.ndarray): Distinct flat indices.
+        first_id (int): Id of the first organism.
+        **grid_kwargs: Other Grid arguments (backend, topology...).
+    """
+    with _paused_gc():
+        organisms = organisms_at(cells, width, first_id)
+        if not organisms:
+            raise ValueError("A grid needs at least one organism")
+        return Grid(width, height, organisms, **grid_kwargs)
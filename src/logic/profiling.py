@@ -0,0 +1,187 @@
+import cProfile
+import json
+import marshal
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, TYPE_CHECKING
+
+from .cellPolicy import counting_transitions
+from .observer import PHASE_APPLY, PHASE_CONFLICTS, PHASE_INTENTIONS, PHASE_VALIDATION
+
+if TYPE_CHECKING:
+    from .simulation import Simulation
+
+PHASES = (PHASE_INTENTIONS, PHASE_VALIDATION, PHASE_CONFLICTS, PHASE_APPLY)
+
+# Nombre de la funcion de Simulation que ejecuta cada fase (para pstats)
+PHASE_FUNCTIONS = {
+    PHASE_INTENTIONS: "calculate_intentions",
+    PHASE_VALIDATION: "_validate_comfirmed_cells",
+    PHASE_CONFLICTS: "_resolve_conflicts",
+    PHASE_APPLY: "_apply_moves",
+}
+
+
+class ProfileSnapshot(NamedTuple):
+    """
+    Counters and timings of a Simulation since its profiler was enabled.
+    Times are wall seconds. ``phase_seconds`` and ``phase_calls`` only
+    have the phases that ran at least once: the validation phase
+    (_validate_comfirmed_cells) is not called by the current turn loop, so
+    it does not appear. ``transitions`` counts the applied cell transitions
+    by TransitionKey name.
+    """
+    turns: int
+    elapsed: float
+    phase_seconds: Dict[str, float]
+    phase_calls: Dict[str, int]
+    transitions: Dict[str, int]
+    n_intentions: int
+    n_conflicts: int
+    n_blocked: int
+    n_moves: int
+    n_conflict_rounds: int
+    max_conflict_rounds_in_turn: int
+
+
+class SimulationProfiler:
+    """
+    Timing and counter surface of a Simulation, enabled with
+    Simulation.enable_profiling.
+
+    The simulation calls it only when it is attached, so a simulation
+    without profiler pays one ``is None`` check per phase.
+
+    Args:
+        trace (bool): Keep every phase as an event for dump_chrome_trace.
+        cprofile (bool): Also run cProfile during the turns; dump_pstats
+            then writes the full function profile.
+    """
+
+    def __init__(self, trace: bool = False, cprofile: bool = False) -> None:
+        self._trace = trace
+        self._events: List[Dict[str, object]] = []
+        self._cprofile: Optional[cProfile.Profile] = cProfile.Profile() if cprofile else None
+
+        self.transitions: Counter = Counter()
+        self._phase_seconds: Dict[str, float] = {phase: 0.0 for phase in PHASES}
+        self._phase_calls: Dict[str, int] = {phase: 0 for phase in PHASES}
+        self._phase_started = 0.0
+        self._turns = 0
+        self._elapsed = 0.0
+        self._rounds_in_turn = 0
+        self._max_rounds_in_turn = 0
+        self._origin = time.perf_counter()
+        self._baseline: Dict[str, int] = {}
+
+    def attach(self, sim: "Simulation") -> None:
+        """Takes the current totals of ``sim`` as zero."""
+        self._baseline = self._totals(sim)
+
+    @staticmethod
+    def _totals(sim: "Simulation") -> Dict[str, int]:
+        return {
+            "n_intentions": sim._n_total_intentions,
+            "n_conflicts": sim._n_total_conflicts,
+            "n_blocked": sim._n_total_blocked,
+            "n_moves": sim._n_total_moves,
+            "n_conflict_rounds": sim._n_total_conflict_rounds,
+        }
+
+    @contextmanager
+    def turn(self, sim: "Simulation") -> Iterator[None]:
+        """Wraps one pass_turn: total time, transition counter and cProfile."""
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        start = time.perf_counter()
+        try:
+            # El contador solo se ve en este hilo: no cuenta otras simulaciones que corran a la vez
+            with counting_transitions(self.transitions):
+                yield
+        finally:
+            end = time.perf_counter()
+            if self._cprofile is not None:
+                self._cprofile.disable()
+            self._turns += 1
+            self._elapsed += end - start
+            self._max_rounds_in_turn = max(self._max_rounds_in_turn, self._rounds_in_turn)
+            self._rounds_in_turn = 0
+            if self._trace:
+                self._add_event("turn", start, end, sim.turn)
+
+    def phase_start(self, phase: str) -> None:
+        self._phase_started = time.perf_counter()
+
+    def phase_end(self, phase: str, turn: int) -> None:
+        end = time.perf_counter()
+        self._phase_seconds[phase] = self._phase_seconds.get(phase, 0.0) + end - self._phase_started
+        self._phase_calls[phase] = self._phase_calls.get(phase, 0) + 1
+        if phase == PHASE_CONFLICTS:
+            self._rounds_in_turn += 1
+        if self._trace:
+            self._add_event(phase, self._phase_started, end, turn)
+
+    def _add_event(self, name: str, start: float, end: float, turn: int) -> None:
+        # Formato "complete event" de Chrome trace, tiempos en microsegundos
+        self._events.append({
+            "name": name, "ph": "X", "pid": os.getpid(), "tid": 1 if name == "turn" else 2,
+            "ts": (start - self._origin) * 1e6, "dur": (end - start) * 1e6,
+            "args": {"turn": turn},
+        })
+
+    def snapshot(self, sim: "Simulation") -> ProfileSnapshot:
+        """
+        Current counters of ``sim``. The simulation counters are deltas
+        since the profiler was attached.
+        """
+        totals = self._totals(sim)
+        deltas = {name: value - self._baseline.get(name, 0) for name, value in totals.items()}
+        # Una fase que nunca se ha ejecutado no es una medida de 0 segundos
+        ran = [phase for phase, calls in self._phase_calls.items() if calls]
+        return ProfileSnapshot(
+            turns=self._turns,
+            elapsed=self._elapsed,
+            phase_seconds={phase: self._phase_seconds[phase] for phase in ran},
+            phase_calls={phase: self._phase_calls[phase] for phase in ran},
+            transitions={key.name: n for key, n in self.transitions.items()},
+            max_conflict_rounds_in_turn=self._max_rounds_in_turn,
+            **deltas,
+        )
+
+    def dump_chrome_trace(self, path: str) -> None:
+        """
+        Writes the recorded phases in Chrome trace format (chrome://tracing,
+        Perfetto). Needs ``trace=True``.
+        """
+        if not self._trace:
+            raise ValueError("Profiler was created without trace=True, there are no events to dump")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self._events, "displayTimeUnit": "ms"}, f)
+
+    def dump_pstats(self, path: str) -> None:
+        """
+        Writes a file readable with ``pstats.Stats(path)``: the cProfile
+        profile if enabled, otherwise one entry per phase function plus
+        pass_turn.
+        """
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(path)
+            return
+
+        # (fichero, linea, funcion) -> (llamadas primitivas, llamadas, tiempo propio, tiempo acumulado, llamantes)
+        turn_key = ("simulation.py", 0, "pass_turn")
+        phase_total = 0.0
+        stats = {}
+        for phase, seconds in self._phase_seconds.items():
+            calls = self._phase_calls[phase]
+            if not calls:
+                continue
+            phase_total += seconds
+            stats[("simulation.py", 0, PHASE_FUNCTIONS.get(phase, phase))] = (
+                calls, calls, seconds, seconds, {turn_key: (calls, calls, seconds, seconds)})
+        own = max(0.0, self._elapsed - phase_total)
+        stats[turn_key] = (self._turns, self._turns, own, self._elapsed, {})
+        with open(path, "wb") as f:
+            marshal.dump(stats, f)
@@ -1,103 +1,390 @@
-import random
-from typing import List, Tuple, Dict, Optional
+import time
+from itertools import chain
+from typing import Callable, Iterator, List, NamedTuple, Tuple, Dict, Optional, Union
+import numpy as np
 
 from src.cmd.cmd import ColorCmd, calculate_cmd_arrow, my_debug
 
 from .grid import Grid
 from ..organism.organism import Organism
 from .gridcell import GridCell, CellState
-from .cellPolicy import TransitionKey, TransitionHandler,apply_state_transition
+from .cellPolicy import TransitionKey, TransitionHandler,apply_state_transition, apply_state_transitions
+from .conflicts import MoveGroups, flat_to_positions, group_moves, resolve_round
+from .intentions import INTENDABLE, UNCLAIMED, batch_intentions, draw_choice_indices
+from .observer import (PHASE_APPLY, PHASE_CONFLICTS, PHASE_INTENTIONS,
+                       PHASE_VALIDATION, SimulationObserver)
+from .profiling import ProfileSnapshot, SimulationProfiler
+from .tiling import TiledExecutor
+
+class TurnStats(NamedTuple):
+    """
+    Summary yielded by Simulation.iter_turns / passed to the run callback.
+    Counts cover the turns since the previous record.
+    """
+    turn: int
+    n_organisms: int
+    n_moves: int
+    n_conflicts: int
+    n_blocked: int
+    n_conflict_rounds: int
+    elapsed: float          # segundos desde el registro anterior
+    turns_per_second: float
+
 
 class Simulation:
     """
     Manages the evolutionary simulation, including grid state, organisms,
     and the turn-based update logic.
+
+    The intention phase can run with two engines:
+    - ``ENGINE_PYTHON``: one organism at a time through apply_state_transition.
+    - ``ENGINE_VECTORIZED``: every organism at once with array operations
+      (needs a grid built with Grid.BACKEND_ARRAY).
+    - ``ENGINE_TILED``: the vectorized engine with the grid split in tiles
+      processed by worker processes over shared memory (see TiledExecutor).
+      Call close() when done to stop the workers.
+    All engines produce the same moves, conflicts and cell marks.
+
+    Conflicts are resolved in rounds (see _resolve_conflicts), at most
+    ``max_conflict_rounds`` per turn.
+
+    Output goes through SimulationObserver objects. By default a
+    ConsoleObserver prints every phase; with ``headless=True`` nothing is
+    printed or formatted unless an observer is added.
+
+    Timings and counters per phase are collected only after
+    enable_profiling (see SimulationProfiler).
+
+    Every random choice comes from the simulation's own NumPy Generator
+    (``rng``): two simulations with the same seed, grid and engine produce
+    the same turns, however many simulations share the process.
     """
+    
+    ENGINE_PYTHON = "python"
+    ENGINE_VECTORIZED = "vectorized"
+    ENGINE_TILED = "tiled"
 
-    def __init__(self, grid_: Grid = None) :
+    def __init__(self, grid_: Grid = None, engine: str = ENGINE_PYTHON,
+                 headless: bool = False, observers: Optional[List[SimulationObserver]] = None,
+                 max_conflict_rounds: int = 8,
+                 rng: Union[None, int, np.random.SeedSequence, np.random.Generator] = None,
+                 tiled: Optional[TiledExecutor] = None) :
+        """
+        Args:
+            grid_ (Grid): Grid to simulate, a default Grid if None.
+            engine (str): ENGINE_PYTHON, ENGINE_VECTORIZED or ENGINE_TILED.
+            headless (bool): Do not attach the default ConsoleObserver.
+            observers (List[SimulationObserver]): Observers to attach instead of the default one.
+            max_conflict_rounds (int): Conflict rounds per turn before the losers give up.
+            rng: Seed, SeedSequence or Generator for the random choices
+                (np.random.default_rng). None seeds from the OS: not reproducible.
+            tiled (TiledExecutor): Executor of ENGINE_TILED (workers, tile shape),
+                a default TiledExecutor if None.
+        """
         
         self._turn = 0
         self._n_total_intentions = 0
         self._n_total_conflicts = 0
+        self._n_total_moves = 0
+        self._n_total_blocked = 0
+        self._n_total_conflict_rounds = 0
         
+        if max_conflict_rounds < 1:
+            raise ValueError("max_conflict_rounds must be >= 1")
+        self._max_conflict_rounds = max_conflict_rounds
+        
+        self._rng: np.random.Generator = np.random.default_rng(rng)
+        
+        # Diccionarios de trabajo del turno: se vacian y reutilizan, no se reasignan
         self._chosen_moves: Dict[int: Tuple[int, int]] = {}
         
         self._conflicts: Dict[Tuple[int, int]: List[int]] = {}
         
         self._comfirmed_moves: Dict[Tuple[int, int]: int] = {}
         
+        # Conflictos pendientes de la ronda, agrupados (los mismos que _conflicts)
+        self._conflict_groups: Optional[MoveGroups] = None
+        
+        # Ids de los organismos bloqueados en el turno (tambien perdedores al replanificar)
+        self._blocked_orgs: List[int] = []
+        
         self._grid = grid_ if grid_ else Grid()
-            
         
-    def calculate_intentions(self, orgs: List[Organism]):
+        if engine not in (self.ENGINE_PYTHON, self.ENGINE_VECTORIZED, self.ENGINE_TILED):
+            raise ValueError(f"Unknown intention engine '{engine}'")
+        if engine != self.ENGINE_PYTHON and self._grid.store is None:
+            raise ValueError(f"The {engine} engine needs a grid built with Grid.BACKEND_ARRAY")
+        self._engine = engine
+        
+        self._tiled: Optional[TiledExecutor] = None
+        if engine == self.ENGINE_TILED:
+            self._tiled = tiled if tiled is not None else TiledExecutor()
+            self._tiled.attach(self._grid.store, self._grid.topology == Grid.TOPOLOGY_TORUS)
+        
+        # Celdas disponibles del ultimo organismo calculado (resumen para observers)
+        self._last_intended_cells: List[GridCell] = []
+        
+        self._profiler: Optional[SimulationProfiler] = None
+        
+        self._observers: List[SimulationObserver] = []
+        if observers is None and not headless:
+            from src.cmd.console import ConsoleObserver
+            observers = [ConsoleObserver()]
+        for observer in observers or ():
+            self.add_observer(observer)
+    
+    @property
+    def turn(self) -> int:
+        return self._turn
+    
+    @property
+    def grid(self) -> Grid:
+        return self._grid
+    
+    @property
+    def rng(self) -> np.random.Generator:
+        return self._rng
+    
+    @property
+    def chosen_moves(self) -> Dict[int, Tuple[int, int]]:
+        return self._chosen_moves
+    
+    @property
+    def conflicts(self) -> Dict[Tuple[int, int], List[int]]:
+        return self._conflicts
+    
+    @property
+    def confirmed_moves(self) -> Dict[Tuple[int, int], int]:
+        return self._comfirmed_moves
+    
+    @property
+    def blocked_orgs(self) -> List[int]:
+        return self._blocked_orgs
+    
+    @property
+    def last_intended_cells(self) -> List[GridCell]:
+        return self._last_intended_cells
+    
+    @property
+    def observers(self) -> List[SimulationObserver]:
+        return self._observers
+    
+    def add_observer(self, observer: SimulationObserver) -> None:
+        """
+        Attaches an observer; it receives on_start right away.
+        """
+        self._observers.append(observer)
+        observer.on_start(self)
+    
+    def remove_observer(self, observer: SimulationObserver) -> None:
+        self._observers.remove(observer)
+    
+    @property
+    def profiler(self) -> Optional[SimulationProfiler]:
+        return self._profiler
+    
+    def enable_profiling(self, trace: bool = False, cprofile: bool = False) -> SimulationProfiler:
+        """
+        Starts collecting phase timings and counters from the next turn on.
+
+        Args:
+            trace (bool): Record every phase for SimulationProfiler.dump_chrome_trace.
+            cprofile (bool): Run cProfile during the turns (slow).
+
+        Returns:
+            SimulationProfiler: The new profiler, also available as ``profiler``.
+        """
+        self._profiler = SimulationProfiler(trace, cprofile)
+        self._profiler.attach(self)
+        return self._profiler
+    
+    def disable_profiling(self) -> Optional[SimulationProfiler]:
+        """
+        Stops profiling and returns the profiler, which keeps its data.
+        """
+        profiler, self._profiler = self._profiler, None
+        return profiler
+    
+    def profile_snapshot(self) -> ProfileSnapshot:
+        if self._profiler is None:
+            raise RuntimeError("Profiling is not enabled, call enable_profiling first")
+        return self._profiler.snapshot(self)
+    
+    def save_checkpoint(self, path: str, cell_arrays: bool = True) -> None:
+        """
+        Writes the simulation to a binary checkpoint (see checkpoint.save_checkpoint).
+        """
+        from .checkpoint import save_checkpoint
+        save_checkpoint(self, path, cell_arrays)
+    
+    @staticmethod
+    def load_checkpoint(path: str, **kwargs) -> "Simulation":
+        """
+        Restores a simulation saved with save_checkpoint (see checkpoint.load_checkpoint).
+        """
+        from .checkpoint import load_checkpoint
+        return load_checkpoint(path, **kwargs)
+    
+    def close(self) -> None:
+        """
+        Releases what the engine holds outside the grid (the workers and
+        shared memory of ENGINE_TILED). The grid stays usable.
+        """
+        if self._tiled is not None:
+            self._tiled.close()
+    
+    def _notify_phase_start(self, phase: str) -> None:
+        for observer in self._observers:
+            observer.on_phase_start(self, phase)
+        if self._profiler is not None:
+            self._profiler.phase_start(phase)
+    
+    def _notify_phase_end(self, phase: str) -> None:
+        if self._profiler is not None:
+            self._profiler.phase_end(phase, self._turn)
+        for observer in self._observers:
+            observer.on_phase_end(self, phase)
+        
+    def calculate_intentions(self, orgs: List[Organism], replan: bool = False):
+        """
+        Intention + choice phase for ``orgs``. Chosen cells claimed by a single
+        organism are added to the confirmed moves, the rest become conflicts.
+
+        Args:
+            orgs (List[Organism]): Organisms that choose a cell.
+            replan (bool): Conflict losers re-planning: only cells nobody has
+                claimed yet this turn (FREE/INTENDED) are available.
+        """
         # FASE 1----------------------
-        print("CALCULATION PHASE-[START]------------------------)")
-        my_debug(f"ORGANISMS to calculate {orgs}")
+        self._notify_phase_start(PHASE_INTENTIONS)
+        my_debug(lambda: f"ORGANISMS to calculate {orgs}")
+        
+        if self._engine != self.ENGINE_PYTHON:
+            self._last_intended_cells = self._calculate_intentions_vectorized(orgs, replan)
+        else:
+            self._last_intended_cells = self._calculate_intentions_python(orgs, replan)
+                                       
+        self._group_chosen_moves()
+        
+        self._notify_phase_end(PHASE_INTENTIONS)
+    
+    def _draw_uniforms(self, n: int) -> np.ndarray:
+        """
+        Draws n uniforms in [0, 1) in a single call. Every random cell choice
+        goes through here so both engines consume the same random stream.
+        """
+        return self._rng.random(n)
+    
+    def _calculate_intentions_python(self, orgs: List[Organism], replan: bool = False) -> List[GridCell]:
         cells_to_intent = []
         if not orgs is None:
-            for o in orgs:
+            # La disponibilidad se fija al inicio de la fase, como en el motor vectorizado
+            # (al replanificar, los perdedores pueden volver a chocar entre ellos), asi
+            # que todas las tiradas de la fase salen de una sola llamada al generador
+            available = [self._get_avaliable_cells(o.position, replan) for o in orgs]
+            uniforms = self._draw_uniforms(sum(1 for cells in available if cells))
+            next_uniform = 0
+            for o, cells_to_intent in zip(orgs, available):
                 org_pos = o.position
-                cells_to_intent = self._get_avaliable_cells(org_pos)
                 
                 for cell in cells_to_intent:
                     apply_state_transition(cell, CellState.INTENDED, org_pos=org_pos) # FREE->INTEDED
                 
                 # Si no tiene celdas a las que se puede mover bloqueamos a la celda del orgnaismo y queda BLOCKED
                 if len(cells_to_intent) == 0: 
-                    my_debug(f"{ColorCmd.PURPLE}[{o.id}]{o.position} => BLOCKED")
+                    my_debug(lambda: f"{ColorCmd.PURPLE}[{o.id}]{o.position} => BLOCKED")
                     
                     cell_of_org = self._grid.get_cell(org_pos) # es NOT_FREE ahora
                     apply_state_transition(cell_of_org, CellState.BLOCKED) # NOT_FREE -> BLOCKED
+                    self._n_total_blocked += 1
+                    self._blocked_orgs.append(o.id)
                     
                     continue
                 
                 else:
-                    my_debug(f"ORG=[{o.id}]{o.position} CELLs=>{cells_to_intent}", False)
+                    my_debug(lambda: f"ORG=[{o.id}]{o.position} CELLs=>{cells_to_intent}", False)
                     
                     #==============================Escojemos una celda al azar de las INTENDED
-                    chosen_cell = random.choice(cells_to_intent) #aqui es INTEDED o CHOSEN de otro
+                    pick = int(draw_choice_indices(len(cells_to_intent), uniforms[next_uniform]))
+                    next_uniform += 1
+                    chosen_cell = cells_to_intent[pick] #aqui es INTEDED o CHOSEN de otro
                     
-                    my_debug(f"{ColorCmd.CYAN}CHOSEN_MOVE [{o}]=>[{chosen_cell}]")
+                    my_debug(lambda: f"{ColorCmd.CYAN}CHOSEN_MOVE [{o}]=>[{chosen_cell}]")
                     
                     # INTENDED -> CHOSEN
                     # CHOSEN -> CHOSEN (esto lo setea a conflict)
                     apply_state_transition(chosen_cell, CellState.CHOSEN) 
                     
                     self._chosen_moves[o.id] = chosen_cell.position 
-                                       
-        orgs_for_cell = {}
+                    self._n_total_intentions += 1
+        return cells_to_intent
+    
+    def _calculate_intentions_vectorized(self, orgs: List[Organism], replan: bool = False) -> List[GridCell]:
+        if not orgs:
+            return []
+        store = self._grid.store
+        registry = self._grid.registry
+        if orgs is registry.organisms:
+            positions = registry.positions
+        else:
+            positions = registry.positions[registry.indices_of(o.id for o in orgs)]
         
-        # Gracias a mi logica de estado las celdas en conflicto ya tienen su estado a CONFLICT
-        # ORGS_FOR_CELL para caluclar conflictos
-        for org_id, pos in self._chosen_moves.items():
-            if pos in orgs_for_cell:
-                orgs_for_cell[pos].append(org_id)
-            else:
-                orgs_for_cell[pos] = [org_id]
+        # Resumen para los observers con la disponibilidad previa a la fase, igual que el motor python
+        summary = self._get_avaliable_cells(orgs[-1].position, replan) if self._observers else []
+        
+        org_cells = positions[:, 0] * store.width + positions[:, 1]
+        accepted = UNCLAIMED if replan else INTENDABLE
+        if self._tiled is not None and len(orgs) >= self._tiled.min_organisms:
+            blocked, targets = self._tiled.batch_intentions(store, org_cells, self._grid.neighbour_offsets,
+                                                            self._draw_uniforms, accepted)
+        else:
+            neighbours = self._grid.neighbours_of(org_cells)
+            blocked, targets = batch_intentions(store, neighbours, self._grid.neighbour_offsets,
+                                                self._draw_uniforms, accepted)
+        
+        # NOT_FREE -> BLOCKED en bloque, con los mismos errores que la politica
+        blocked_cells = store.index((positions[blocked, 0], positions[blocked, 1]))
+        apply_state_transitions(blocked_cells, CellState.BLOCKED, store=store)
+        self._n_total_blocked += len(blocked_cells)
+        self._blocked_orgs.extend(o.id for o, is_blocked in zip(orgs, blocked) if is_blocked)
+        
+        active_ids = [o.id for o, is_blocked in zip(orgs, blocked) if not is_blocked]
+        self._n_total_intentions += len(active_ids)
+        target_rows, target_cols = np.divmod(targets, store.width)
+        self._chosen_moves.update(zip(active_ids, zip(target_rows.tolist(), target_cols.tolist())))
+        return summary
+    
+    def _group_chosen_moves(self):
+        # Todas las elecciones agrupadas por celda destino de una vez (ordenando)
+        chosen = self._chosen_moves
+        width = self._grid.width
+        org_ids = np.fromiter(chosen.keys(), dtype=np.int64, count=len(chosen))
+        positions = np.fromiter(chain.from_iterable(chosen.values()), dtype=np.int64,
+                                count=2 * len(chosen)).reshape(-1, 2)
+        groups = group_moves(org_ids, positions[:, 0] * width + positions[:, 1])
         
         # Es un conflicto si hay mas de 1 id de organismo(orgs_ids) por posicion de celda(pos)
-        self._conflicts = {pos: org_ids for pos, org_ids in orgs_for_cell.items() if len(org_ids) > 1}
+        in_conflict = groups.counts > 1
+        conflicts = groups.select(in_conflict)
+        self._conflict_groups = conflicts
+        self._conflicts.clear()
+        self._conflicts.update(zip(flat_to_positions(conflicts.cells, width), conflicts.split()))
             
         #Si solo hay uno es que nadie más ha escogido la celda y lo marcamos como listo para moverse
         # Celda de destino será -> RESOLVED
         # Celda de origen será -> MOVING_OUT
-        self._comfirmed_moves = {pos: org_ids[0] for pos, org_ids in orgs_for_cell.items() if len(org_ids) == 1}      
-        
-        print(f"·INTENTIONS =   (white arrows) {cells_to_intent}")
-        print(f"{ColorCmd.CYAN}·CHOSEN_MOVES = (cyan arrows) {self._chosen_moves}{ColorCmd.RESET}")
-        print(f"{ColorCmd.RED}·CONFLICTS =    (red crosses) {self._conflicts}{ColorCmd.RESET}")
-        
-        self._grid.print_state()
-        print("CALCULATION-PHASE-[END]------------------------)\n")
+        # Se acumulan durante el turno: las rondas de conflictos solo añaden
+        singles = ~in_conflict
+        self._comfirmed_moves.update(zip(flat_to_positions(groups.cells[singles], width),
+                                         groups.members[groups.starts[singles]].tolist()))
             
     def _mark_conflicts(self):
         pass
     def _validate_comfirmed_cells(self):
         
-        print("VALIDATION PHASE-[START]------------------------)")
-        print("Validating chosen cells...")
-        my_debug(f"{ColorCmd.GREEN}CHOSEN = (cyan arrows) {ColorCmd.WHITE} {self._comfirmed_moves}")
-        my_debug(f"Passing {ColorCmd.CYAN}CHOSEN{ColorCmd.RESET} ->{ColorCmd.GREEN}RESOLVED{ColorCmd.WHITE}")
+        self._notify_phase_start(PHASE_VALIDATION)
+        my_debug(lambda: f"{ColorCmd.GREEN}CHOSEN = (cyan arrows) {ColorCmd.WHITE} {self._comfirmed_moves}")
+        my_debug(lambda: f"Passing {ColorCmd.CYAN}CHOSEN{ColorCmd.RESET} ->{ColorCmd.GREEN}RESOLVED{ColorCmd.WHITE}")
         
         #VALIDAMOS LOS comfirmed moved que era los chosen moves con un solo org id
         for pos, org_id in self._comfirmed_moves.items():
@@ -111,99 +398,185 @@ class Simulation:
             
             apply_state_transition(cell_to_move, CellState.RESOLVED, org_pos=org_ready.position) #CHOSEN-> RESOLVED
         
-        self._grid.print_state()
-        print("VALIDATION PHASE-[END]------------------------)\n")
+        self._notify_phase_end(PHASE_VALIDATION)
     
     def _resolve_conflicts(self):
-        
-        i = 0
-        
-        list_orgs_loosers = []
+        """
+        Resolves the conflicts of the turn in rounds.
+
+        Every conflict of a round gets a winner, whose move is confirmed. Only
+        the losers of that round re-plan, and only towards cells nobody has
+        claimed yet (FREE/INTENDED), so confirmed moves are never undone. New
+        conflicts between them start the next round. After
+        ``max_conflict_rounds`` rounds the remaining losers stay where they are.
+        """
+        rounds = 0
+        grid = self._grid
+        registry = grid.registry
+        store = grid.store
         
         while self._conflicts:   
-            print(f"{ColorCmd.RED}CONFLICTS-PHASE IN TURN:{self._turn}-[START]------------------------){ColorCmd.RESET}")        
-            for conflict_pos, list_orgs_id_in_conflict in self._conflicts.copy().items():
-                i += 1
-                print(f"{ColorCmd.RED}CONFLICT_{i}_={conflict_pos}{ColorCmd.RESET} ORGS={list_orgs_id_in_conflict}")
-                
-                #IMPORTANTE SE ESCOGEEEEEE 1 ganador===============================================
-                winner_org_id = random.choice(list_orgs_id_in_conflict)  
-                
-                # Sacamos el ganador de la lista de ids en conflicto
-                list_orgs_id_in_conflict.remove(winner_org_id)
-                
-                #Añadimos a COMFIRMED EL GANADOR DEL CONFLICTO
-                self._comfirmed_moves[conflict_pos] = [winner_org_id]
-                
-                # CELL GANADORA
-                org_winner = self._get_org_in_grid(winner_org_id)
-                cell_winner = self._grid.get_cell(org_winner.position)
-                apply_state_transition(cell_winner, CellState.WINNER) # LOSER->WINNER o  NOT_FREE->WINNER
-                
-                # CELULA(S) PERDEDORAS            
-                for losser_id in list_orgs_id_in_conflict:
-                    org_looser = self._get_org_in_grid(losser_id)
-                    list_orgs_loosers.append(org_looser)
-                    
-                    cell_looser = self._grid.get_cell(org_looser.position)
-                    # LOSER->WINNER o  NOT_FREE->WINNER
-                    apply_state_transition(cell_looser, CellState.LOSER, org_pos=org_winner.position)
-                
-                # CELL EN CONFLICTO
-                cell_conflict = self._grid.get_cell(conflict_pos)
-                # CONFLICT -> RESOLVED
-                apply_state_transition(cell_conflict, CellState.RESOLVED, org_pos=org_winner.position)
-                
-                # Por ultimo eliminamos del diccionario de conflictos el conflicto resuelto en la iteracion
-                del self._conflicts[conflict_pos]
-                
-                print(f"\t{ColorCmd.GREEN}·WINNER=[{winner_org_id}]{ColorCmd.RESET}")
-                print(f"{ColorCmd.BLUE}·LOOSERS={list_orgs_id_in_conflict}{ColorCmd.RESET}")
-                print(f"{ColorCmd.RED}CONFLICTS-PHASE IN TURN:{self._turn}-[END]------------------------){ColorCmd.RESET}\n")
+            self._notify_phase_start(PHASE_CONFLICTS)
+            conflicts = self._conflict_groups
+            self._conflicts.clear()
+            self._conflict_groups = None
             
-            # Vemos la cuadricula con la primera ronda de conflictos resulta pero los perdedores peuden generar mas conflictos
-            self._grid.print_state()
+            #IMPORTANTE SE ESCOGEEEEEE 1 ganador por conflicto, todos en una sola tirada
+            resolved = resolve_round(conflicts, self._draw_uniforms(len(conflicts.cells)))
+            conflict_positions = flat_to_positions(conflicts.cells, grid.width)
+            winner_ids = resolved.winners.tolist()
             
-            print("LIST_ORG_LOOSERS_ROUND", list_orgs_loosers)
-            print("Calculating now moves for LOOSERS")
+            #Añadimos a COMFIRMED LOS GANADORES DE LOS CONFLICTOS
+            self._comfirmed_moves.update(zip(conflict_positions, winner_ids))
             
-            # IMPORTANT: reset per-turn state before a new sub-round
+            # Cada organismo esta en un solo conflicto y las celdas no se repiten:
+            # las transiciones de la ronda se aplican por tipo, en bloque
+            winner_pos = registry.positions[registry.indices_of(winner_ids)]
+            loser_index = registry.indices_of(resolved.losers.tolist())
+            loser_pos = registry.positions[loser_index]
+            loser_origins = winner_pos[resolved.loser_conflict]
+            if store is not None:
+                # LOSER->WINNER o NOT_FREE->WINNER; NOT_FREE->LOSER; CONFLICT -> RESOLVED
+                apply_state_transitions(store.index((winner_pos[:, 0], winner_pos[:, 1])),
+                                        CellState.WINNER, store=store)
+                apply_state_transitions(store.index((loser_pos[:, 0], loser_pos[:, 1])),
+                                        CellState.LOSER, loser_origins, store=store)
+                apply_state_transitions(conflicts.cells, CellState.RESOLVED, winner_pos, store=store)
+            else:
+                get_cell = grid.get_cell
+                apply_state_transitions([get_cell(tuple(p)) for p in winner_pos.tolist()], CellState.WINNER)
+                apply_state_transitions([get_cell(tuple(p)) for p in loser_pos.tolist()],
+                                        CellState.LOSER, loser_origins)
+                apply_state_transitions([get_cell(p) for p in conflict_positions],
+                                        CellState.RESOLVED, winner_pos)
+            
+            self._n_total_conflicts += len(conflict_positions)
+            
+            if self._observers:
+                for conflict_pos, contenders, winner_org_id, pick in zip(
+                        conflict_positions, conflicts.split(), winner_ids, resolved.picks.tolist()):
+                    losers = contenders[:pick] + contenders[pick + 1:]
+                    for observer in self._observers:
+                        observer.on_conflict(self, conflict_pos, contenders, winner_org_id, losers)
+            
+            rounds += 1
+            # La ronda de conflictos esta resuelta pero los perdedores pueden generar mas conflictos
+            self._notify_phase_end(PHASE_CONFLICTS)
+            
+            if rounds >= self._max_conflict_rounds:
+                break
+            
+            # Solo replanifican los perdedores de esta ronda, hacia celdas sin reclamar
             self._chosen_moves.clear()
-            self._comfirmed_moves.clear()
-            self.calculate_intentions(list_orgs_loosers)
+            organisms = registry.organisms
+            self.calculate_intentions([organisms[i] for i in loser_index.tolist()], replan=True)
+        
+        self._conflict_groups = None
+        self._n_total_conflict_rounds += rounds
             
     def _apply_moves(self):
-        print("Hay que aplicar acciones ", self._comfirmed_moves)
-
-        if self._comfirmed_moves:        
-            print("FASE 3-APLICANDO CAMBIOS")
-            print(self._comfirmed_moves)
-            #Aplicamos los movimientos aqui
-            for pos, list_org in self._comfirmed_moves.items():
-                             
-                org_to_move = self._get_org_in_grid(list_org)
-                
-                cell_of_org = self._grid.get_cell(org_to_move.position)
-                cell_of_org.empty()
-                
-                cell_to_move = self._grid.get_cell(pos)
-                cell_to_move.place_org(org_to_move)
-                
-            print("FASE 4-APLICANDO CAMBIOS-[END]\n")
-        else:
-            print("NOTHING TO CHANGE")
+        self._notify_phase_start(PHASE_APPLY)
+
+        moves = self._comfirmed_moves
+        if moves:
+            #Aplicamos los movimientos aqui, todos de una vez
+            width = self._grid.width
+            targets = np.fromiter(chain.from_iterable(moves.keys()), dtype=np.int64,
+                                  count=2 * len(moves)).reshape(-1, 2)
+            self._grid.move_organisms(moves.values(), targets[:, 0] * width + targets[:, 1])
+            self._n_total_moves += len(moves)
+        
+        self._notify_phase_end(PHASE_APPLY)
     
     def pass_turn(self):
         
+        if self._profiler is not None:
+            with self._profiler.turn(self):
+                self._pass_turn()
+        else:
+            self._pass_turn()
+    
+    def _pass_turn(self):
+        
         self._turn += 1
         
-        self.calculate_intentions(self._grid._organisms)    
+        # Las decisiones del turno anterior no cuentan en este
+        self._chosen_moves.clear()
+        self._conflicts.clear()
+        self._comfirmed_moves.clear()
+        self._blocked_orgs.clear()
+        
+        self.calculate_intentions(self._grid.organisms)    
                 
         self._resolve_conflicts()
         
         self._apply_moves()
         
+        # Las marcas del turno (flechas, CHOSEN, LOSER, BLOCKED...) no pasan al siguiente
+        self._grid.reset_transient_states()
+        
+        for observer in self._observers:
+            observer.on_turn_end(self)
+    
+    def iter_turns(self, n_turns: Optional[int] = None, every: int = 1) -> Iterator[TurnStats]:
+        """
+        Advances the simulation as fast as possible, yielding a TurnStats
+        record every ``every`` turns.
+
+        Args:
+            n_turns (Optional[int]): Number of turns to run, None to run forever.
+            every (int): Turns between two yielded records.
+        """
+        if every < 1:
+            raise ValueError("every must be >= 1")
         
+        done = 0
+        window_start = time.perf_counter()
+        last = self._totals()
+        while n_turns is None or done < n_turns:
+            self.pass_turn()
+            done += 1
+            if done % every == 0 or done == n_turns:
+                now = time.perf_counter()
+                totals = self._totals()
+                yield self._make_stats(last, totals, now - window_start)
+                last, window_start = totals, now
+    
+    def run(self, n_turns: int, every: int = 1,
+            callback: Optional[Callable[[TurnStats], None]] = None) -> Optional[TurnStats]:
+        """
+        Runs n_turns turns without waiting for input.
+
+        Args:
+            n_turns (int): Number of turns to run.
+            every (int): Turns between two calls to ``callback``.
+            callback (Callable[[TurnStats], None]): Optional, receives every record.
+
+        Returns:
+            Optional[TurnStats]: The last record, None if n_turns is 0.
+        """
+        stats = None
+        for stats in self.iter_turns(n_turns, every):
+            if callback is not None:
+                callback(stats)
+        return stats
+    
+    def _totals(self) -> Tuple[int, int, int, int, int]:
+        return (self._turn, self._n_total_moves, self._n_total_conflicts, self._n_total_blocked,
+                self._n_total_conflict_rounds)
+    
+    def _make_stats(self, last: Tuple[int, ...], totals: Tuple[int, ...], elapsed: float) -> TurnStats:
+        turns = totals[0] - last[0]
+        return TurnStats(
+            turn=totals[0],
+            n_organisms=len(self._grid.organisms),
+            n_moves=totals[1] - last[1],
+            n_conflicts=totals[2] - last[2],
+            n_blocked=totals[3] - last[3],
+            n_conflict_rounds=totals[4] - last[4],
+            elapsed=elapsed,
+            turns_per_second=turns / elapsed if elapsed > 0 else float("inf"),
+        )
         
     def random_cell_chose(pos_list: List[Tuple]):
         pass
@@ -214,16 +587,16 @@ class Simulation:
     def pritn_grid_state(self):
         self._grid.print_state()
     
-    def _get_avaliable_cells(self, origin) -> List[GridCell]:
+    def _get_avaliable_cells(self, origin, replan: bool = False) -> List[GridCell]:
         list_surr_cells: List[GridCell] = self._grid._get_surrounding_cells(origin)
 
         list_avaliable_cells = []
 
         for cell in list_surr_cells:
-            if cell.can_be_intended: 
+            if (cell.is_unclaimed if replan else cell.can_be_intended): 
                 list_avaliable_cells.append(cell)
             else:
-                my_debug(f"Cell {cell.position} cannot be INTENDED, state={cell.state}")
+                my_debug(lambda: f"Cell {cell.position} cannot be INTENDED, state={cell.state}")
         return list_avaliable_cells  
     
 
@@ -0,0 +1,248 @@
+import math
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import numpy as np
+
+from .cellstore import ArrayCellStore, sorted_unique
+from .gridcell import CellState
+
+if TYPE_CHECKING:
+    from ..organism.registry import OrganismRegistry
+
+
+class ChunkedArray:
+    """
+    Flat array of a SparseCellStore, stored by chunks.
+
+    Supports what the grid and the vectorized kernels use of a NumPy array:
+    indexing with an int or an int array (any shape), assignment with a
+    scalar or values broadcastable to the index shape, ``dtype`` and ``len``.
+    Cells of chunks that are not allocated read as ``fill``; writing any of
+    them allocates its chunk.
+    """
+
+    __slots__ = ("_store", "pool", "dtype", "fill")
+
+    def __init__(self, store: "SparseCellStore", dtype, fill: int) -> None:
+        self._store = store
+        self.dtype = np.dtype(dtype)
+        self.fill = fill
+        # Una fila por chunk asignado, chunk_height * chunk_width celdas cada una
+        self.pool = np.empty((0, store.chunk_cells), dtype=self.dtype)
+
+    def __len__(self) -> int:
+        return self._store.size
+
+    @property
+    def shape(self) -> Tuple[int]:
+        return (self._store.size,)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            slot, offset = self._store._locate_one(int(index), allocate=False)
+            if slot < 0:
+                return self.dtype.type(self.fill)
+            return self.pool[slot, offset]
+
+        index = np.asarray(index, dtype=np.int64)
+        slots, offsets = self._store._locate(index.ravel(), allocate=False)
+        values = np.full(len(slots), self.fill, dtype=self.dtype)
+        found = slots >= 0
+        values[found] = self.pool[slots[found], offsets[found]]
+        return values.reshape(index.shape)
+
+    def __setitem__(self, index, values) -> None:
+        if isinstance(index, (int, np.integer)):
+            slot, offset = self._store._locate_one(int(index), allocate=True)
+            self.pool[slot, offset] = values
+            return
+
+        index = np.asarray(index, dtype=np.int64)
+        slots, offsets = self._store._locate(index.ravel(), allocate=True)
+        self.pool[slots, offsets] = np.broadcast_to(np.asarray(values, dtype=self.dtype), index.shape).ravel()
+
+
+class SparseCellStore(ArrayCellStore):
+    """
+    ArrayCellStore for huge, mostly empty grids.
+
+    The grid is split in chunks of chunk_height x chunk_width cells. A chunk
+    gets memory the first time one of its cells is written (an organism
+    arrives, a neighbour is INTENDED/CHOSEN...) and gives it back at the end
+    of the turn, in reset_transient_states, if it has no organism left: a
+    chunk without organisms is all FREE after the reset. Unallocated cells
+    read as FREE, empty and with the default symbol.
+
+    Memory grows with the chunks in use and the end-of-turn reset with the
+    cells written during the turn, not with width * height.
+    """
+
+    DEFAULT_CHUNK_SHAPE = (8, 8)
+
+    def __init__(self, width: int, height: int, registry: "OrganismRegistry",
+                 chunk_shape: Optional[Tuple[int, int]] = None) -> None:
+        self._chunk_height, self._chunk_width = chunk_shape or self.DEFAULT_CHUNK_SHAPE
+        if self._chunk_height < 1 or self._chunk_width < 1:
+            raise ValueError("chunk_shape must be at least 1x1")
+        self._n_chunk_cols = math.ceil(width / self._chunk_width)
+
+        # Directorio: id de chunk -> fila de los pools. Las filas liberadas se reutilizan
+        self._slots: Dict[int, int] = {}
+        self._free_slots: List[int] = []
+        self._capacity = 0
+        # Copia ordenada del directorio para buscar con searchsorted; None si esta desactualizada
+        self._sorted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        super().__init__(width, height, registry)
+
+    def _init_arrays(self, size: int) -> None:
+        self.state = ChunkedArray(self, np.int8, CellState.FREE.value)
+        self.occupant = ChunkedArray(self, np.int64, self.EMPTY)
+        self.symbol = ChunkedArray(self, np.int32, self.DEFAULT_SYMBOL)
+
+    @property
+    def chunk_shape(self) -> Tuple[int, int]:
+        return self._chunk_height, self._chunk_width
+
+    @property
+    def chunk_cells(self) -> int:
+        return self._chunk_height * self._chunk_width
+
+    @property
+    def n_chunks(self) -> int:
+        """Chunks currently allocated."""
+        return len(self._slots)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the chunk pools (allocated capacity, free rows included)."""
+        return sum(array.pool.nbytes for array in self._arrays())
+
+    def _arrays(self) -> Tuple[ChunkedArray, ChunkedArray, ChunkedArray]:
+        return self.state, self.occupant, self.symbol
+
+    def _locate_one(self, index: int, allocate: bool) -> Tuple[int, int]:
+        row, col = divmod(index, self._width)
+        chunk_row, offset_row = divmod(row, self._chunk_height)
+        chunk_col, offset_col = divmod(col, self._chunk_width)
+        chunk = chunk_row * self._n_chunk_cols + chunk_col
+        slot = self._slots.get(chunk, -1)
+        if slot < 0 and allocate:
+            slot = self._allocate([chunk])[0]
+        return slot, offset_row * self._chunk_width + offset_col
+
+    def _split(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Chunk id and offset in the chunk of several flat indices."""
+        rows, cols = np.divmod(indices, self._width)
+        chunk_rows, offset_rows = np.divmod(rows, self._chunk_height)
+        chunk_cols, offset_cols = np.divmod(cols, self._chunk_width)
+        return (chunk_rows * self._n_chunk_cols + chunk_cols,
+                offset_rows * self._chunk_width + offset_cols)
+
+    def _locate(self, indices: np.ndarray, allocate: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """Pool row (-1 if not allocated) and offset in the row of several flat indices."""
+        chunks, offsets = self._split(indices)
+        slots = self._lookup(chunks)
+        if allocate:
+            missing = slots < 0
+            if missing.any():
+                self._allocate(np.unique(chunks[missing]).tolist())
+                slots = self._lookup(chunks)
+        return slots, offsets
+
+    def _lookup(self, chunks: np.ndarray) -> np.ndarray:
+        if not self._slots:
+            return np.full(len(chunks), -1, dtype=np.int64)
+        if self._sorted is None:
+            ids = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+            slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+            order = np.argsort(ids)
+            self._sorted = ids[order], slots[order]
+        ids, slots = self._sorted
+        pos = np.minimum(np.searchsorted(ids, chunks), len(ids) - 1)
+        return np.where(ids[pos] == chunks, slots[pos], -1)
+
+    def _allocate(self, chunks: List[int]) -> List[int]:
+        n_new = len(chunks) - len(self._free_slots)
+        if n_new > 0:
+            self._grow(self._capacity + n_new)
+        slots = [self._free_slots.pop() for _ in chunks]
+        for array in self._arrays():
+            # Las filas reutilizadas conservan datos de su chunk anterior
+            array.pool[slots] = array.fill
+        self._slots.update(zip(chunks, slots))
+        self._sorted = None
+        return slots
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(needed, 2 * self._capacity, 64)
+        for array in self._arrays():
+            pool = np.empty((capacity, self.chunk_cells), dtype=array.dtype)
+            pool[:self._capacity] = array.pool
+            array.pool = pool
+        # Las filas nuevas se sacan en orden creciente
+        self._free_slots.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+
+    def dense_states(self) -> np.ndarray:
+        """
+        State value of every cell, flat: FREE plus the cells of the
+        allocated chunks, without going through the unallocated ones.
+        """
+        states = np.full(self.size, CellState.FREE.value, dtype=np.int8)
+        if not self._slots:
+            return states
+        chunks = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+        slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+        chunk_rows, chunk_cols = np.divmod(chunks, self._n_chunk_cols)
+        offset_rows, offset_cols = np.divmod(np.arange(self.chunk_cells), self._chunk_width)
+        rows = (chunk_rows * self._chunk_height)[:, None] + offset_rows
+        cols = (chunk_cols * self._chunk_width)[:, None] + offset_cols
+        # Los chunks del borde pueden salirse del grid
+        inside = (rows < self._height) & (cols < self._width)
+        states[(rows * self._width + cols)[inside]] = self.state.pool[slots][inside]
+        return states
+
+    def reset_transient_states(self) -> np.ndarray:
+        """
+        Same as ArrayCellStore.reset_transient_states, then releases the
+        chunks of the dirty cells that have no organism left. Untouched
+        chunks keep their organisms (a chunk that loses its last organism
+        has a dirty cell), so they are not checked.
+        """
+        cells = self.dirty.take()
+        if len(cells) == 0 or not self._slots:
+            return cells
+        chunk_ids, offsets = self._split(cells)
+        slots = self._lookup(chunk_ids)
+        # Escribir asigna el chunk; una celda marcada sin escribir sigue sin chunk y ya es FREE
+        allocated = slots >= 0
+        chunk_ids, slots, offsets = chunk_ids[allocated], slots[allocated], offsets[allocated]
+        occupied = self.occupant.pool[slots, offsets] != self.EMPTY
+        self.state.pool[slots, offsets] = np.where(occupied, CellState.NOT_FREE.value, CellState.FREE.value)
+        self.symbol.pool[slots, offsets] = np.where(occupied, self.ORG_SYMBOL, self.DEFAULT_SYMBOL)
+
+        # Solo puede haberse vaciado un chunk con alguna celda escrita en el turno
+        chunks = sorted_unique(chunk_ids)
+        slots = self._lookup(chunks)
+        empty = ~(self.occupant.pool[slots] != self.EMPTY).any(axis=1)
+        if empty.any():
+            for chunk in chunks[empty].tolist():
+                del self._slots[chunk]
+            self._free_slots.extend(slots[empty].tolist())
+            self._sorted = None
+            if len(self._slots) < self._capacity // 4:
+                self._compact()
+        return cells
+
+    def _compact(self) -> None:
+        # Los chunks vivos pasan a las primeras filas y los pools se encogen
+        chunks = list(self._slots.keys())
+        slots = list(self._slots.values())
+        capacity = max(2 * len(slots), 64)
+        for array in self._arrays():
+            pool = np.empty((capacity, self.chunk_cells), dtype=array.dtype)
+            pool[:len(slots)] = array.pool[slots]
+            array.pool = pool
+        self._slots = dict(zip(chunks, range(len(slots))))
+        self._free_slots = list(range(capacity - 1, len(slots) - 1, -1))
+        self._capacity = capacity
+        self._sorted = None
@@ -0,0 +1,320 @@
+import math
+import os
+import weakref
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .cellPolicy import counting_transitions, transition_counter
+from .cellstore import ArrayCellStore
+from .intentions import (INTENDABLE, IntentionEvents, apply_intention_events, available_neighbours,
+                         choose_directions, count_event_transitions, draw_choice_indices,
+                         intention_events, symbol_codes)
+from .neighbourhood import NO_NEIGHBOUR, neighbour_rows
+
+# Arrays por organismo del buffer de turno, en orden de tesela
+_TURN_FIELDS = (("cells", np.int64), ("order", np.int64), ("counts", np.int64),
+                ("uniforms", np.float64), ("targets", np.int64))
+
+PHASE_COUNTS = "counts"
+PHASE_CHOICES = "choices"
+
+
+class TileGrid(NamedTuple):
+    """
+    Split of a width x height grid in rectangular tiles of tile_height x
+    tile_width cells (the last row/column of tiles may be smaller).
+
+    A cell is *interior* when all its neighbours are in its own tile: only
+    organisms of that tile can touch it, so a worker can write it without
+    seeing the other tiles. The rest (the one-cell ring along the tile
+    borders, plus the grid edges on a torus) is merged by the parent.
+    """
+    width: int
+    height: int
+    tile_height: int
+    tile_width: int
+    torus: bool = False
+
+    @property
+    def n_tile_rows(self) -> int:
+        return math.ceil(self.height / self.tile_height)
+
+    @property
+    def n_tile_cols(self) -> int:
+        return math.ceil(self.width / self.tile_width)
+
+    @property
+    def n_tiles(self) -> int:
+        return self.n_tile_rows * self.n_tile_cols
+
+    def tile_of(self, cells: np.ndarray) -> np.ndarray:
+        """Tile id (row-major) of several flat indices."""
+        rows, cols = np.divmod(cells, self.width)
+        return (rows // self.tile_height) * self.n_tile_cols + cols // self.tile_width
+
+    def interior(self, cells: np.ndarray) -> np.ndarray:
+        """Mask of the flat indices whose neighbours are all in their tile."""
+        rows, cols = np.divmod(cells, self.width)
+        return (self._inside(rows, self.tile_height, self.height, self.n_tile_rows)
+                & self._inside(cols, self.tile_width, self.width, self.n_tile_cols))
+
+    def _inside(self, x: np.ndarray, size: int, extent: int, n_tiles: int) -> np.ndarray:
+        if n_tiles == 1:
+            return np.ones(len(x), dtype=bool)
+        start = (x // size) * size
+        end = np.minimum(start + size, extent) - 1
+        # Sin toro, el borde del grid no tiene vecinas al otro lado
+        return (((x > start) | ((x == 0) & (not self.torus)))
+                & ((x < end) | ((x == extent - 1) & (not self.torus))))
+
+
+class _TileJob(NamedTuple):
+    # Todo lo que un worker necesita para una tesela; los arrays grandes van por nombre de memoria compartida
+    phase: str
+    state_name: str
+    symbol_name: str
+    grid_size: int
+    turn_name: str
+    capacity: int
+    lo: int
+    hi: int
+    tiles: TileGrid
+    offsets: np.ndarray
+    accepted: np.ndarray
+    arrow_codes: np.ndarray
+    x_code: int
+    counting: bool
+
+
+# Memoria compartida abierta por este proceso (worker), por nombre
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = _attached.get(name)
+    if shm is None:
+        shm = _attached[name] = shared_memory.SharedMemory(name=name)
+    return shm
+
+
+def _detach_all() -> None:
+    for shm in _attached.values():
+        shm.close()
+    _attached.clear()
+
+
+def _turn_views(buf, capacity: int) -> Dict[str, np.ndarray]:
+    views, offset = {}, 0
+    for name, dtype in _TURN_FIELDS:
+        views[name] = np.ndarray(capacity, dtype=dtype, buffer=buf, offset=offset)
+        offset += capacity * np.dtype(dtype).itemsize
+    return views
+
+
+def _run_tile(job: _TileJob) -> Tuple[Optional[IntentionEvents], Optional[Counter]]:
+    """
+    Worker side of a tile. PHASE_COUNTS writes how many neighbours each
+    organism can intend; PHASE_CHOICES writes the targets, marks the
+    interior cells of the tile and returns the events on the ring.
+    """
+    state = np.ndarray(job.grid_size, dtype=np.int8, buffer=_attach(job.state_name).buf)
+    turn = _turn_views(_attach(job.turn_name).buf, job.capacity)
+    tiles = job.tiles
+
+    cells = turn["cells"][job.lo:job.hi]
+    neighbours = neighbour_rows(cells, tiles.width, tiles.height, job.offsets, tiles.torus)
+    # La fase de conteo no escribe el estado: las dos llamadas ven la misma disponibilidad
+    flat, available, counts = available_neighbours(state, neighbours, job.accepted)
+
+    if job.phase == PHASE_COUNTS:
+        turn["counts"][job.lo:job.hi] = counts
+        return None, None
+
+    active = counts > 0
+    picks = draw_choice_indices(counts[active], turn["uniforms"][job.lo:job.hi][active])
+    chosen_dir = choose_directions(available[active], picks)
+    turn["targets"][job.lo:job.hi][active] = flat[active, chosen_dir]
+
+    events = intention_events(turn["order"][job.lo:job.hi], flat, available, active, chosen_dir)
+    interior = tiles.interior(events.cell)
+
+    symbol = np.ndarray(job.grid_size, dtype=np.int32, buffer=_attach(job.symbol_name).buf)
+    counter: Optional[Counter] = Counter() if job.counting else None
+    with counting_transitions(counter):
+        old = apply_intention_events(state, symbol, events.select(interior), job.arrow_codes,
+                                     job.x_code, job.counting)
+        if job.counting:
+            count_event_transitions(*old)
+    return events.select(~interior), counter
+
+
+class TiledExecutor:
+    """
+    Runs the intention + choice phase of an array-backed grid split in
+    tiles, one task per tile on a pool of worker processes.
+
+    The cell state and symbol arrays of the store are moved to shared
+    memory, so workers read and write them in place. Each worker marks the
+    interior cells of its tile; the events on the tile borders are sent
+    back and merged here with the same rules (apply_intention_events), so
+    the result is the same as batch_intentions, random draws included.
+
+    Call close() (or Simulation.close()) to stop the workers and move the
+    arrays back to private memory.
+
+    Args:
+        workers (Optional[int]): Worker processes, default os.cpu_count().
+        tile_shape (Optional[Tuple[int, int]]): (rows, cols) of a tile. By
+            default one horizontal band per worker.
+        min_organisms (int): Below this many organisms the phase runs here,
+            with batch_intentions (re-planning losers, small grids).
+        mp_context: multiprocessing context for the pool.
+    """
+
+    def __init__(self, workers: Optional[int] = None, tile_shape: Optional[Tuple[int, int]] = None,
+                 min_organisms: int = 4096, mp_context=None) -> None:
+        self._workers = workers or os.cpu_count() or 1
+        self._tile_shape = tile_shape
+        self._min_organisms = min_organisms
+        self._mp_context = mp_context
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._store: Optional[ArrayCellStore] = None
+        self._tiles: Optional[TileGrid] = None
+        # "state", "symbol" y "turn" (buffer por organismo); lo comparte el finalizador
+        self._shm: Dict[str, shared_memory.SharedMemory] = {}
+        self._capacity = 0
+        self._finalizer: Optional[weakref.finalize] = None
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    @property
+    def tiles(self) -> Optional[TileGrid]:
+        return self._tiles
+
+    @property
+    def min_organisms(self) -> int:
+        return self._min_organisms
+
+    def attach(self, store: ArrayCellStore, torus: bool = False) -> None:
+        """
+        Moves the state and symbol arrays of ``store`` to shared memory and
+        starts the workers.
+        """
+        if self._store is not None:
+            raise RuntimeError("TiledExecutor is already attached to a store")
+        if not isinstance(store.state, np.ndarray):
+            raise ValueError("TiledExecutor needs a dense store (Grid.BACKEND_ARRAY)")
+        width, height = store.width, store.height
+        tile_height, tile_width = self._tile_shape or (math.ceil(height / self._workers), width)
+        if tile_height < 1 or tile_width < 1:
+            raise ValueError("tile_shape must be at least 1x1")
+        self._tiles = TileGrid(width, height, tile_height, tile_width, torus)
+
+        for name in ("state", "symbol"):
+            array = getattr(store, name)
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+            shared[:] = array
+            setattr(store, name, shared)
+            self._shm[name] = shm
+        self._store = store
+        self._pool = ProcessPoolExecutor(max_workers=self._workers, mp_context=self._mp_context,
+                                         initializer=_detach_all)
+        self._finalizer = weakref.finalize(self, TiledExecutor._release, self._pool, self._shm)
+
+    def close(self) -> None:
+        """Stops the workers and copies the arrays back to private memory."""
+        if self._store is None:
+            return
+        store = self._store
+        store.state = store.state.copy()
+        store.symbol = store.symbol.copy()
+        self._store = None
+        self._finalizer.detach()
+        TiledExecutor._release(self._pool, self._shm)
+        self._pool, self._shm, self._capacity = None, {}, 0
+
+    @staticmethod
+    def _release(pool: Optional[ProcessPoolExecutor], shms: Dict[str, shared_memory.SharedMemory]) -> None:
+        if pool is not None:
+            pool.shutdown(wait=True)
+        for shm in shms.values():
+            shm.close()
+            shm.unlink()
+        shms.clear()
+
+    def _turn_buffer(self, n: int) -> Dict[str, np.ndarray]:
+        # Se reutiliza entre turnos; crece al doble cuando no cabe
+        if n > self._capacity:
+            old = self._shm.pop("turn", None)
+            if old is not None:
+                old.close()
+                old.unlink()
+            self._capacity = max(n, 2 * self._capacity)
+            row_bytes = sum(np.dtype(dtype).itemsize for _, dtype in _TURN_FIELDS)
+            self._shm["turn"] = shared_memory.SharedMemory(create=True, size=self._capacity * row_bytes)
+        return _turn_views(self._shm["turn"].buf, self._capacity)
+
+    def batch_intentions(self, store: ArrayCellStore, org_cells: np.ndarray, offsets: np.ndarray,
+                         draw_uniforms: Callable[[int], np.ndarray],
+                         accepted: np.ndarray = INTENDABLE) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Same contract as intentions.batch_intentions, from the flat indices
+        of the organism cells instead of their neighbour table.
+        """
+        if store is not self._store:
+            raise RuntimeError("TiledExecutor is not attached to this store")
+        n = len(org_cells)
+        if n == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+
+        # Organismos agrupados por tesela; el orden del turno se conserva en "order"
+        tile_ids = self._tiles.tile_of(org_cells)
+        by_tile = np.argsort(tile_ids, kind="stable")
+        bounds = np.searchsorted(tile_ids[by_tile], np.arange(self._tiles.n_tiles + 1))
+
+        turn = self._turn_buffer(n)
+        turn["cells"][:n] = org_cells[by_tile]
+        turn["order"][:n] = by_tile
+
+        arrow_codes, x_code = symbol_codes(store, offsets)
+        counting = transition_counter() is not None
+        jobs = [_TileJob(PHASE_COUNTS, self._shm["state"].name, self._shm["symbol"].name, store.size,
+                         self._shm["turn"].name, self._capacity, int(lo), int(hi), self._tiles,
+                         offsets, accepted, arrow_codes, x_code, counting)
+                for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+        list(self._pool.map(_run_tile, jobs))
+
+        # Una tirada por organismo no bloqueado, en el orden del turno, como el motor serie
+        blocked = np.empty(n, dtype=bool)
+        blocked[by_tile] = turn["counts"][:n] == 0
+        uniforms = np.zeros(n)
+        uniforms[~blocked] = draw_uniforms(int(n - blocked.sum()))
+        turn["uniforms"][:n] = uniforms[by_tile]
+
+        results = list(self._pool.map(_run_tile, [job._replace(phase=PHASE_CHOICES) for job in jobs]))
+        # Los trabajadores solo escriben vecinas de organismos no bloqueados: se marcan
+        # aqui en vez de devolver las celdas interiores tocadas
+        tiles = self._tiles
+        touched = neighbour_rows(org_cells[~blocked], tiles.width, tiles.height, offsets, tiles.torus)
+        store.dirty.add(touched[touched != NO_NEIGHBOUR])
+
+        # Bordes de las teselas: aqui llegan todos los eventos de cada celda del anillo
+        ring = IntentionEvents.concatenate([events for events, _ in results])
+        old = apply_intention_events(store.state, store.symbol, ring, arrow_codes, x_code, counting)
+        if counting:
+            count_event_transitions(*old)
+            counter = transition_counter()
+            for _, tile_counter in results:
+                counter.update(tile_counter)
+
+        targets = np.empty(n, dtype=np.int64)
+        targets[by_tile] = turn["targets"][:n]
+        return blocked, targets[~blocked]
@@ -16,7 +16,67 @@ OUTPUT_PATH = os.path.join(parent, "simulation_output.txt")
 def write_grid_to_file(sim: Simulation, turn: int):
     with open(OUTPUT_PATH, "w") as f:
         f.write(f"--- Turn {sim._turn} ---\n\n")
-        f.write(sim._grid.str_state)
+        f.write(sim.grid.cmd_state)
+
+def serve(host: str = "127.0.0.1", port: int = 5000, width: int = 100, height: int = 100,
+          n_organisms: int = 150, seed: int = 0):
+    """
+    Serves a headless simulation over HTTP (see src.api.create_app).
+    """
+    from .api import create_app
+    from .logic.ensemble import RunSpec, build_run
+    
+    spec = RunSpec(run_id=0, seed=seed, width=width, height=height,
+                   density=n_organisms / (width * height))
+    create_app(build_run(spec)).run(host=host, port=port, threaded=True)
+
+def serve_sessions(host: str = "127.0.0.1", port: int = 5000, snapshot_dir: str = None,
+                   memory_budget: int = 1 << 30):
+    """
+    Serves one simulation per user session over HTTP (see src.api.create_host_app).
+    Idle sessions beyond ``memory_budget`` bytes are evicted to ``snapshot_dir``.
+    """
+    from .api import SimulationHost, create_host_app
+    
+    snapshot_dir = snapshot_dir or os.path.join(parent, "sessions")
+    create_host_app(SimulationHost(snapshot_dir, memory_budget)).run(host=host, port=port, threaded=True)
+
+def watch(turns_per_second: float = 20, width: int = 100, height: int = 60,
+          n_organisms: int = 300, seed: int = 0):
+    """
+    Plays the simulation continuously in the terminal (see src.cmd.renderer).
+    """
+    import time
+    from .cmd.renderer import TerminalView
+    from .logic.ensemble import RunSpec, build_run
+
+    spec = RunSpec(run_id=0, seed=seed, width=width, height=height,
+                   density=n_organisms / (width * height))
+    sim = build_run(spec)
+    sim.add_observer(TerminalView())
+    period = 1.0 / turns_per_second
+    try:
+        while True:
+            start = time.monotonic()
+            sim.pass_turn()
+            time.sleep(max(period - (time.monotonic() - start), 0.0))
+    except KeyboardInterrupt:
+        pass
+
+def record(path: str = None, n_turns: int = 500, width: int = 200, height: int = 200,
+           n_organisms: int = 4000, seed: int = 0, scale: int = 1):
+    """
+    Runs the simulation headless and records it as an animated GIF (see src.cmd.export).
+    """
+    from .cmd.export import FrameExporter, GifWriter
+    from .logic.ensemble import RunSpec, build_run
+
+    spec = RunSpec(run_id=0, seed=seed, width=width, height=height,
+                   density=n_organisms / (width * height))
+    sim = build_run(spec)
+    with FrameExporter(GifWriter(path or os.path.join(parent, "simulation.gif")), scale=scale) as exporter:
+        sim.add_observer(exporter)
+        sim.run(n_turns, every=max(n_turns, 1))
 
 def main():
     sim = Simulation()
@@ -30,23 +90,13 @@ def main():
 # Allow both direct execution and import as module
 # -------------------------------------------------------
 if __name__ == "__main__":
-    main()
-
-"""
-from flask import Flask, jsonify
-
-app = Flask(__name__)
-sim = Simulation(width=100, height=100, organism_count=150)
-
-@app.route("/state", methods=["GET"])
-def get_state():
-    return jsonify(sim.get_state())
-
-@app.route("/step", methods=["POST"])
-def step():
-    sim.step()
-    return jsonify(sim.get_state())
-
-if __name__ == "__main__":
-    app.run(debug=True)
-"""
+    if "--serve" in sys.argv[1:]:
+        serve()
+    elif "--sessions" in sys.argv[1:]:
+        serve_sessions()
+    elif "--watch" in sys.argv[1:]:
+        watch()
+    elif "--record" in sys.argv[1:]:
+        record()
+    else:
+        main()
@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import Tuple
+from typing import Optional, Tuple, TYPE_CHECKING
 
 from src.logic.gridcell import CellState, GridCell
+if TYPE_CHECKING:
+    from .registry import OrganismRegistry
 
 class OrgState(Enum):
     READY = 0
@@ -16,14 +18,17 @@ class Organism:
     """
     Represents a single organism within the simulation.
     Each organism has a unique ID and a position in the grid.
+    Slotted: grids can hold millions of organisms.
     """
+    
+    __slots__ = ("_id", "_position", "_state", "_cellRef", "_registry")
 
     def __init__(self, id_: int, position: Tuple[int, int]) -> None:
         self._id = id_
         self._position = position
         self._state: OrgState = OrgState.READY
-        #Para el futuro
         self._cellRef: GridCell = None  # Reference to the cell it occupies, if any
+        self._registry: Optional["OrganismRegistry"] = None
 
     @property
     def id(self) -> int:
@@ -45,12 +50,33 @@ class Organism:
         """
         return self._position
 
+    @property
+    def cell(self) -> Optional[GridCell]:
+        """
+        Returns the cell the organism occupies, or None.
+        """
+        return self._cellRef
+
     def __repr__(self) -> str:
         return f"_ORG({self._id}, {self._position})_"
     
     def move_to(self, cell: GridCell):
         if cell._state == CellState.RESOLVED:
-            self._position = cell.position
             cell.place_org(organism=self)
         else:
-            raise ValueError("Cannot move ORG to a cell not RESOLVED")
\ No newline at end of file
+            raise ValueError("Cannot move ORG to a cell not RESOLVED")
+
+    def _bind_cell(self, cell: GridCell) -> None:
+        """
+        Called by GridCell.place_org: updates position, cell reference and registry.
+        """
+        self._position = cell.position
+        self._cellRef = cell
+        if self._registry is not None:
+            self._registry._on_moved(self)
+
+    def _unbind_cell(self) -> None:
+        """
+        Called by GridCell.empty/clean when the organism leaves its cell.
+        """
+        self._cellRef = None
\ No newline at end of file
@@ -0,0 +1,178 @@
+from itertools import chain
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+from .organism import Organism
+
+
+class OrganismRegistry:
+    """
+    Index of the organisms of a Grid.
+
+    Keeps the organisms in insertion order together with an id -> index map
+    and a (n, 2) array of positions, so lookups by id are O(1) and the
+    positions of every organism can be read as one array. Organisms notify
+    the registry when they are placed in a cell (see Organism._bind_cell).
+    """
+
+    _MIN_CAPACITY = 16
+
+    def __init__(self, organisms: Optional[Iterable[Organism]] = None) -> None:
+        self._organisms: List[Organism] = []
+        self._index: Dict[int, int] = {}
+        self._ids = np.empty(self._MIN_CAPACITY, dtype=np.int64)
+        self._positions = np.empty((self._MIN_CAPACITY, 2), dtype=np.int64)
+        if organisms is not None:
+            self.add_many(organisms)
+
+    def __len__(self) -> int:
+        return len(self._organisms)
+
+    def __iter__(self) -> Iterator[Organism]:
+        return iter(self._organisms)
+
+    def __contains__(self, org_id: int) -> bool:
+        return org_id in self._index
+
+    @property
+    def organisms(self) -> List[Organism]:
+        """
+        Returns the registered organisms in insertion order.
+        """
+        return self._organisms
+
+    @property
+    def ids(self) -> np.ndarray:
+        """
+        Returns the ids of the organisms, in the same order as ``organisms``.
+        """
+        return self._ids[:len(self._organisms)]
+
+    @property
+    def positions(self) -> np.ndarray:
+        """
+        Returns a (n, 2) array with the (row, col) of every organism,
+        in the same order as ``organisms``.
+        """
+        return self._positions[:len(self._organisms)]
+
+    def get(self, org_id: int) -> Optional[Organism]:
+        """
+        Returns the organism with the given id, or None.
+        """
+        index = self._index.get(org_id)
+        if index is None:
+            return None
+        return self._organisms[index]
+
+    def index_of(self, org_id: int) -> Optional[int]:
+        return self._index.get(org_id)
+
+    def position_of(self, org_id: int) -> Optional[Tuple[int, int]]:
+        index = self._index.get(org_id)
+        if index is None:
+            return None
+        row, col = self._positions[index]
+        return int(row), int(col)
+
+    def indices_of(self, org_ids: Iterable[int]) -> np.ndarray:
+        """
+        Returns the registry indices of several organisms.
+
+        Raises:
+            KeyError: If an id is not registered.
+        """
+        return np.fromiter((self._index[org_id] for org_id in org_ids), dtype=np.int64)
+
+    def add(self, organism: Organism) -> None:
+        self.add_many((organism,))
+
+    def add_many(self, organisms: Iterable[Organism]) -> None:
+        """
+        Registers several organisms at once.
+
+        Raises:
+            ValueError: If an id is repeated or an organism belongs to another registry.
+        """
+        new = list(organisms)
+        start = len(self._organisms)
+        end = start + len(new)
+        ids = list(map(attrgetter("id"), new))
+        index = dict(zip(ids, range(start, end)))
+        if len(index) != len(new) or not self._index.keys().isdisjoint(index):
+            seen = set(self._index)
+            repeated = next(org_id for org_id in ids if org_id in seen or seen.add(org_id))
+            raise ValueError(f"Organism id {repeated} is already registered")
+        for org in new:
+            if org._registry is not None and org._registry is not self:
+                raise ValueError(f"Organism {org.id} belongs to another grid")
+
+        self._reserve(end)
+        self._ids[start:end] = ids
+        # Las posiciones se aplanan sin pasar por una lista de tuplas intermedia
+        self._positions[start:end] = np.fromiter(
+            chain.from_iterable(map(attrgetter("position"), new)), dtype=np.int64, count=2 * len(new)
+        ).reshape(-1, 2)
+        self._index.update(index)
+        for org in new:
+            org._registry = self
+        self._organisms.extend(new)
+
+    def remove(self, org_id: int) -> Organism:
+        return self.remove_many((org_id,))[0]
+
+    def remove_many(self, org_ids: Iterable[int]) -> List[Organism]:
+        """
+        Unregisters several organisms at once, keeping the order of the rest.
+
+        Returns:
+            List[Organism]: The removed organisms.
+
+        Raises:
+            KeyError: If an id is not registered.
+        """
+        n = len(self._organisms)
+        indices = self.indices_of(org_ids)
+        if not len(indices):
+            return []
+        keep = np.ones(n, dtype=bool)
+        keep[indices] = False
+
+        organisms = self._organisms
+        removed = [organisms[i] for i in indices.tolist()]
+        for org in removed:
+            org._registry = None
+            self._index.pop(org.id, None)
+
+        # Solo se desplazan (y se reindexan) los que estaban detras del primer borrado;
+        # la lista se compacta en su sitio: quien la tenga sigue viendo la misma
+        first = int(indices.min())
+        kept = first + np.flatnonzero(keep[first:])
+        end = first + len(kept)
+        self._ids[first:end] = self._ids[kept]
+        self._positions[first:end] = self._positions[kept]
+        organisms[first:] = [organisms[i] for i in kept.tolist()]
+        index = self._index
+        for i, org in enumerate(organisms[first:], first):
+            index[org.id] = i
+        return removed
+
+    def _on_moved(self, organism: Organism) -> None:
+        self._positions[self._index[organism.id]] = organism.position
+
+    def _on_moved_many(self, indices: np.ndarray, positions: np.ndarray) -> None:
+        """Called by Grid.move_organisms: new (row, col) of the organisms at ``indices``."""
+        self._positions[indices] = positions
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._ids)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        ids = np.empty(capacity, dtype=np.int64)
+        positions = np.empty((capacity, 2), dtype=np.int64)
+        n = len(self._organisms)
+        ids[:n] = self._ids[:n]
+        positions[:n] = self._positions[:n]
+        self._ids, self._positions = ids, positions
@@ -0,0 +1,93 @@
+"""
+The vectorized kernels, the array/sparse backends and the tiled engine must
+play exactly the same runs as the reference (dict backend, python engine):
+same moves, conflicts, cell states, transition counts and random state.
+"""
+from collections import Counter
+
+import pytest
+
+from src.logic.cellPolicy import counting_transitions
+from src.logic.ensemble import RunSpec, layout_cells
+from src.logic.grid import Grid
+from src.logic.observer import PHASE_APPLY, SimulationObserver
+from src.logic.population import build_grid
+from src.logic.simulation import Simulation
+from src.logic.tiling import TiledExecutor
+
+N_TURNS = 8
+
+SPECS = [
+    RunSpec(run_id=0, seed=1, width=40, height=30, density=0.3),
+    RunSpec(run_id=1, seed=2, width=33, height=27, density=0.6, topology=Grid.TOPOLOGY_TORUS),
+    RunSpec(run_id=2, seed=3, width=30, height=30, density=0.85),
+    RunSpec(run_id=3, seed=4, width=25, height=35, density=0.5,
+            neighbourhood=Grid.NEIGHBOURHOOD_VON_NEUMANN, max_conflict_rounds=2),
+]
+
+COMBINATIONS = [
+    (Grid.BACKEND_ARRAY, Simulation.ENGINE_VECTORIZED),
+    (Grid.BACKEND_SPARSE, Simulation.ENGINE_VECTORIZED),
+    (Grid.BACKEND_ARRAY, Simulation.ENGINE_PYTHON),
+    (Grid.BACKEND_ARRAY, Simulation.ENGINE_TILED),
+]
+
+
+class _Recorder(SimulationObserver):
+    """Everything observable of a run, turn by turn."""
+
+    def __init__(self) -> None:
+        self.log = []
+
+    def on_conflict(self, sim, position, contenders, winner, losers) -> None:
+        self.log.append(("conflict", sim.turn, position, list(contenders), winner, list(losers)))
+
+    def on_phase_start(self, sim, phase: str) -> None:
+        if phase == PHASE_APPLY:
+            self.log.append(("moves", sim.turn, sorted(sim.confirmed_moves.items())))
+
+    def on_turn_end(self, sim) -> None:
+        registry = sim.grid.registry
+        self.log.append(("turn", sim.turn, list(sim.blocked_orgs), registry.ids.tolist(),
+                         registry.positions.tolist(), sim.grid.cell_states().tolist(),
+                         sim.grid.cmd_state))
+
+
+def _play(spec: RunSpec, backend: str, engine: str):
+    grid = build_grid(spec.width, spec.height, layout_cells(spec), backend=backend,
+                      topology=spec.topology, neighbourhood=spec.neighbourhood)
+    tiled = None
+    if engine == Simulation.ENGINE_TILED:
+        # Teselas pequenas y sin minimo de organismos: la fase siempre va a los trabajadores
+        tiled = TiledExecutor(workers=2, tile_shape=(8, 8), min_organisms=1)
+    sim = Simulation(grid, engine=engine, headless=True, max_conflict_rounds=spec.max_conflict_rounds,
+                     rng=spec.seed, tiled=tiled)
+    recorder = _Recorder()
+    sim.add_observer(recorder)
+    transitions = Counter()
+    try:
+        with counting_transitions(transitions):
+            for _ in range(N_TURNS):
+                sim.pass_turn()
+    finally:
+        sim.close()
+    return recorder.log, dict(transitions), sim._totals(), float(sim.rng.random())
+
+
+@pytest.fixture(scope="module", params=SPECS, ids=lambda spec: f"seed{spec.seed}")
+def reference(request):
+    spec = request.param
+    return spec, _play(spec, Grid.BACKEND_DICT, Simulation.ENGINE_PYTHON)
+
+
+@pytest.mark.parametrize("backend,engine", COMBINATIONS, ids=lambda value: value)
+def test_same_run_as_reference(reference, backend, engine):
+    spec, (log, transitions, totals, next_random) = reference
+    other_log, other_transitions, other_totals, other_random = _play(spec, backend, engine)
+
+    assert len(other_log) == len(log)
+    for expected, got in zip(log, other_log):
+        assert got == expected
+    assert other_transitions == transitions
+    assert other_totals == totals
+    assert other_random == next_random